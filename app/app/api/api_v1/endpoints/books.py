@@ -4,6 +4,11 @@ from app.api import deps
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.utils import APIResponseType, APIResponse
 from app import crud, models, schemas
+from app.core.cache import warm_up_by_role
+from app.core.config import settings
+from cache import cache, invalidate
+from cache.key_gen import get_not_found_tag
+from cache.util import ONE_DAY_IN_SECONDS, ONE_HOUR_IN_SECONDS
 
 
 router = APIRouter()
@@ -30,6 +35,16 @@ def map_books_to_schema(
 
 
 @router.get("/")
+@cache(
+    namespace=namespace,
+    expire=ONE_DAY_IN_SECONDS,
+    min_expire=10 * 60,
+    stale_ttl=ONE_HOUR_IN_SECONDS,
+    local_expire=60,
+    tags=["book-list"],
+    vary_by=["current_user.is_superuser"],
+    warm=warm_up_by_role(skip=0, limit=100),
+)
 async def get_books(
     skip: int = 0,
     limit: int = 100,
@@ -54,6 +69,16 @@ async def get_books(
 
 
 @router.get("/{id}/")
+@cache(
+    namespace=namespace,
+    expire=ONE_DAY_IN_SECONDS,
+    min_expire=10 * 60,
+    stale_ttl=ONE_HOUR_IN_SECONDS,
+    local_expire=60,
+    tags=["book:{id}"],
+    vary_by=["current_user.is_superuser"],
+    not_found_ttl=settings.CACHE_NOT_FOUND_EXPIRE,
+)
 async def get_book(
     id: int,
     db: AsyncSession = Depends(deps.get_db_async),
@@ -75,6 +100,7 @@ async def get_book(
 
 
 @router.post("/")
+@invalidate(tags=["book-list", get_not_found_tag(namespace)])
 async def create_book(
     book_in: schemas.BookCreate,
     db: AsyncSession = Depends(deps.get_db_async),
@@ -98,6 +124,7 @@ async def create_book(
 
 
 @router.put("/{id}/")
+@invalidate(tags=["book:{id}", "book-list"])
 async def update_book(
     id: int,
     request: schemas.BookUpdate,
@@ -136,6 +163,7 @@ async def update_book(
 
 
 @router.delete("/{id}/")
+@invalidate(tags=["book:{id}", "book-list"])
 async def delete_book(
     id: int,
     db: AsyncSession = Depends(deps.get_db_async),
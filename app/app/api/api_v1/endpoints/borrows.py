@@ -5,6 +5,7 @@ from app.api import deps
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.utils import APIResponseType, APIResponse
 from app import crud, models, schemas
+from cache import invalidate
 
 
 status_router = APIRouter(prefix="/status", tags=["borrow status"])
@@ -157,6 +158,7 @@ async def create_activity_log(
 
 
 @user_borrow_router.get("/request/")
+@invalidate(tags=["book:{book_id}", "book-list"])
 async def borrow_book_request(
     book_id: int,
     requested_days: Optional[int] = None,
@@ -5,6 +5,15 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 from app.utils import APIResponseType, APIResponse
 from app import crud, models, schemas
+from app.core.cache import warm_up_by_role
+from app.core.config import settings
+from cache import cache, invalidate
+from cache.key_gen import get_not_found_tag
+from cache.util import (
+    ONE_DAY_IN_SECONDS,
+    ONE_HOUR_IN_SECONDS,
+    ONE_WEEK_IN_SECONDS,
+)
 
 
 router = APIRouter()
@@ -29,6 +38,16 @@ def map_categories_to_schema(
 
 
 @router.get("/")
+@cache(
+    namespace=namespace,
+    expire=ONE_DAY_IN_SECONDS,
+    max_expire=ONE_WEEK_IN_SECONDS,
+    stale_ttl=ONE_HOUR_IN_SECONDS,
+    local_expire=60,
+    tags=["category-list"],
+    vary_by=["current_user.is_superuser"],
+    warm=warm_up_by_role(skip=0, limit=10),
+)
 async def get_categories(
     skip: int = 0,
     limit: int = 10,
@@ -54,6 +73,16 @@ async def get_categories(
 
 
 @router.get("/{id}/")
+@cache(
+    namespace=namespace,
+    expire=ONE_DAY_IN_SECONDS,
+    max_expire=ONE_WEEK_IN_SECONDS,
+    stale_ttl=ONE_HOUR_IN_SECONDS,
+    local_expire=60,
+    tags=["category:{id}"],
+    vary_by=["current_user.is_superuser"],
+    not_found_ttl=settings.CACHE_NOT_FOUND_EXPIRE,
+)
 async def get_category(
     id: int,
     db: AsyncSession = Depends(deps.get_db_async),
@@ -76,6 +105,7 @@ async def get_category(
 
 
 @router.post("/")
+@invalidate(tags=["category-list", get_not_found_tag(namespace)])
 async def create_category(
     category_in: schemas.CategoryCreate,
     db: AsyncSession = Depends(deps.get_db_async),
@@ -93,6 +123,8 @@ async def create_category(
 
 
 @router.put("/{id}/")
+# books embed their category
+@invalidate(namespace="book", tags=["category:{id}", "category-list"])
 async def update_category(
     id: int,
     request: schemas.CategoryUpdate,
@@ -127,6 +159,7 @@ async def update_category(
 
 
 @router.delete("/{id}/")
+@invalidate(namespace="book", tags=["category:{id}", "category-list"])
 async def delete_category(
     id: int,
     db: AsyncSession = Depends(deps.get_db_async),
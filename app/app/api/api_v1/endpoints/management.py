@@ -5,6 +5,9 @@ from app.api import deps
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.utils import APIResponseType, APIResponse
 from app import crud, models, schemas
+from cache import cache
+from cache.cache import invalidate_tags
+from cache.util import ONE_HOUR_IN_SECONDS
 from .borrows import create_activity_log
 
 
@@ -36,6 +39,12 @@ async def get_books_for_sale(
 
 
 @router.get('/revenue-summary/')
+@cache(
+    namespace=namespace,
+    expire=ONE_HOUR_IN_SECONDS,
+    tags=["revenue"],
+    shadow=True,
+)
 async def get_revenue_report_by_category(
     db: AsyncSession = Depends(deps.get_db_async),
     current_user: models.User = Depends(deps.get_current_user),
@@ -114,7 +123,7 @@ async def lending_book(
     if not current_user.is_superuser:
         raise HTTPException(status_code=401, detail="Unauthorized access")
 
-    borrow = crud.borrow.get(db, id=borrow_id)
+    borrow = await crud.borrow.get(db, id=borrow_id)
 
     if not borrow or borrow.is_deleted:
         raise HTTPException(status_code=404, detail="Borrow record is \
@@ -160,7 +169,7 @@ async def delivered_book(
     if not current_user.is_superuser:
         raise HTTPException(status_code=401, detail="Unauthorized access")
 
-    borrow = crud.borrow.get(db, id=borrow_id)
+    borrow = await crud.borrow.get(db, id=borrow_id)
 
     if not borrow or borrow.is_deleted:
         raise HTTPException(status_code=404, detail="Borrow record is \
@@ -174,7 +183,7 @@ async def delivered_book(
     # calculate borrow_price and borrow penalty price and update borrow
     status_id = 7  # Delivered status
     superuser_id = current_user.id
-    borrow = crud.borrow.update_and_calculate_borrow(
+    borrow = await crud.borrow.update_and_calculate_borrow(
         db, status_id,
         superuser_id, borrow
     )
@@ -197,12 +206,13 @@ async def delivered_book(
             db, obj_in=user_penalty_in)
 
     # Increase the number of books to borrow
-    book = crud.book.get(id=borrow.book_id)
+    book = await crud.book.get(db, id=borrow.book_id)
     book_update = schemas.BookUpdate(
         borrow_qty=book.borrow_qty + 1
     )
     book = await crud.book.update(db, db_obj=book,
                                   obj_in=book_update)
+    await invalidate_tags(tags=[f"book:{book.id}", "book-list"])
 
     borrow = schemas.DeliveredBook(
         book_id=borrow.book_id,
@@ -4,6 +4,7 @@ from app.api import deps
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.utils import APIResponseType, APIResponse
 from app import crud, models, schemas
+from cache import invalidate
 
 
 router = APIRouter()
@@ -67,6 +68,15 @@ async def process_sale(
 
 
 @router.get('/book/{book_id}/')
+@invalidate(
+    tags=[
+        "book:{book_id}",
+        "book-list",
+        "user:{current_user.id}",
+        "user-list",
+        "revenue",
+    ]
+)
 async def sell_book(
     book_id: int,
     qty: int = 1,
@@ -81,9 +91,12 @@ async def sell_book(
 
     book = await find_book(db, book_id)
     await check_book_for_sale(book, qty)
-    total_price = await check_user_balance(current_user, book.sell_price, qty)
-    sell, total_price = await process_sale(db, current_user,
-                                           book, qty, total_price)
+    # the cached principal may hold an old balance
+    user = await crud.user.get_for_update(db, current_user.id)
+    total_price = await check_user_balance(user, book.sell_price, qty)
+    sell, total_price = await process_sale(db, user, book, qty, total_price)
+    # the balance of the principal changed
+    await deps.evict_principal(current_user.id)
 
     message = schemas.SellResponse.generate_message(book.title, qty)
 
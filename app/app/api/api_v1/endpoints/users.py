@@ -14,14 +14,13 @@ from app import crud, models, schemas, utils
 from app.api import deps
 from app.core import security
 from app.core.config import settings
-from app.core.security import get_password_hash
 from app.utils import APIResponseType, APIResponse
 from app import exceptions as exc
 from app.utils.user import (
     verify_password_reset_token,
 )
 from cache import cache, invalidate
-from cache.util import ONE_DAY_IN_SECONDS
+from cache.util import ONE_DAY_IN_SECONDS, ONE_HOUR_IN_SECONDS
 
 
 router = APIRouter()
@@ -67,12 +66,13 @@ async def refresh_token(
     token = token.refresh_token
 
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=settings.ALGORITHM)
+        payload = security.decode_token(token)
         user_id = payload.get("sub")
         token_type = payload.get("token_type")
         expire_time = payload.get("exp")
 
-        if not user_id or token_type != "refresh":
+        revoked = await security.is_token_revoked(payload.get("jti"))
+        if not user_id or token_type != "refresh" or revoked:
             raise exc.InternalServiceError(
                 status_code=401,
                 detail="Your token is invalid",
@@ -97,6 +97,35 @@ async def refresh_token(
         )
 
 
+@router.post("/logout/")
+async def logout(
+    token: schemas.RefreshToken | None = None,
+    token_data: schemas.TokenPayload = Depends(deps.get_token_payload),
+) -> schemas.Msg:
+    """
+    Revoke the access token and, if given, the refresh token of the user.
+    """
+    await security.revoke_token(token_data.jti, token_data.exp)
+    if token is None:
+        return {"msg": "Logged out successfully"}
+    try:
+        payload = security.decode_token(token.refresh_token)
+    except jwt.ExpiredSignatureError:
+        # expired tokens are rejected anyway
+        return {"msg": "Logged out successfully"}
+    except jwt.InvalidTokenError:
+        payload = {}
+    refresh_data = schemas.TokenPayload(**payload)
+    if refresh_data.token_type != "refresh" or refresh_data.sub != token_data.sub:
+        raise exc.InternalServiceError(
+            status_code=401,
+            detail="Your token is invalid",
+            msg_code=utils.MessageCodes.invalid_token
+        )
+    await security.revoke_token(refresh_data.jti, refresh_data.exp)
+    return {"msg": "Logged out successfully"}
+
+
 @router.post("/me/")
 async def me(
     current_user: models.User = Depends(deps.get_current_user),
@@ -108,6 +137,7 @@ async def me(
 
 
 @router.put("/charge/")
+@invalidate(tags=["user:{request.user_id}", "user-list"])
 async def charge_account(
     request: schemas.UpdateAmount,
     db: AsyncSession = Depends(deps.get_db_async),
@@ -121,7 +151,7 @@ async def charge_account(
         raise HTTPException(status_code=403,
                             detail="You can not charge your account!")
 
-    user = await crud.user.get(db, id=request.user_id)
+    user = await crud.user.get_for_update(db, id=request.user_id)
     if not user:
         raise exc.InternalServiceError(
             status_code=404,
@@ -136,6 +166,7 @@ async def charge_account(
         user_in.amount += request.new_amount
 
     user = await crud.user.update(db, db_obj=user, obj_in=user_in)
+    await deps.evict_principal(user.id)
     return APIResponse(user)
 
 
@@ -169,15 +200,21 @@ async def reset_password(
             detail="Inactive user.",
             msg_code=utils.MessageCodes.bad_request
         )
-    hashed_password = get_password_hash(new_password)
-    user.hashed_password = hashed_password
-    db.add(user)
-    await db.commit()
+    await crud.user.update(db, db_obj=user, obj_in={"password": new_password})
+    await deps.evict_principal(user.id)
     return {"msg": "Password updated successfully"}
 
 
 @router.get("/")
-@cache(namespace=namespace, expire=ONE_DAY_IN_SECONDS)
+@cache(
+    namespace=namespace,
+    expire=ONE_DAY_IN_SECONDS,
+    min_expire=5 * 60,
+    stale_ttl=ONE_HOUR_IN_SECONDS,
+    local_expire=60,
+    tags=["user-list"],
+    warm=[{"skip": 0, "limit": 100}],
+)
 async def read_users(
     db: AsyncSession = Depends(deps.get_db_async),
     skip: int = 0,
@@ -235,11 +272,22 @@ async def update_user_me(
     if email is not None:
         user_in.email = email
     user = await crud.user.update(db, db_obj=current_user, obj_in=user_in)
+    await deps.evict_principal(user.id)
     return APIResponse(user)
 
 
 @router.get("/{user_id}/")
-@cache(namespace=namespace, expire=ONE_DAY_IN_SECONDS)
+@cache(
+    namespace=namespace,
+    expire=ONE_DAY_IN_SECONDS,
+    min_expire=5 * 60,
+    stale_ttl=ONE_HOUR_IN_SECONDS,
+    local_expire=60,
+    # the entry depends on the privileges of the requesting user as well
+    tags=["user:{user_id}", "user:{current_user.id}"],
+    vary_by=["current_user.id"],
+    not_found_ttl=settings.CACHE_NOT_FOUND_EXPIRE,
+)
 async def read_user_by_id(
     user_id: int,
     current_user: models.User = Depends(deps.get_current_active_user),
@@ -267,6 +315,7 @@ async def read_user_by_id(
 
 
 @router.put("/{user_id}/")
+@invalidate(tags=["user:{user_id}", "user-list"])
 async def update_user(
     *,
     db: AsyncSession = Depends(deps.get_db_async),
@@ -285,4 +334,5 @@ async def update_user(
             msg_code=utils.MessageCodes.not_found,
         )
     user = await crud.user.update(db, db_obj=user, obj_in=user_in)
+    await deps.evict_principal(user.id)
     return APIResponse(user)
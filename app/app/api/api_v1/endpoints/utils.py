@@ -6,6 +6,7 @@ from celery.result import AsyncResult
 from app import models, schemas
 from app.api import deps
 from app.core.celery_app import celery_app
+from app.db.session import session_metrics
 from cache import Cache
 
 
@@ -41,6 +42,35 @@ async def test_redis(
         return {"msg": f"ERROR: {str(e)}"}
 
 
+@router.get("/cache-stats/")
+async def cache_stats(
+    aggregate: bool = False,
+    current_user: models.User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Cache hits, misses, stores and latencies per namespace and endpoint.
+
+    Set `aggregate` to also return the totals of all workers kept in Redis. The
+    namespace budgets and their usage are shared by all workers. `db` counts the
+    request sessions of this worker that never used a connection.
+    """
+    redis_cache = Cache()
+    stats = {
+        "worker": {
+            "namespaces": redis_cache.metrics.snapshot(),
+            "local": redis_cache.local.stats(),
+            "compression": redis_cache.compression.stats(),
+            "db": session_metrics.as_dict(),
+        }
+    }
+    if redis_cache.connected:
+        stats["budgets"] = await redis_cache.get_budget_usage()
+    if aggregate and redis_cache.connected:
+        await redis_cache.flush_metrics()
+        stats["cluster"] = await redis_cache.get_cluster_metrics()
+    return stats
+
+
 @router.websocket("/echo-client/")
 async def echo_client(websocket: WebSocket):
     await websocket.accept()
@@ -10,11 +10,17 @@ from sqlalchemy.ext.asyncio import AsyncSession
 import jwt
 
 from app import crud, models, schemas, utils
-from app.core.config import settings
-from app.db.session import SessionLocal, async_session
+from app.core import security
+from app.core.cache import get_principal_cache
+from app.db.session import SessionLocal, async_session, session_metrics
 from app import exceptions as exc
 
 
+# users authenticated by `get_current_user`, by id; writers of a user must call
+# `evict_principal`
+principal_cache = get_principal_cache()
+
+
 def get_db() -> Generator:
     try:
         db = SessionLocal()
@@ -24,19 +30,21 @@ def get_db() -> Generator:
 
 
 async def get_db_async() -> AsyncGenerator:
-    async with async_session() as session:
+    session = async_session()
+    try:
         yield session
+    finally:
+        # returns the connection, if the session checked one out
+        await session.close()
+        session_metrics.record(session.sync_session.info)
 
 
-async def get_current_user(
+async def get_token_payload(
     authorization: str = Depends(HTTPBearer()),
-    db: Session | AsyncSession = Depends(get_db_async)
-) -> models.User:
+) -> schemas.TokenPayload:
     try:
         token = authorization.credentials
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
+        payload = security.decode_token(token)
         token_data = schemas.TokenPayload(**payload)
 
     except jwt.ExpiredSignatureError as e:
@@ -54,8 +62,19 @@ async def get_current_user(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Authentication Failed",
         )
-    
-    user = await crud.user.get(db, id=token_data.sub)
+    if await security.is_token_revoked(token_data.jti):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Token has been revoked",
+        )
+    return token_data
+
+
+async def get_current_user(
+    token_data: schemas.TokenPayload = Depends(get_token_payload),
+    db: Session | AsyncSession = Depends(get_db_async)
+) -> models.User:
+    user = await crud.user.get_through(db, token_data.sub, principal_cache)
     if not user:
         raise exc.InternalServiceError(
             status_code=404,
@@ -65,6 +84,11 @@ async def get_current_user(
     return user
 
 
+async def evict_principal(*user_ids: int) -> None:
+    """Drop the cached principals of `user_ids` in every worker."""
+    await principal_cache.evict(*user_ids)
+
+
 def get_current_active_user(
     current_user: models.User = Depends(get_current_user),
 ) -> models.User:
@@ -1,11 +1,46 @@
+from typing import Iterable
+
 from celery import Celery
+from redis import Redis
+
 from app.core.celery_app import celery_app
+from app.core.config import settings
 from app import crud, schemas, models
 from app.api import deps
+from cache.bus import invalidate_sync
+from cache.key_gen import get_entity_key
+
+
+def invalidate_user_cache(user_ids: Iterable[int]) -> None:
+    """Evict the cached users and revenue, in Redis and in every API worker."""
+    user_ids = list(user_ids)
+    tags = [f"user:{user_id}" for user_id in user_ids]
+    if not tags:
+        return
+    # the rows read by `crud.user.get`, see `CRUDBase`, and the principals
+    entity_keys = [
+        get_entity_key(settings.CACHE_PREFIX, table, user_id)
+        for table in (models.User.__tablename__, deps.principal_cache.table)
+        for user_id in user_ids
+    ]
+    redis_client = Redis.from_url(
+        settings.REDIS_URI, socket_timeout=settings.REDIS_TIMEOUT
+    )
+    try:
+        invalidate_sync(
+            redis_client,
+            settings.CACHE_PREFIX,
+            # the charges are recorded as payments
+            tags=[*tags, "user-list", "revenue"],
+            keys=entity_keys,
+        )
+    finally:
+        redis_client.close()
 
 
 @celery_app.task(name="app.celery.tasks.deduct_book_cost")
 def deduct_book_cost():
+    charged_user_ids = set()
     try:
         # Get the database session generator
         db_generator = deps.get_db()
@@ -25,6 +60,7 @@ def deduct_book_cost():
                     cost = category.borrow_price_per_day
                     # Deduct cost from user's amount
                     user.amount -= cost
+                    charged_user_ids.add(user.id)
 
                     # Insert the borrowing transaction in the payments model
                     payment_create = schemas.PaymentCreate(
@@ -48,5 +84,7 @@ def deduct_book_cost():
             db.close()
             # Clean up the generator
             db_generator.close()
+            # Drop the cached balances of the charged users
+            invalidate_user_cache(charged_user_ids)
     except Exception as e:
         print(f"Error in deduct_book_cost task: {e}")
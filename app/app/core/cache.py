@@ -0,0 +1,82 @@
+from typing import Any, Dict, List, Type
+
+from fastapi import Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.base_class import Base
+from app.db.session import async_session
+from app.models import User
+from cache import Cache
+from cache.budget import NamespaceBudget
+from cache.entity import EntityCache
+from cache.warm import warm_up
+
+# arguments created for the endpoints evaluated by the cache warm-up
+WARM_UP_PROVIDERS = {AsyncSession: async_session}
+
+
+async def init_cache(**options: Any) -> Cache:
+    """Connect the cache client of this process; `options` override the settings."""
+    redis_cache = Cache()
+    await redis_cache.init(
+        **{
+            "host_url": settings.REDIS_URI,
+            "prefix": settings.CACHE_PREFIX,
+            "response_header": "X-API-Cache",
+            "ignore_arg_types": [Request, Response, Session, AsyncSession, User],
+            "local_max_entries": settings.CACHE_LOCAL_MAX_ENTRIES,
+            "local_max_bytes": settings.CACHE_LOCAL_MAX_BYTES,
+            "codec": settings.CACHE_CODEC,
+            "compression": settings.CACHE_COMPRESSION,
+            "compression_threshold": settings.CACHE_COMPRESSION_THRESHOLD,
+            "metrics_flush_interval": settings.CACHE_METRICS_FLUSH_INTERVAL,
+            "max_connections": settings.CACHE_REDIS_MAX_CONNECTIONS,
+            "socket_timeout": settings.REDIS_TIMEOUT,
+            "failure_threshold": settings.CACHE_CIRCUIT_FAILURE_THRESHOLD,
+            "reset_timeout": settings.CACHE_CIRCUIT_RESET_TIMEOUT,
+            "budgets": {
+                namespace: NamespaceBudget(**budget)
+                for namespace, budget in settings.CACHE_NAMESPACE_BUDGETS.items()
+            },
+            "budget_prune_interval": settings.CACHE_BUDGET_PRUNE_INTERVAL,
+            "denylist_capacity": settings.CACHE_DENYLIST_CAPACITY,
+            "denylist_error_rate": settings.CACHE_DENYLIST_ERROR_RATE,
+            "denylist_reload_interval": settings.CACHE_DENYLIST_RELOAD_INTERVAL,
+            **options,
+        }
+    )
+    return redis_cache
+
+
+def get_entity_cache(model: Type[Base]) -> EntityCache:
+    """Return a cache for the rows of `model`, see `CRUDBase`."""
+    return EntityCache(
+        model.__tablename__,
+        expire=settings.CACHE_ENTITY_EXPIRE,
+        local_expire=settings.CACHE_ENTITY_LOCAL_EXPIRE,
+        not_found_expire=settings.CACHE_NOT_FOUND_EXPIRE,
+    )
+
+
+def get_principal_cache() -> EntityCache:
+    """Return the cache of the users authenticated by `deps.get_current_user`."""
+    return EntityCache(
+        "principal",
+        expire=settings.CACHE_PRINCIPAL_EXPIRE,
+        local_expire=settings.CACHE_PRINCIPAL_LOCAL_EXPIRE,
+    )
+
+
+def warm_up_by_role(**params: Any) -> List[Dict[str, Any]]:
+    """Return `params` once per role, for endpoints cached with a role `vary_by`."""
+    return [
+        {**params, "current_user": User(is_superuser=is_superuser)}
+        for is_superuser in (False, True)
+    ]
+
+
+async def warm_cache() -> dict:
+    """Precompute the argument sets registered with `@cache(warm=...)`."""
+    return await warm_up(WARM_UP_PROVIDERS, settings.CACHE_WARM_UP_CONCURRENCY)
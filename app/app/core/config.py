@@ -27,6 +27,13 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int
     REFRESH_TOKEN_EXPIRE_MINUTES: int
     ALGORITHM: str = "HS256"
+    # verified tokens remembered by `security.decode_token`
+    TOKEN_CACHE_MAX_ENTRIES: int = 10000
+    # bcrypt cost; stored hashes with another cost are replaced on login
+    PASSWORD_HASH_ROUNDS: int = 12
+    # threads hashing passwords, and hashes waiting for them before refusing more
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32
 
     RABBITMQ_USERNAME: str
     RABBITMQ_PASSWORD: str
@@ -37,6 +44,48 @@ class Settings(BaseSettings):
     REDIS_PORT: int
     REDIS_PASSWORD: str
     REDIS_TIMEOUT: Optional[int] = 5
+    REDIS_URI: Optional[str] = None
+
+    @validator("REDIS_URI", pre=True)
+    def assemble_redis_connection(cls, v: Optional[str], values: Dict[str, Any]) -> Any:
+        if isinstance(v, str):
+            return v
+        return (
+            f"redis://:{values.get('REDIS_PASSWORD')}"
+            f"@{values.get('REDIS_SERVER')}:{values.get('REDIS_PORT')}"
+        )
+
+    CACHE_PREFIX: str = "api-cache"
+    CACHE_LOCAL_MAX_ENTRIES: int = 1024
+    CACHE_LOCAL_MAX_BYTES: int = 16 * 1024 * 1024
+    # codec of entity rows and other non-response values; `@cache` responses are
+    # always stored as their rendered JSON body
+    CACHE_CODEC: str = "json"
+    CACHE_COMPRESSION: str = "auto"
+    CACHE_COMPRESSION_THRESHOLD: int = 1024
+    CACHE_METRICS_FLUSH_INTERVAL: int = 60
+    CACHE_REDIS_MAX_CONNECTIONS: int = 50
+    CACHE_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CACHE_CIRCUIT_RESET_TIMEOUT: int = 30
+    CACHE_WARM_UP_CONCURRENCY: int = 4
+    CACHE_WARM_UP_INTERVAL: int = 600
+    CACHE_ENTITY_EXPIRE: int = 300
+    CACHE_ENTITY_LOCAL_EXPIRE: int = 5
+    CACHE_NOT_FOUND_EXPIRE: int = 30
+    # users authenticated by `deps.get_current_user`, 0 keeps them in-process only
+    CACHE_PRINCIPAL_EXPIRE: int = 60
+    CACHE_PRINCIPAL_LOCAL_EXPIRE: int = 30
+    # limits on the entries of a namespace, see `cache.budget.NamespaceBudget`
+    CACHE_NAMESPACE_BUDGETS: Dict[str, Dict[str, Any]] = {
+        "book": {"max_entries": 10000, "max_bytes": 64 * 1024 * 1024},
+        "category": {"max_entries": 2000, "max_bytes": 16 * 1024 * 1024},
+        "user": {"max_entries": 10000, "max_bytes": 64 * 1024 * 1024},
+    }
+    CACHE_BUDGET_PRUNE_INTERVAL: int = 60
+    # Bloom filter of the revoked tokens, see `Cache.deny`
+    CACHE_DENYLIST_CAPACITY: int = 100000
+    CACHE_DENYLIST_ERROR_RATE: float = 0.001
+    CACHE_DENYLIST_RELOAD_INTERVAL: int = 3600
 
     BACKEND_CORS_ORIGINS: List[AnyHttpUrl] = []
     authjwt_secret_key: str = "secret"
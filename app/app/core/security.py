@@ -1,12 +1,45 @@
+import asyncio
+import hashlib
+import math
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Union
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar, Union
 
 import jwt
 from passlib.context import CryptContext
+from redis.exceptions import RedisError
 
+from app import exceptions as exc, utils
 from app.core.config import settings
+from cache import Cache
+from cache.key_gen import get_denied_key
+from cache.local import LocalCache
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+T = TypeVar("T")
+
+# hashes with another number of rounds are reported by `verify_and_update`
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.PASSWORD_HASH_ROUNDS,
+)
+# bcrypt releases the GIL, so the event loop keeps running while threads hash
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+# hashes submitted to `password_executor` that did not finish yet
+_pending_hashes = 0
+# claims of the tokens whose signature was verified, by digest of the token;
+# every entry counts as one byte, so only the number of entries is bounded
+token_cache = LocalCache(
+    max_entries=settings.TOKEN_CACHE_MAX_ENTRIES,
+    max_bytes=settings.TOKEN_CACHE_MAX_ENTRIES,
+)
+TOKEN_NAMESPACE = "token"
+# denylist of the ids (`jti`) of revoked tokens, see `revoke_token`
+REVOKED_TOKENS = "token"
 
 
 def create_access_token(
@@ -18,7 +51,12 @@ def create_access_token(
         expire = datetime.utcnow() + timedelta(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
-    to_encode = {"exp": expire, "sub": str(data), "token_type": "access"}
+    to_encode = {
+        "exp": expire,
+        "sub": str(data),
+        "token_type": "access",
+        "jti": uuid.uuid4().hex,
+    }
     encoded_jwt = jwt.encode(
         to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM
     )
@@ -34,16 +72,105 @@ def create_refresh_token(
         expire = datetime.utcnow() + timedelta(
             minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES
         )
-    to_encode = {"exp": expire, "sub": str(data), "token_type": "refresh"}
+    to_encode = {
+        "exp": expire,
+        "sub": str(data),
+        "token_type": "refresh",
+        "jti": uuid.uuid4().hex,
+    }
     encoded_jwt = jwt.encode(
         to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM
     )
     return encoded_jwt
 
 
+def decode_token(token: str) -> Dict[str, Any]:
+    """Return the claims of `token`, verifying its signature once per process.
+
+    Verified tokens are remembered until they expire, so the repeated requests
+    of a client only hash the token. The expiry is checked on every call, as
+    `jwt.decode` does. Tokens that fail verification are not remembered.
+    """
+    digest = hashlib.sha256(token.encode()).hexdigest()
+    claims = token_cache.get(digest, TOKEN_NAMESPACE)
+    if claims is None:
+        claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        if "exp" in claims:
+            ttl = math.ceil(int(claims["exp"]) - time.time())
+            token_cache.set(digest, claims, 1, ttl, TOKEN_NAMESPACE)
+    elif int(claims["exp"]) <= time.time():
+        raise jwt.ExpiredSignatureError("Signature has expired")
+    return dict(claims)
+
+
+async def revoke_token(jti: Optional[str], exp: Optional[int]) -> None:
+    """Reject the token `jti` in every worker until it expires at `exp`.
+
+    Tokens issued without an id can not be revoked.
+    """
+    if jti is None or exp is None:
+        return
+    redis_cache = Cache()
+    try:
+        await redis_cache.deny(
+            get_denied_key(redis_cache.prefix, REVOKED_TOKENS, jti),
+            math.ceil(exp - time.time()),
+        )
+    except RedisError as e:
+        redis_cache.record_failure(e)
+        raise exc.InternalServiceError(
+            status_code=503,
+            detail="Could not revoke the token",
+            msg_code=utils.MessageCodes.operation_failed,
+        )
+
+
+async def is_token_revoked(jti: Optional[str]) -> bool:
+    if jti is None:
+        return False
+    redis_cache = Cache()
+    return await redis_cache.is_denied(
+        get_denied_key(redis_cache.prefix, REVOKED_TOKENS, jti)
+    )
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
+
+
+async def _run_hashing(func: Callable[..., T], *args: Any) -> T:
+    """Run `func` in `password_executor`, refusing work beyond the queue limit."""
+    global _pending_hashes
+    if _pending_hashes >= settings.PASSWORD_HASH_MAX_PENDING:
+        raise exc.InternalServiceError(
+            status_code=503,
+            detail="Too many password checks in progress",
+            msg_code=utils.MessageCodes.operation_failed,
+        )
+    _pending_hashes += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(password_executor, func, *args)
+    finally:
+        _pending_hashes -= 1
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_hashing(pwd_context.verify, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_hashing(pwd_context.hash, password)
+
+
+async def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """Check a password; also return a new hash if the stored one is outdated."""
+    return await _run_hashing(
+        pwd_context.verify_and_update, plain_password, hashed_password
+    )
@@ -1,23 +1,51 @@
 from asyncio import iscoroutine
-from datetime import datetime
-from typing import Awaitable, Any, Generic, Type, TypeVar, Union, List
+from datetime import date, datetime
+from decimal import Decimal
+from typing import (
+    Awaitable,
+    Any,
+    Callable,
+    Generic,
+    Iterable,
+    Type,
+    TypeVar,
+    Union,
+    List,
+)
 
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.util import identity_key
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from app.db.base_class import Base
+from cache.client import Cache
+from cache.entity import EntityCache
 
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
+# column types stored as strings in the entity cache unless the codec keeps them,
+# and how they are restored
+ENTITY_FIELD_PARSERS: dict[type, Callable[[str], Any]] = {
+    Decimal: Decimal,
+    datetime: datetime.fromisoformat,
+    date: date.fromisoformat,
+}
+
 
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
-    def __init__(self, model: Type[ModelType]):
+    def __init__(
+        self,
+        model: Type[ModelType],
+        entity_cache: EntityCache | None = None,
+        entity_exclude: Iterable[str] = (),
+    ):
         """
         CRUD object with default methods to Create, Read, Update, Delete (CRUD).
 
@@ -25,14 +53,26 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
 
         * `model`: A SQLAlchemy model class
         * `schema`: A Pydantic model (schema) class
+        * `entity_cache`: Optional cache of the rows read with `get` and
+          `get_many` through an `AsyncSession`. Rows written by `create`,
+          `update`, `remove` and `delete` replace or evict the cached version;
+          changes committed any other way must call `evict`.
+        * `entity_exclude`: Columns never stored in the entity cache, such as
+          secrets. They are not loaded on rows read from the cache; read them
+          with a query, which loads them on the row already in the session.
         """
         self.model = model
+        self.entity_cache = entity_cache
+        self.entity_exclude = frozenset(entity_exclude)
+        self._entity_parsers: dict[str, Callable[[str], Any]] | None = None
 
     async def _commit_refresh_async(
         self, db: AsyncSession, db_obj: ModelType
     ) -> ModelType:
         await db.commit()
         await db.refresh(db_obj)
+        if self.entity_cache is not None:
+            await self.entity_cache.set(db_obj.id, self._to_entity_fields(db_obj))
         return db_obj
 
     def _commit_refresh(
@@ -75,8 +115,136 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         self, db: Session | AsyncSession, id: Any
     ) -> ModelType | Awaitable[ModelType] | None:
         query = select(self.model).filter(self.model.id == id)
+        if self._uses_entity_cache(db):
+            return self._get_cached_async(db, id, query)
         return self._first(db.scalars(query))
 
+    async def get_many(
+        self, db: AsyncSession, ids: list[Any]
+    ) -> dict[Any, ModelType]:
+        """Return the rows of `ids` by id; ids without a row are left out.
+
+        Cached rows are fetched from Redis with a single `MGET` and the others
+        with a single query. Ids found without a row are remembered by the entity
+        cache for a short time.
+        """
+        found = {}
+        missing = list(dict.fromkeys(ids))
+        version = self.entity_cache.version if self.entity_cache else None
+        if self._uses_entity_cache(db):
+            cached = await self.entity_cache.get_many(missing)
+            for id, fields in cached.items():
+                if fields is not None:
+                    found[id] = await self._merge_entity(db, fields)
+            missing = [id for id in missing if id not in cached]
+        if missing:
+            query = select(self.model).filter(self.model.id.in_(missing))
+            rows = await self._all_async(db.scalars(query))
+            found.update((row.id, row) for row in rows)
+            if self.entity_cache is not None:
+                await self.entity_cache.fill_many(
+                    {row.id: self._to_entity_fields(row) for row in rows}, version
+                )
+                await self.entity_cache.set_missing(
+                    *(id for id in missing if id not in found)
+                )
+        return found
+
+    async def get_through(
+        self, db: AsyncSession, id: Any, entity_cache: EntityCache
+    ) -> ModelType | None:
+        """Like `get`, but look the row up in `entity_cache` first.
+
+        For rows read by most requests, such as the authenticated user, with
+        their own expiry. Writers of those rows must also evict them from
+        `entity_cache`. Rows read from it may be stale for that expiry; writes
+        computed from their values must read the row again, e.g. with
+        `CRUDUser.get_for_update`.
+        """
+        version = entity_cache.version
+        cached = await entity_cache.get_many([id])
+        if cached.get(id) is not None:
+            return await self._merge_entity(db, cached[id])
+        db_obj = await self.get(db, id=id)
+        if db_obj is not None:
+            await entity_cache.fill(id, self._to_entity_fields(db_obj), version)
+        return db_obj
+
+    async def evict(self, *ids: Any) -> None:
+        """Drop the cached versions of rows changed without `update` or `delete`."""
+        if self.entity_cache is not None:
+            await self.entity_cache.evict(*ids)
+
+    def _uses_entity_cache(self, db: Session | AsyncSession) -> bool:
+        # synchronous sessions run outside the event loop of the cache client
+        return self.entity_cache is not None and isinstance(db, AsyncSession)
+
+    async def _get_cached_async(
+        self, db: AsyncSession, id: Any, query
+    ) -> ModelType | None:
+        try:
+            id = inspect(self.model).primary_key[0].type.python_type(id)
+        except (TypeError, ValueError):
+            return await self._first_async(db.scalars(query))
+        db_obj = db.sync_session.identity_map.get(identity_key(self.model, id))
+        if db_obj is not None and not inspect(db_obj).expired_attributes:
+            return db_obj
+        version = self.entity_cache.version
+        cached = await self.entity_cache.get_many([id])
+        if id in cached:
+            fields = cached[id]
+            return None if fields is None else await self._merge_entity(db, fields)
+        db_obj = await self._first_async(db.scalars(query))
+        if db_obj is None:
+            await self.entity_cache.set_missing(id)
+        else:
+            await self.entity_cache.fill(id, self._to_entity_fields(db_obj), version)
+        return db_obj
+
+    async def _merge_entity(self, db: AsyncSession, fields: dict) -> ModelType:
+        """Attach a cached row to `db` as if it had been loaded by a query."""
+        parsers = self._get_entity_parsers()
+        values = {
+            key: value
+            for key, value in fields.items()
+            if key not in self.entity_exclude
+        }
+        for key, parse in parsers.items():
+            if isinstance(values.get(key), str):
+                values[key] = parse(values[key])
+        db_obj = self.model(**values)
+        make_transient_to_detached(db_obj)
+        return await db.merge(db_obj, load=False)
+
+    def _to_entity_fields(self, db_obj: ModelType) -> dict[str, Any]:
+        native_types = Cache().codec.native_types
+        fields = {}
+        for attr in inspect(self.model).column_attrs:
+            if attr.key in self.entity_exclude:
+                continue
+            value = getattr(db_obj, attr.key)
+            if isinstance(value, native_types):
+                # restored with their type by the codec
+                pass
+            elif isinstance(value, (date, datetime)):
+                value = value.isoformat()
+            elif isinstance(value, Decimal):
+                value = str(value)
+            fields[attr.key] = value
+        return fields
+
+    def _get_entity_parsers(self) -> dict[str, Callable[[str], Any]]:
+        if self._entity_parsers is None:
+            self._entity_parsers = {}
+            for attr in inspect(self.model).column_attrs:
+                try:
+                    python_type = attr.columns[0].type.python_type
+                except NotImplementedError:
+                    continue
+                if python_type in ENTITY_FIELD_PARSERS:
+                    self._entity_parsers[attr.key] = ENTITY_FIELD_PARSERS[python_type]
+        return self._entity_parsers
+
     def get_multi(
         self,
         db: Session | AsyncSession,
@@ -115,7 +283,8 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
                 update_data = obj_in
             else:
                 update_data = obj_in.dict(exclude_unset=True)
-            for field in obj_data:
+            # excluded columns are not loaded on rows read from the entity cache
+            for field in [*obj_data, *self.entity_exclude.difference(obj_data)]:
                 if field in update_data:
                     setattr(db_obj, field, update_data[field])
         if hasattr(self.model, "modified"):
@@ -151,6 +320,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         if db_obj is not None:
             await db.delete(db_obj)
             await db.commit()
+            await self.evict(id)
             return db_obj
         return None
 
@@ -161,7 +331,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         id: int
     ) -> ModelType | Awaitable[ModelType]:
         if isinstance(db, AsyncSession):
-            return self._remove_async(db=db, id=id)
+            return self._delete_async(db=db, id=id)
 
         db_obj = db.query(self.model).get(id)
         if db_obj is not None:
@@ -1,9 +1,13 @@
 from typing import Any, List, Union, Awaitable
+from sqlalchemy import inspect
 from sqlalchemy.future import select
 from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import get_entity_cache
 from app.crud.base import CRUDBase
+from app.crud.crud_category import category as crud_category
 from app.models.book import Book
 from app.schemas.book import BookCreate, BookUpdate
 
@@ -14,8 +18,20 @@ class CRUDBook(CRUDBase[Book, BookCreate, BookUpdate]):
     ) -> Book | Awaitable[Book] | None:
         query = select(self.model).options(selectinload(Book.category))\
             .filter(self.model.id == id)
+        if self._uses_entity_cache(db):
+            return self._get_cached_with_category_async(db, id, query)
         return self._first(db.scalars(query))
 
+    async def _get_cached_with_category_async(
+        self, db: AsyncSession, id: Any, query
+    ) -> Book | None:
+        book = await self._get_cached_async(db, id, query)
+        if book is not None and "category" in inspect(book).unloaded:
+            # cached books are stored without their category
+            category = await crud_category.get(db, id=book.category_id)
+            set_committed_value(book, "category", category)
+        return book
+
     async def _filter_async(
         self,
         db: AsyncSession,
@@ -56,4 +72,4 @@ class CRUDBook(CRUDBase[Book, BookCreate, BookUpdate]):
         return self._all(db.scalars(query))
 
 
-book = CRUDBook(Book)
+book = CRUDBook(Book, entity_cache=get_entity_cache(Book))
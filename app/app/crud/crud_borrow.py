@@ -7,6 +7,7 @@ from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 
 
+from app.core.cache import get_entity_cache
 from app.crud.base import CRUDBase
 from app.models.borrow import Status, Borrow, BorrowActivityLog, UserPenalty
 from app.schemas.borrow import (
@@ -269,7 +270,7 @@ class CRUDUserPenalty(CRUDBase[UserPenalty,
         ]
 
 
-status = CRUDStatus(Status)
+status = CRUDStatus(Status, entity_cache=get_entity_cache(Status))
 borrow = CRUDBorrow(Borrow)
 borrow_activity_log = CRUDBorrowActivityLog(BorrowActivityLog)
 user_penalty = CRUDUserPenalty(UserPenalty)
@@ -1,3 +1,4 @@
+from app.core.cache import get_entity_cache
 from app.crud.base import CRUDBase
 from app.models.category import Category
 from app.schemas.category import CategoryCreate, CategoryUpdate
@@ -6,4 +7,4 @@ from app.schemas.category import CategoryCreate, CategoryUpdate
 class CRUDCategory(CRUDBase[Category, CategoryCreate, CategoryUpdate]):
     pass
 
-category = CRUDCategory(Category)
+category = CRUDCategory(Category, entity_cache=get_entity_cache(Category))
@@ -5,7 +5,13 @@ from sqlalchemy.orm import Session
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
-from app.core.security import get_password_hash, verify_password
+from app.core.cache import get_entity_cache
+from app.core.security import (
+    get_password_hash,
+    get_password_hash_async,
+    verify_and_update_password,
+    verify_password,
+)
 from app.crud.base import CRUDBase
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
@@ -18,9 +24,24 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         query = select(User).filter(User.email == email)
         return self._first(db.scalars(query))
 
+    async def get_for_update(self, db: AsyncSession, id: Any) -> User | None:
+        """Return the user `id` read from the database and locked until the end of
+        the transaction, for changes computed from its current values, such as
+        its balance. The row already in the session, e.g. the principal, is
+        refreshed."""
+        query = (
+            select(User)
+            .filter(User.id == id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+        return await self._first_async(db.scalars(query))
+
     async def create(self, db: Session | AsyncSession, *, obj_in: UserCreate) -> User:
         obj_in_data = jsonable_encoder(obj_in)
-        obj_in_data["hashed_password"] = get_password_hash(obj_in.password)
+        obj_in_data["hashed_password"] = await get_password_hash_async(
+            obj_in.password
+        )
         del obj_in_data["password"]
         obj_in_data = {k: v for k, v in obj_in_data.items() if v is not None}
         return await super().create(db, obj_in=obj_in_data)
@@ -37,19 +58,37 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         else:
             update_data = obj_in.dict(exclude_unset=True)
         if "password" in update_data and update_data["password"]:
+            if isinstance(db, AsyncSession):
+                return self._update_password_async(
+                    db, db_obj=db_obj, update_data=update_data
+                )
             hashed_password = get_password_hash(update_data["password"])
-            del update_data["password"]
-            update_data["hashed_password"] = hashed_password
+            update_data = with_hashed_password(update_data, hashed_password)
         return super().update(db, db_obj=db_obj, obj_in=update_data)
 
+    async def _update_password_async(
+        self, db: AsyncSession, *, db_obj: User, update_data: Dict[str, Any]
+    ) -> User:
+        hashed_password = await get_password_hash_async(update_data["password"])
+        update_data = with_hashed_password(update_data, hashed_password)
+        return await super().update(db, db_obj=db_obj, obj_in=update_data)
+
     async def authenticate_async(
         self, db: AsyncSession, *, email: str, password: str
     ) -> User | None:
         user = await self.get_by_email(db, email=email)
         if not user:
             return None
-        if not verify_password(password, user.hashed_password):
+        verified, new_hash = await verify_and_update_password(
+            password, user.hashed_password
+        )
+        if not verified:
             return None
+        if new_hash is not None:
+            # hashed with another cost than `PASSWORD_HASH_ROUNDS`
+            user = await super().update(
+                db, db_obj=user, obj_in={"hashed_password": new_hash}
+            )
         return user
 
     def authenticate(
@@ -71,4 +110,13 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         return user.is_superuser
 
 
-user = CRUDUser(User)
+def with_hashed_password(update_data: Dict[str, Any], hashed_password: str) -> dict:
+    """Return `update_data` with its password replaced by `hashed_password`."""
+    update_data = {k: v for k, v in update_data.items() if k != "password"}
+    update_data["hashed_password"] = hashed_password
+    return update_data
+
+
+user = CRUDUser(
+    User, entity_cache=get_entity_cache(User), entity_exclude=["hashed_password"]
+)
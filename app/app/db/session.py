@@ -1,8 +1,13 @@
-from sqlalchemy import create_engine
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, SessionTransaction, sessionmaker
 
 from app.core.config import settings
+from cache.metrics import Histogram
 
 
 engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, pool_pre_ping=True)
@@ -17,3 +22,52 @@ async_session = sessionmaker(
     autoflush=False,
     expire_on_commit=False,
 )
+
+
+@dataclass
+class SessionMetrics:
+    """Database use of the sessions opened for requests by `deps.get_db_async`.
+
+    A session only checks a connection out of the pool when it runs its first
+    statement, so the requests that never query hold no connection.
+    """
+
+    sessions: int = 0
+    untouched: int = 0
+    # seconds a request held a connection, from checkout to commit or close
+    held: Histogram = field(default_factory=Histogram)
+
+    def record(self, info: Dict[str, Any]) -> None:
+        """Count a closed session, given its `Session.info`."""
+        self.sessions += 1
+        if "held" in info:
+            self.held.observe(info["held"])
+        else:
+            self.untouched += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "sessions": self.sessions,
+            "untouched": self.untouched,
+            "untouched_ratio": (
+                round(self.untouched / self.sessions, 4) if self.sessions else 0.0
+            ),
+            "connection_held": self.held.as_dict(),
+            "pool_checked_out": engine_async.pool.checkedout(),
+        }
+
+
+session_metrics = SessionMetrics()
+
+
+@event.listens_for(Session, "after_begin")
+def _record_checkout(session: Session, transaction, connection) -> None:
+    session.info["began_at"] = time.perf_counter()
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _record_release(session: Session, transaction: SessionTransaction) -> None:
+    if transaction.parent is not None or "began_at" not in session.info:
+        return
+    held = time.perf_counter() - session.info.pop("began_at")
+    session.info["held"] = session.info.get("held", 0.0) + held
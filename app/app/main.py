@@ -1,20 +1,17 @@
-from fastapi import FastAPI, Request, Response
+from fastapi import FastAPI
 
 from starlette.middleware.cors import CORSMiddleware
 
-from sqlalchemy.orm import Session
-from sqlalchemy.ext.asyncio import AsyncSession
-
 from app.api.api_v1.api import api_router
+from app.core.cache import init_cache, WARM_UP_PROVIDERS
 from app.core.config import settings
-from app.models import User
 from app.exceptions import (
     http_exceptions,
     internal_exceptions,
     internal_service_exceptions,
     validation_exceptions,
 )
-from cache import Cache
+from cache.warm import start_warm_up
 
 
 app = FastAPI(
@@ -42,11 +39,6 @@ app.add_exception_handler(*http_exceptions)
 
 @app.on_event("startup")
 async def startup():
-    redis_cache = Cache()
-    url = f"redis://:{settings.REDIS_PASSWORD}@{settings.REDIS_SERVER}:{settings.REDIS_PORT}"
-    await redis_cache.init(
-        host_url=url,
-        prefix="api-cache",
-        response_header="X-API-Cache",
-        ignore_arg_types=[Request, Response, Session, AsyncSession, User],
-    )
+    await init_cache()
+    # readiness does not wait for the warm-up
+    start_warm_up(WARM_UP_PROVIDERS, settings.CACHE_WARM_UP_CONCURRENCY)
@@ -10,6 +10,9 @@ class Token(BaseModel):
 
 class TokenPayload(BaseModel):
     sub: int | None = None
+    exp: int | None = None
+    jti: str | None = None
+    token_type: str | None = None
 
 
 class RefreshToken(BaseModel):
@@ -1,6 +1,12 @@
 import logging
 from rocketry import Rocketry
 
+from app.api.api_v1 import api  # noqa: F401 registers the cached endpoints
+from app.core.cache import init_cache, warm_cache
+from app.core.config import settings
+from cache import Cache
+from cache.enums import RedisStatus
+
 logging.basicConfig(format="%(asctime)s - %(message)s", level=logging.INFO)
 logger = logging.getLogger(__file__)
 
@@ -15,5 +21,15 @@ async def test_rocketry():
     logger.info("------rocketry run schedule-------")
 
 
+@app.task(f"every {settings.CACHE_WARM_UP_INTERVAL} seconds")
+async def warm_up_cache():
+    """Keep the argument sets registered with `@cache(warm=...)` in the cache."""
+    if Cache().status == RedisStatus.NONE:
+        # the scheduler only fills Redis, it keeps no in-process tier
+        await init_cache(local_max_entries=0, metrics_flush_interval=0)
+    result = await warm_cache()
+    logger.info(f"------cache warm-up: {result}-------")
+
+
 if __name__ == "__main__":
     app.run()
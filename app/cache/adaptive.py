@@ -0,0 +1,77 @@
+"""adaptive.py"""
+from typing import Iterable, Optional, Sequence, Tuple
+
+from cache.util import ONE_YEAR_IN_SECONDS
+
+# weight of the latest interval in the moving average of the write intervals
+INTERVAL_WEIGHT = 0.3
+WRITES_EXPIRE = ONE_YEAR_IN_SECONDS
+
+# Records an invalidation of every tag: the time of the last one and a moving
+# average of the seconds between two of them, both as integers.
+#   KEYS: the writes hash of every tag
+#   ARGV: now, weight of the latest interval, seconds the hashes are kept
+RECORD_WRITES_SCRIPT = """
+local now = tonumber(ARGV[1])
+local weight = tonumber(ARGV[2])
+for _, key in ipairs(KEYS) do
+    local last = tonumber(redis.call('HGET', key, 'last') or '0')
+    if last > 0 and now > last then
+        local elapsed = now - last
+        local interval = tonumber(redis.call('HGET', key, 'interval') or '-1')
+        if interval < 0 then
+            interval = elapsed
+        else
+            interval = interval + weight * (elapsed - interval)
+        end
+        redis.call('HSET', key, 'interval', math.floor(interval))
+    end
+    redis.call('HSET', key, 'last', now)
+    redis.call('EXPIRE', key, ARGV[3])
+end
+return #KEYS
+"""
+
+# `(last, interval)` of a tag as stored by `RECORD_WRITES_SCRIPT`
+WriteStats = Tuple[Optional[bytes], Optional[bytes]]
+
+
+def get_record_writes_args(now: float) -> Sequence[object]:
+    return (int(now), INTERVAL_WEIGHT, WRITES_EXPIRE)
+
+
+def choose_ttl(
+    stats: Iterable[WriteStats],
+    now: float,
+    default: int,
+    min_ttl: int,
+    max_ttl: int,
+) -> int:
+    """Pick the TTL of an entry from the invalidations of its tags.
+
+    The expected time until the next invalidation of a tag is its average write
+    interval, or the time since its last write if that is longer. The entry
+    expires with the most volatile of its tags, within `min_ttl` and `max_ttl`.
+    Entries whose tags were never invalidated get `default`.
+
+    Args:
+        stats (Iterable[WriteStats]): The last write and the write interval of
+            every tag of the entry.
+        now (float): The current time in seconds since the epoch.
+        default (int): TTL of the entries without write history.
+        min_ttl (int): Lower bound of the TTL.
+        max_ttl (int): Upper bound of the TTL.
+
+    Returns:
+        int: The TTL in seconds.
+    """
+    expected = []
+    for last, interval in stats:
+        if last is None:
+            continue
+        since_last = now - int(last)
+        expected.append(
+            since_last if interval is None else max(int(interval), since_last)
+        )
+    ttl = int(min(expected)) if expected else default
+    return min(max(ttl, min_ttl), max_ttl)
@@ -0,0 +1,61 @@
+"""bloom.py"""
+import hashlib
+import math
+from typing import Iterator
+
+DEFAULT_BLOOM_CAPACITY = 100_000
+DEFAULT_BLOOM_ERROR_RATE = 0.001
+
+
+class BloomFilter:
+    """Set of strings that may report members it does not contain, but never
+    misses one it does.
+
+    The filter is sized so that, with `capacity` members, about `error_rate` of
+    the strings it does not contain are reported as members. Members can not be
+    removed; build a new filter to drop them.
+
+    Args:
+        capacity (`int`, optional): Expected number of members. Defaults to 100000.
+        error_rate (`float`, optional): Rate of false positives at `capacity`
+            members. Defaults to 0.001.
+    """
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_BLOOM_CAPACITY,
+        error_rate: float = DEFAULT_BLOOM_ERROR_RATE,
+    ) -> None:
+        if capacity <= 0 or not 0 < error_rate < 1:
+            raise ValueError(
+                "A Bloom filter needs a positive capacity and an error rate in (0, 1)"
+            )
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def __len__(self) -> int:
+        """Return the number of strings added, counting repeated ones."""
+        return self.count
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._get_positions(item)
+        )
+
+    def add(self, item: str) -> None:
+        for position in self._get_positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def _get_positions(self, item: str) -> Iterator[int]:
+        # double hashing: the k positions are h1 + i * h2, from one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
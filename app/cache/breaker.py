@@ -0,0 +1,61 @@
+"""breaker.py"""
+import time
+from enum import IntEnum
+
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+
+
+class CircuitState(IntEnum):
+    """States of a circuit breaker."""
+
+    CLOSED = 0
+    OPEN = 1
+    HALF_OPEN = 2
+
+
+class CircuitBreaker:
+    """Stops calls to Redis for a cool-down window after repeated failures.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    `allow_request` returns False for `reset_timeout` seconds. The circuit is then
+    half-open: requests go through again, the first success closes it and a
+    single failure opens it for another window.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout: float = DEFAULT_RESET_TIMEOUT,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow_request(self) -> bool:
+        if self.state != CircuitState.OPEN:
+            return True
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return False
+        self.state = CircuitState.HALF_OPEN
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.state = CircuitState.CLOSED
+
+    def record_failure(self) -> bool:
+        """Count a failure; returns True if it opened the circuit."""
+        self.failures += 1
+        if self.state == CircuitState.OPEN:
+            return False
+        if (
+            self.state == CircuitState.HALF_OPEN
+            or self.failures >= self.failure_threshold
+        ):
+            self.state = CircuitState.OPEN
+            self.opened_at = time.monotonic()
+            return True
+        return False
@@ -0,0 +1,105 @@
+"""budget.py"""
+from dataclasses import dataclass
+from typing import Any, Dict
+
+LRU = "lru"
+LFU = "lfu"
+EVICTION_POLICIES = (LRU, LFU)
+DEFAULT_BUDGET_PRUNE_INTERVAL = 60.0
+
+# Stores an entry and records it in the index of its namespace, then evicts the
+# entries with the lowest score until the namespace is within its budget. The
+# entry just stored is never evicted. Returns the evicted keys.
+#   KEYS: entry, index (sorted set), sizes (hash), usage (hash)
+#   ARGV: value, expire, score, size, max_entries, max_bytes, "1" for LFU
+STORE_SCRIPT = """
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+if ARGV[7] == '1' then
+    redis.call('ZINCRBY', KEYS[2], 1, KEYS[1])
+else
+    redis.call('ZADD', KEYS[2], ARGV[3], KEYS[1])
+end
+local old = tonumber(redis.call('HGET', KEYS[3], KEYS[1]) or '0')
+redis.call('HSET', KEYS[3], KEYS[1], ARGV[4])
+local total = redis.call('HINCRBY', KEYS[4], 'bytes', tonumber(ARGV[4]) - old)
+local max_entries = tonumber(ARGV[5])
+local max_bytes = tonumber(ARGV[6])
+local evicted = {}
+while (max_entries > 0 and redis.call('ZCARD', KEYS[2]) > max_entries)
+        or (max_bytes > 0 and total > max_bytes) do
+    local candidates = redis.call('ZRANGE', KEYS[2], 0, 1)
+    local victim = candidates[1]
+    if victim == KEYS[1] then
+        victim = candidates[2]
+    end
+    if not victim then
+        break
+    end
+    redis.call('ZREM', KEYS[2], victim)
+    redis.call('UNLINK', victim)
+    local size = tonumber(redis.call('HGET', KEYS[3], victim) or '0')
+    redis.call('HDEL', KEYS[3], victim)
+    total = redis.call('HINCRBY', KEYS[4], 'bytes', -size)
+    evicted[#evicted + 1] = victim
+end
+if #evicted > 0 then
+    redis.call('HINCRBY', KEYS[4], 'evictions', #evicted)
+end
+return evicted
+"""
+
+# Removes deleted or expired entries from the index of their namespace.
+#   KEYS: index (sorted set), sizes (hash), usage (hash)
+#   ARGV: the keys to forget
+FORGET_SCRIPT = """
+local freed = 0
+for _, key in ipairs(ARGV) do
+    if redis.call('ZREM', KEYS[1], key) == 1 then
+        freed = freed + tonumber(redis.call('HGET', KEYS[2], key) or '0')
+        redis.call('HDEL', KEYS[2], key)
+    end
+end
+if freed > 0 then
+    redis.call('HINCRBY', KEYS[3], 'bytes', -freed)
+end
+return freed
+"""
+
+
+@dataclass(frozen=True)
+class NamespaceBudget:
+    """Limits on the entries a namespace keeps in Redis.
+
+    Every entry of the namespace is indexed by its last access (LRU) or its
+    number of accesses (LFU). When a new entry brings the namespace over
+    `max_entries` entries or `max_bytes` bytes, the entries with the oldest
+    access or the fewest accesses are deleted. A limit of 0 is not enforced.
+
+    Args:
+        max_entries (`int`, optional): Maximum number of entries. Defaults to 0.
+        max_bytes (`int`, optional): Maximum total size of the stored entries.
+            Defaults to 0.
+        policy (`str`, optional): "lru" or "lfu". Defaults to "lru".
+    """
+
+    max_entries: int = 0
+    max_bytes: int = 0
+    policy: str = LRU
+
+    def __post_init__(self) -> None:
+        if self.policy not in EVICTION_POLICIES:
+            raise ValueError(
+                f"Unknown eviction policy {self.policy!r}, "
+                f"expected one of {EVICTION_POLICIES}"
+            )
+
+    @property
+    def lfu(self) -> bool:
+        return self.policy == LFU
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "policy": self.policy,
+        }
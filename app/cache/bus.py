@@ -0,0 +1,103 @@
+"""bus.py"""
+import json
+import time
+import uuid
+from typing import Iterable, List, Optional, Tuple, Union
+
+from redis import Redis
+
+from cache.adaptive import get_record_writes_args, RECORD_WRITES_SCRIPT
+from cache.key_gen import (
+    get_namespace_prefix,
+    get_tag_key,
+    get_tags,
+    get_writes_key,
+)
+
+INVALIDATION_CHANNEL = "invalidations"
+# identifies the messages published by this process
+PROCESS_ID = uuid.uuid4().hex
+
+
+def get_invalidation_channel(prefix: str) -> str:
+    """Return the pub/sub channel on which invalidated keys are announced."""
+    return f"{prefix}|{INVALIDATION_CHANNEL}"
+
+
+def encode_invalidation(
+    keys: Iterable[str] = (),
+    prefixes: Iterable[str] = (),
+    origin: Optional[str] = None,
+    denied: Iterable[str] = (),
+) -> str:
+    """Announce invalidated keys; `origin` marks a process that evicted them already.
+
+    `denied` are the keys just added to the denylist, see `Cache.deny`.
+    """
+    return json.dumps(
+        {
+            "origin": origin,
+            "keys": list(keys),
+            "prefixes": list(prefixes),
+            "denied": list(denied),
+        }
+    )
+
+
+def decode_invalidation(
+    data: Union[str, bytes]
+) -> Tuple[Optional[str], List[str], List[str], List[str]]:
+    """Return the origin, keys, key prefixes and denied keys of a message."""
+    message = json.loads(data)
+    return (
+        message["origin"],
+        message["keys"],
+        message["prefixes"],
+        message.get("denied", []),
+    )
+
+
+def invalidate_sync(
+    redis_client: Redis,
+    prefix: str,
+    namespace: Optional[str] = None,
+    tags: Iterable[str] = (),
+    keys: Iterable[str] = (),
+) -> int:
+    """Invalidate `namespace` and `tags` from a process that does not run the API.
+
+    Mirrors `Cache.invalidate` for synchronous code such as Celery tasks: the
+    tagged keys and `keys` are deleted and every API worker is told to evict them
+    from its in-process tier.
+    """
+    all_tags = get_tags(namespace, tags)
+    tag_keys = [get_tag_key(prefix, tag) for tag in all_tags]
+    keys = set(keys)
+    if not tag_keys and not keys:
+        return 0
+    if tag_keys:
+        with redis_client.pipeline(transaction=True) as pipe:
+            for tag_key in tag_keys:
+                pipe.smembers(tag_key)
+            pipe.delete(*tag_keys)
+            results = pipe.execute()
+        keys.update(
+            key.decode() if isinstance(key, bytes) else key
+            for key in set().union(*results[: len(tag_keys)])
+        )
+    keys = sorted(keys)
+    prefixes = [] if namespace is None else [get_namespace_prefix(prefix, namespace)]
+    with redis_client.pipeline(transaction=False) as pipe:
+        if keys:
+            pipe.unlink(*keys)
+        pipe.publish(
+            get_invalidation_channel(prefix), encode_invalidation(keys, prefixes)
+        )
+        if all_tags:
+            redis_client.register_script(RECORD_WRITES_SCRIPT)(
+                keys=[get_writes_key(prefix, tag) for tag in all_tags],
+                args=get_record_writes_args(time.time()),
+                client=pipe,
+            )
+        results = pipe.execute()
+    return results[0] if keys else 0
@@ -1,27 +1,85 @@
 """cache.py"""
-from ast import pattern
 import asyncio
+import math
+import random
+import time
 from datetime import timedelta
 from functools import partial, update_wrapper, wraps
 from http import HTTPStatus
-from typing import Union
+from inspect import isawaitable, Parameter, signature
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    NamedTuple,
+    Optional,
+    Set,
+    Union,
+)
 
-from fastapi import Response
+from fastapi import BackgroundTasks, Request, Response
+from fastapi.dependencies.utils import get_typed_return_annotation
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_cloned_field, create_response_field
+from pydantic.fields import ModelField
+from pydantic.utils import lenient_issubclass
+from redis.exceptions import RedisError
+from starlette.exceptions import HTTPException
 
 from cache.client import Cache
+from cache.codecs import CodecError, ResponseBody
+from cache.enums import RedisEvent
+from cache.key_gen import get_not_found_tag, KeyBuilder
 from cache.util import (
-    deserialize_json,
     ONE_DAY_IN_SECONDS,
     ONE_HOUR_IN_SECONDS,
     ONE_MONTH_IN_SECONDS,
     ONE_WEEK_IN_SECONDS,
     ONE_YEAR_IN_SECONDS,
-    serialize_json,
 )
+from cache.warm import register_warm_up
+
+LOCK_TIMEOUT_SECONDS = 10
+LOCK_WAIT_SECONDS = 3
+EARLY_REFRESH_BETA = 1.0
+RECOMPUTE_TIME_WEIGHT = 0.2
+REQUEST_PARAM = "cache_request"
+RESPONSE_PARAM = "cache_response"
+BACKGROUND_TASKS_PARAM = "cache_background_tasks"
+
+
+class CacheResult(NamedTuple):
+    """A response value with the ETag and remaining TTL of its cache entry."""
+
+    value: Any
+    etag: Optional[str]
+    ttl: int
+    hit: bool
+
+
+# strong references to refreshes started outside a request, see `schedule`
+_detached_tasks: Set[asyncio.Task] = set()
 
 
 def cache(
-    *, namespace: str | None = None, expire: int | timedelta = ONE_YEAR_IN_SECONDS
+    *,
+    namespace: str | None = None,
+    expire: int | timedelta = ONE_YEAR_IN_SECONDS,
+    min_expire: int | timedelta | None = None,
+    max_expire: int | timedelta | None = None,
+    local_expire: int | timedelta | None = None,
+    tags: Iterable[str] = (),
+    vary_by: Iterable[str] = (),
+    single_flight: bool = True,
+    lock_timeout: int = LOCK_TIMEOUT_SECONDS,
+    lock_wait: float = LOCK_WAIT_SECONDS,
+    stale_ttl: int | timedelta | None = None,
+    early_refresh_beta: float = EARLY_REFRESH_BETA,
+    warm: Iterable[Dict[str, Any]] = (),
+    not_found_ttl: int | timedelta | None = None,
+    shadow: bool = False,
 ):
     """Enable caching behavior for the decorated function.
 
@@ -29,102 +87,375 @@ def cache(
         expire (Union[int, timedelta], optional): The number of seconds
             from now when the cached response should expire. Defaults to 31,536,000
             seconds (i.e., the number of seconds in one year).
+        min_expire (Union[int, timedelta, None], optional): If `min_expire` or
+            `max_expire` is set, the TTL is picked between them from how often the
+            tags and namespace of the entry are invalidated: entries that change
+            often expire sooner. `expire` is used until invalidations were
+            observed and as the missing bound. Defaults to None.
+        max_expire (Union[int, timedelta, None], optional): See `min_expire`.
+            Defaults to None.
         namespace (str|None, optional): cache namespace for expiration usage
+        local_expire (Union[int, timedelta, None], optional): If set, responses are
+            also kept in the per-worker in-process tier for this many seconds
+            (capped by the remaining Redis TTL). Defaults to None.
+        tags (Iterable[str], optional): Entity tags recorded for every cached key,
+            as format strings filled from the endpoint arguments, e.g.
+            `"user:{user_id}"`. Keys are always tagged with their namespace too.
+        vary_by (Iterable[str], optional): Attributes of endpoint arguments that the
+            response depends on, added to the key even if the argument type is
+            ignored, e.g. `["current_user.is_superuser"]` to cache one response per
+            role. Defaults to ().
+        single_flight (bool, optional): Collapse concurrent misses for the same key
+            so the wrapped function runs once: callers in the same worker share
+            one evaluation and other workers wait on a Redis lock. Defaults to True.
+        lock_timeout (int, optional): Seconds after which the Redis lock taken for
+            a recomputation expires. Defaults to 10.
+        lock_wait (float, optional): Maximum number of seconds a worker waits for
+            another worker's recomputation before evaluating the function itself.
+            Defaults to 3.
+        stale_ttl (Union[int, timedelta, None], optional): If set, entries are kept
+            for this many seconds after `expire`. During that window the stale
+            response is returned immediately and refreshed in the background
+            (stale-while-revalidate). Defaults to None.
+        early_refresh_beta (float, optional): Weight of the probabilistic early
+            refresh: a fresh entry is refreshed in the background with a
+            probability that rises as its expiry approaches, scaled by how long the
+            function takes to evaluate (XFetch). Set to 0 to disable. Defaults to 1.
+        warm (Iterable[Dict[str, Any]], optional): Argument sets precomputed by
+            `cache.warm.warm_up` at startup and on a schedule, e.g.
+            `[{"skip": 0, "limit": 100}]`. Defaults to ().
+        not_found_ttl (Union[int, timedelta, None], optional): If set, a 404 raised
+            by the function is rendered by the application's exception handler and
+            the response is cached for this many seconds, tagged with
+            `get_not_found_tag(namespace)`. Endpoints creating the entity should
+            invalidate that tag. Defaults to None.
+        shadow (bool, optional): Evaluate caching without enabling it: the live
+            response is always returned, while the would-be hits and misses and
+            the hits whose recorded response differs from the live one are
+            counted in the endpoint metrics. Defaults to False.
     """
+    local_ttl = calculate_ttl(local_expire) if local_expire else 0
+    stale_seconds = calculate_ttl(stale_ttl) if stale_ttl else 0
+    not_found_seconds = calculate_ttl(not_found_ttl) if not_found_ttl else 0
+    adaptive = min_expire is not None or max_expire is not None
+    min_seconds = calculate_ttl(expire if min_expire is None else min_expire)
+    max_seconds = calculate_ttl(expire if max_expire is None else max_expire)
+    if min_seconds > max_seconds:
+        raise ValueError("min_expire must not be greater than max_expire")
 
     def outer_wrapper(func):
+        # moving average of the evaluation time of `func`, used by the early refresh
+        recompute_time = 0.0
+        key_builder = KeyBuilder(func, vary_by)
+        response_field = get_response_field(func)
+        metrics = Cache.metrics.endpoint(namespace, key_builder.name)
+
         @wraps(func)
         async def inner_wrapper(*args, **kwargs):
             """Return cached value if one exists, otherwise evaluate the wrapped function and cache the result."""
-
-            func_kwargs = kwargs.copy()
-            request = func_kwargs.pop("request", None)
-            response = func_kwargs.pop("response", None)
-            create_response_directly = not response
-            if create_response_directly:
-                response = Response()
+            background_tasks = kwargs.pop(BACKGROUND_TASKS_PARAM, None)
+            request = kwargs.pop(REQUEST_PARAM, None)
+            response = kwargs.pop(RESPONSE_PARAM, None)
             redis_cache = Cache()
             if redis_cache.not_connected or redis_cache.request_is_not_cacheable(
                 request
             ):
                 # if the redis client is not connected or request is not cacheable, no caching behavior is performed.
                 return await get_api_response_async(func, *args, **kwargs)
-            key = redis_cache.get_cache_key(func, namespace, *args, **kwargs)
-            ttl, in_cache = await redis_cache.check_cache(key)
-            if in_cache:
-                return deserialize_json(in_cache)
-                redis_cache.set_response_headers(
-                    response, True, deserialize_json(in_cache), ttl
+            key = redis_cache.get_cache_key(key_builder, namespace, *args, **kwargs)
+
+            def respond(result: CacheResult):
+                """Set the caching headers; answer 304 if the client has the entry."""
+                if result.etag is None or response is None:
+                    return to_response(result.value)
+                redis_cache.set_response_headers(response, result.hit, result.etag)
+                if redis_cache.requested_resource_not_modified(request, result.etag):
+                    return Response(
+                        status_code=int(HTTPStatus.NOT_MODIFIED),
+                        headers=dict(response.headers),
+                    )
+                return to_response(result.value, dict(response.headers))
+
+            def load(ttl: int, in_cache: bytes) -> CacheResult:
+                """Decode a value found in Redis, keeping it in the in-process tier."""
+                not_found = redis_cache.get_not_found_response(in_cache)
+                if not_found is not None:
+                    # recorded by `record_not_found`, replayed without caching headers
+                    metrics.not_found_hits += 1
+                    metrics.bytes_read += len(in_cache)
+                    return CacheResult(not_found, None, ttl, True)
+                fresh_ttl = ttl - stale_seconds if ttl >= 0 else ttl
+                started = time.perf_counter()
+                if local_ttl and ttl != -2:
+                    # a ttl of -1 means the redis key never expires
+                    value, etag = redis_cache.add_to_local_cache(
+                        key,
+                        in_cache,
+                        local_ttl if ttl == -1 else min(local_ttl, fresh_ttl),
+                        namespace,
+                        ttl=fresh_ttl,
+                    )
+                else:
+                    value = redis_cache.deserialize_response(in_cache)
+                    etag = redis_cache.get_etag(in_cache)
+                metrics.decode.observe(time.perf_counter() - started)
+                metrics.bytes_read += len(in_cache)
+                return CacheResult(value, etag, max(fresh_ttl, -1), True)
+
+            async def compute() -> CacheResult:
+                nonlocal recompute_time
+                started = time.perf_counter()
+                try:
+                    response_data = await get_api_response_async(func, *args, **kwargs)
+                except HTTPException as e:
+                    if (
+                        not not_found_seconds
+                        or e.status_code != HTTPStatus.NOT_FOUND
+                        or request is None
+                    ):
+                        raise
+                    return await record_not_found(e)
+                # cache the body FastAPI would send, so hits skip the validation
+                rendered = await render_response(response_field, response_data)
+                elapsed = time.perf_counter() - started
+                recompute_time += (
+                    RECOMPUTE_TIME_WEIGHT * (elapsed - recompute_time)
+                    if recompute_time
+                    else elapsed
                 )
-                if redis_cache.requested_resource_not_modified(request, in_cache):
-                    response.status_code = int(HTTPStatus.NOT_MODIFIED)
-                    return (
-                        Response(
-                            content=None,
-                            status_code=response.status_code,
-                            media_type="application/json",
-                            headers=response.headers,
+                ttl = calculate_ttl(expire)
+                entry_tags = format_tags(tags, kwargs)
+                try:
+                    if adaptive:
+                        ttl = await redis_cache.get_adaptive_ttl(
+                            namespace, entry_tags, ttl, min_seconds, max_seconds
                         )
-                        if create_response_directly
-                        else response
+                    etag = await redis_cache.add_to_cache(
+                        key,
+                        rendered,
+                        ttl,
+                        local_expire=local_ttl,
+                        namespace=namespace,
+                        tags=entry_tags,
+                        stale_expire=stale_seconds,
+                        metrics=metrics,
                     )
-                return (
-                    Response(
-                        content=in_cache,
-                        media_type="application/json",
-                        headers=response.headers,
+                except RedisError as e:
+                    # the value is still returned, only uncached
+                    redis_cache.record_failure(e)
+                    etag = None
+                return CacheResult(ResponseBody(rendered.body), etag, ttl, False)
+
+            async def compare_in_shadow():
+                """Serve the live response, recording what caching would have done."""
+                started = time.perf_counter()
+                response_data = await get_api_response_async(func, *args, **kwargs)
+                elapsed = time.perf_counter() - started
+                entry_tags = format_tags(tags, kwargs)
+                try:
+                    ttl = calculate_ttl(expire)
+                    if adaptive:
+                        ttl = await redis_cache.get_adaptive_ttl(
+                            namespace, entry_tags, ttl, min_seconds, max_seconds
+                        )
+                    same = await redis_cache.compare_shadow(
+                        key, response_data, ttl, namespace, entry_tags
                     )
-                    if create_response_directly
-                    else deserialize_json(in_cache)
-                )
-            response_data = await get_api_response_async(func, *args, **kwargs)
-            ttl = calculate_ttl(expire)
-            
-            cached = await redis_cache.add_to_cache(key, response_data, ttl)
-            return response_data
-            if cached:
-                redis_cache.set_response_headers(
-                    response, cache_hit=False, response_data=response_data, ttl=ttl
-                )
-                return (
-                    Response(
-                        content=serialize_json(response_data),
-                        media_type="application/json",
-                        headers=response.headers,
+                except CodecError:
+                    metrics.store_errors += 1
+                    return response_data
+                except RedisError as e:
+                    redis_cache.record_failure(e)
+                    return response_data
+                if same is None:
+                    metrics.shadow_misses += 1
+                    return response_data
+                metrics.shadow_hits += 1
+                metrics.shadow_saved_us += int(elapsed * 1e6)
+                if not same:
+                    metrics.shadow_diverged += 1
+                return response_data
+
+            async def record_not_found(error: HTTPException) -> CacheResult:
+                """Cache the response rendered for a 404 for `not_found_ttl` seconds."""
+                not_found = await render_exception(request, error)
+                if not_found is None:
+                    raise error
+                try:
+                    await redis_cache.add_not_found_to_cache(
+                        key,
+                        not_found,
+                        not_found_seconds,
+                        namespace=namespace,
+                        tags=[*format_tags(tags, kwargs), get_not_found_tag(namespace)],
                     )
-                    if create_response_directly
-                    else response_data
-                )
-            return response_data
+                except RedisError as e:
+                    redis_cache.record_failure(e)
+                return CacheResult(not_found, None, not_found_seconds, False)
+
+            async def refresh(observed_ttl: int):
+                """Recompute a stale entry unless another worker is already doing it."""
+                try:
+                    lock = await redis_cache.acquire_lock(key, lock_timeout)
+                except RedisError as e:
+                    redis_cache.record_failure(e)
+                    return
+                if lock is None:
+                    return
+                try:
+                    ttl, _ = await redis_cache.check_cache(key)
+                    if ttl > observed_ttl:
+                        # refreshed by someone else since it was read
+                        return
+                    await compute()
+                    redis_cache.log(RedisEvent.KEY_REFRESHED, key=key)
+                except RedisError as e:
+                    redis_cache.record_failure(e)
+                except Exception as e:
+                    redis_cache.log(
+                        RedisEvent.FAILED_TO_REFRESH_KEY, msg=str(e), key=key
+                    )
+                finally:
+                    await redis_cache.release_lock(lock)
+
+            async def compute_once() -> CacheResult:
+                """Recompute under a Redis lock so only one worker hits the database."""
+                lock = await redis_cache.acquire_lock(key, lock_timeout)
+                if lock is None:
+                    ttl, in_cache = await redis_cache.wait_for_cache(key, lock_wait)
+                    if in_cache:
+                        return load(ttl, in_cache)
+                    return await compute()
+                try:
+                    # the previous lock holder may have stored the value already
+                    ttl, in_cache = await redis_cache.check_cache(key)
+                    if in_cache:
+                        return load(ttl, in_cache)
+                    return await compute()
+                finally:
+                    await redis_cache.release_lock(lock)
+
+            if shadow:
+                return await compare_in_shadow()
+
+            if local_ttl:
+                in_local = redis_cache.check_local_cache(key, namespace)
+                if in_local is not None:
+                    metrics.hits += 1
+                    metrics.local_hits += 1
+                    return respond(CacheResult(*in_local, hit=True))
+
+            try:
+                started = time.perf_counter()
+                ttl, in_cache = await redis_cache.check_cache(key, namespace)
+                metrics.redis.observe(time.perf_counter() - started)
+                if in_cache:
+                    result = load(ttl, in_cache)
+                    metrics.hits += 1
+                    if result.etag is None:
+                        # a cached 404 has no stale window and is never refreshed
+                        return result.value
+                    stale = ttl >= 0 and result.ttl <= 0
+                    if stale:
+                        metrics.stale_hits += 1
+                    if stale or (
+                        ttl >= 0
+                        and should_refresh_early(
+                            result.ttl, recompute_time, early_refresh_beta
+                        )
+                    ):
+                        schedule(
+                            background_tasks,
+                            redis_cache.in_flight.do,
+                            f"{key}:refresh",
+                            partial(refresh, ttl),
+                        )
+                    return respond(result)
+
+                metrics.misses += 1
+                if not single_flight:
+                    return respond(await compute())
+                return respond(await redis_cache.in_flight.do(key, compute_once))
+            except RedisError as e:
+                # Redis failed before the function was evaluated: the errors after
+                # it are handled by `compute` and `Cache.release_lock`
+                redis_cache.record_failure(e)
+                return await get_api_response_async(func, *args, **kwargs)
 
+        async def warm_wrapper(background_tasks: BackgroundTasks, **kwargs):
+            """Evaluate `inner_wrapper` for `cache.warm.warm_up`."""
+            kwargs[BACKGROUND_TASKS_PARAM] = background_tasks
+            return await inner_wrapper(**kwargs)
+
+        if warm:
+            register_warm_up(
+                key_builder.name, warm_wrapper, key_builder.signature, list(warm)
+            )
+        inject_parameters(
+            inner_wrapper,
+            func,
+            Parameter(REQUEST_PARAM, Parameter.KEYWORD_ONLY, annotation=Request),
+            Parameter(RESPONSE_PARAM, Parameter.KEYWORD_ONLY, annotation=Response),
+            Parameter(
+                BACKGROUND_TASKS_PARAM,
+                Parameter.KEYWORD_ONLY,
+                annotation=BackgroundTasks,
+            ),
+        )
         return inner_wrapper
 
     return outer_wrapper
 
 
-def invalidate(*, namespace: str | None = None):
+def invalidate(*, namespace: str | None = None, tags: Iterable[str] = ()):
     """Enable cache invalidating behavior for the decorated function.
 
+    The cached keys are deleted after the decorated function returns, so a
+    concurrent read can not cache the data from before the change.
+
     Args:
         namespace (str|None, optional): cache namespace for expiration usage
+        tags (Iterable[str], optional): Entity tags to invalidate, as format strings
+            filled from the endpoint arguments, e.g. `"user:{user_id}"`.
     """
 
     def outer_wrapper(func):
         @wraps(func)
         async def inner_wrapper(*args, **kwargs):
-            """delete cached namespace."""
-            redis_cache = Cache()
-            if redis_cache.connected:
-                # if the redis client is not connected no caching behavior is performed.
-                pattern = redis_cache.get_cache_key_pattern(namespace)
-                await redis_cache.invalidate(pattern)
-            return await get_api_response_async(func, *args, **kwargs)
+            """delete cached namespace and tags."""
+            response_data = await get_api_response_async(func, *args, **kwargs)
+            await invalidate_tags(namespace=namespace, tags=format_tags(tags, kwargs))
+            return response_data
 
         return inner_wrapper
 
     return outer_wrapper
 
 
+async def invalidate_tags(
+    *, namespace: str | None = None, tags: Iterable[str] = ()
+) -> None:
+    """Delete the cached keys of `namespace` and `tags`.
+
+    For endpoints whose tags are only known after a lookup, e.g. the book of a
+    borrow record. Call it after the change is committed.
+
+    Args:
+        namespace (str|None, optional): cache namespace for expiration usage
+        tags (Iterable[str], optional): Entity tags to invalidate.
+    """
+    redis_cache = Cache()
+    if not redis_cache.connected:
+        # if the redis client is not connected no caching behavior is performed.
+        return
+    try:
+        await redis_cache.invalidate(namespace, tags)
+    except RedisError as e:
+        # the cached keys expire with their TTL
+        redis_cache.record_failure(e)
+        redis_cache.log(RedisEvent.FAILED_TO_INVALIDATE, msg=repr(e))
+
+
 async def get_api_response_async(func, *args, **kwargs):
     """Helper function that allows decorator to work with both async and non-async functions."""
     return (
@@ -134,6 +465,84 @@ async def get_api_response_async(func, *args, **kwargs):
     )
 
 
+def get_response_field(func: Callable) -> Optional[ModelField]:
+    """Return the field FastAPI validates the return value of `func` with.
+
+    Like FastAPI, the return annotation is the response model unless it is a
+    `Response`. The `response_model` arguments of the route are not seen here.
+    """
+    annotation = get_typed_return_annotation(func)
+    if annotation is None or lenient_issubclass(annotation, Response):
+        return None
+    field = create_response_field(name=f"Response_{func.__name__}", type_=annotation)
+    # drops the attributes of subclasses that the model does not declare
+    return create_cloned_field(field)
+
+
+async def render_response(field: Optional[ModelField], value: Any) -> Response:
+    """Validate `value` against the response model and render it as FastAPI does."""
+    if isinstance(value, Response):
+        return value
+    return JSONResponse(await serialize_response(field=field, response_content=value))
+
+
+def to_response(value: Any, headers: Optional[Dict[str, str]] = None) -> Any:
+    """Send a rendered body as is, so FastAPI neither validates nor encodes it."""
+    if isinstance(value, ResponseBody):
+        return Response(value, media_type=JSONResponse.media_type, headers=headers)
+    return value
+
+
+async def render_exception(request: Request, exc: Exception) -> Optional[Response]:
+    """Render `exc` with the handler the application registered for its type."""
+    handlers = getattr(request.scope.get("app"), "exception_handlers", {})
+    for exc_type in type(exc).__mro__:
+        if exc_type in handlers:
+            response = handlers[exc_type](request, exc)
+            return await response if isawaitable(response) else response
+    return None
+
+
+def inject_parameters(wrapper: Callable, func: Callable, *params: Parameter) -> None:
+    """Expose extra keyword-only parameters in the signature FastAPI sees.
+
+    FastAPI resolves `Request`, `Response` and `BackgroundTasks` parameters by
+    their annotation, so the decorator can receive them without the endpoint
+    declaring them. The wrapper must pop them before calling `func`.
+    """
+    sig = signature(func)
+    wrapper.__signature__ = sig.replace(
+        parameters=[
+            *sig.parameters.values(),
+            *(param for param in params if param.name not in sig.parameters),
+        ]
+    )
+
+
+def schedule(
+    background_tasks: BackgroundTasks | None, fn: Callable, *args: Any
+) -> None:
+    """Run `fn` after the response is sent, or as a detached task outside requests."""
+    if background_tasks is not None:
+        background_tasks.add_task(fn, *args)
+        return
+    task = asyncio.ensure_future(fn(*args))
+    _detached_tasks.add(task)
+    task.add_done_callback(_detached_tasks.discard)
+
+
+def should_refresh_early(fresh_ttl: int, recompute_time: float, beta: float) -> bool:
+    """XFetch: refresh before expiry with a probability that rises towards it."""
+    if not beta or not recompute_time:
+        return False
+    return -recompute_time * beta * math.log(1.0 - random.random()) >= fresh_ttl
+
+
+def format_tags(tags: Iterable[str], kwargs: dict) -> list[str]:
+    """Fill the tag templates with the values of the endpoint arguments."""
+    return [tag.format(**kwargs) for tag in tags]
+
+
 def calculate_ttl(expire: Union[int, timedelta]) -> int:
     """ "Converts expire time to total seconds and ensures that ttl is capped at one year."""
     if isinstance(expire, timedelta):
@@ -1,20 +1,129 @@
+import asyncio
 import json
 import logging
-from datetime import datetime, timedelta
-from typing import Callable, Dict, List, Optional, Tuple, Type, Union
+import random
+import time
+from datetime import datetime
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
 
 from fastapi import Request, Response
 from redis.asyncio import client
+from redis.commands.core import AsyncScript
+from redis.asyncio.lock import Lock
+from redis.exceptions import ConnectionError, LockError, RedisError
 
+from cache.breaker import (
+    CircuitBreaker,
+    DEFAULT_FAILURE_THRESHOLD,
+    DEFAULT_RESET_TIMEOUT,
+)
+from cache.adaptive import (
+    choose_ttl,
+    get_record_writes_args,
+    RECORD_WRITES_SCRIPT,
+)
+from cache.bloom import (
+    BloomFilter,
+    DEFAULT_BLOOM_CAPACITY,
+    DEFAULT_BLOOM_ERROR_RATE,
+)
+from cache.budget import (
+    DEFAULT_BUDGET_PRUNE_INTERVAL,
+    FORGET_SCRIPT,
+    NamespaceBudget,
+    STORE_SCRIPT,
+)
+from cache.bus import (
+    decode_invalidation,
+    encode_invalidation,
+    get_invalidation_channel,
+    PROCESS_ID,
+)
+from cache.codecs import (
+    Codec,
+    CodecError,
+    decode,
+    decode_response,
+    encode,
+    get_codec,
+    JSONCodec,
+    ResponseBodyCodec,
+)
+from cache.compression import (
+    CompressionPolicy,
+    decompress,
+    DEFAULT_COMPRESSION_THRESHOLD,
+    get_compressor,
+    NONE,
+)
+from cache.entry import (
+    get_digest,
+    pack_entry,
+    pack_not_found,
+    unpack_entry,
+    unpack_not_found,
+)
 from cache.enums import RedisEvent, RedisStatus
-from cache.key_gen import get_cache_key, get_cache_key_pattern
-from cache.redis import redis_connect
-from cache.util import serialize_json
+from cache.flight import SingleFlight
+from cache.key_gen import (
+    DEFAULT_MAX_KEY_LENGTH,
+    get_budget_keys,
+    get_cache_key_pattern,
+    get_denylist_key,
+    get_ignored_arg_types,
+    get_namespace_prefix,
+    get_shadow_key,
+    get_tag_key,
+    get_tag_keys,
+    get_tags,
+    get_writes_key,
+    KeyBuilder,
+)
+from cache.local import (
+    DEFAULT_LOCAL_MAX_BYTES,
+    DEFAULT_LOCAL_MAX_ENTRIES,
+    LocalCache,
+)
+from cache.metrics import CacheMetrics, EndpointMetrics
+from cache.redis import (
+    DEFAULT_MAX_CONNECTIONS,
+    DEFAULT_SOCKET_TIMEOUT,
+    redis_connect,
+)
+from cache.util import ONE_YEAR_IN_SECONDS
 
 DEFAULT_RESPONSE_HEADER = "X-FastAPI-Cache"
 ALLOWED_HTTP_TYPES = ["GET"]
 LOG_TIMESTAMP = "%m/%d/%Y %I:%M:%S %p"
-HTTP_TIME = "%a, %d %b %Y %H:%M:%S GMT"
+CACHE_CONTROL = "private, no-cache"
+LEGACY_SCAN_DONE_TAG = "legacy-scan-done"
+SCAN_BATCH_SIZE = 500
+LOCK_KEY_PREFIX = "lock"
+LOCK_POLL_INTERVAL = 0.05
+METRICS_KEY_PREFIX = "metrics"
+RECONNECT_MIN_DELAY = 0.5
+RECONNECT_MAX_DELAY = 30.0
+INVALIDATION_POLL_TIMEOUT = 1.0
+DEFAULT_DENYLIST_RELOAD_INTERVAL = 3600.0
+# events that can occur on every request are only logged at DEBUG level
+DEBUG_EVENTS = (
+    RedisEvent.KEY_ADDED_TO_CACHE,
+    RedisEvent.KEY_FOUND_IN_CACHE,
+    RedisEvent.KEY_REFRESHED,
+    RedisEvent.REDIS_ERROR,
+)
 
 logging.basicConfig()
 logger = logging.getLogger(__name__)
@@ -40,10 +149,33 @@ class Cache(metaclass=MetaSingleton):
     response_header: str = None
     status: RedisStatus = RedisStatus.NONE
     redis: client.Redis = None
+    local: LocalCache = LocalCache(max_entries=0, max_bytes=0)
+    codec: Codec = JSONCodec()
+    compression: CompressionPolicy = CompressionPolicy(None)
+    in_flight: SingleFlight = SingleFlight()
+    metrics: CacheMetrics = CacheMetrics()
+    metrics_flush_interval: float = 0
+    breaker: CircuitBreaker = CircuitBreaker()
+    reconnect_task: Optional[asyncio.Task] = None
+    background_tasks: List[asyncio.Task] = []
+    max_connections: int = DEFAULT_MAX_CONNECTIONS
+    socket_timeout: Optional[float] = DEFAULT_SOCKET_TIMEOUT
+    ignored_arg_types: FrozenSet[Type[object]] = get_ignored_arg_types(None)
+    max_key_length: int = DEFAULT_MAX_KEY_LENGTH
+    key_builders: Dict[Callable, KeyBuilder] = {}
+    budgets: Dict[str, NamespaceBudget] = {}
+    budget_prune_interval: float = DEFAULT_BUDGET_PRUNE_INTERVAL
+    store_script: Optional[AsyncScript] = None
+    forget_script: Optional[AsyncScript] = None
+    record_writes_script: Optional[AsyncScript] = None
+    denylist: BloomFilter = BloomFilter(capacity=1)
+    denylist_loaded: bool = False
+    denylist_reload_interval: float = DEFAULT_DENYLIST_RELOAD_INTERVAL
 
     @property
     def connected(self):
-        return self.status == RedisStatus.CONNECTED
+        """True if Redis is reachable and the circuit breaker lets requests through."""
+        return self.status == RedisStatus.CONNECTED and self.breaker.allow_request()
 
     @property
     def not_connected(self):
@@ -55,6 +187,22 @@ class Cache(metaclass=MetaSingleton):
         prefix: Optional[str] = None,
         response_header: Optional[str] = None,
         ignore_arg_types: Optional[List[Type[object]]] = None,
+        local_max_entries: int = DEFAULT_LOCAL_MAX_ENTRIES,
+        local_max_bytes: int = DEFAULT_LOCAL_MAX_BYTES,
+        codec: str = JSONCodec.name,
+        compression: str = NONE,
+        compression_threshold: int = DEFAULT_COMPRESSION_THRESHOLD,
+        max_key_length: int = DEFAULT_MAX_KEY_LENGTH,
+        metrics_flush_interval: float = 0,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        socket_timeout: Optional[float] = DEFAULT_SOCKET_TIMEOUT,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout: float = DEFAULT_RESET_TIMEOUT,
+        budgets: Optional[Mapping[str, NamespaceBudget]] = None,
+        budget_prune_interval: float = DEFAULT_BUDGET_PRUNE_INTERVAL,
+        denylist_capacity: int = DEFAULT_BLOOM_CAPACITY,
+        denylist_error_rate: float = DEFAULT_BLOOM_ERROR_RATE,
+        denylist_reload_interval: float = DEFAULT_DENYLIST_RELOAD_INTERVAL,
     ) -> None:
         """Connect to a Redis database using `host_url` and configure cache settings.
 
@@ -69,19 +217,99 @@ class Cache(metaclass=MetaSingleton):
                 are any arguments that have no effect on the response (such as a
                 `Request` or `Response` object), including their type in this list
                 will ignore those arguments when the key is created. Defaults to None.
+            local_max_entries (int, optional): Maximum number of entries kept in the
+                per-worker in-process tier. Set to 0 to disable it. Defaults to 1024.
+            local_max_bytes (int, optional): Maximum total size of the serialized
+                payloads kept in the in-process tier. Defaults to 16 MiB.
+            codec (str, optional): Name of the codec used to serialize new entries
+                ("json", "orjson" or "msgpack"). Responses are stored as their
+                rendered body instead, see `ResponseBodyCodec`. Entries written with
+                any registered codec can always be read. Defaults to "json".
+            compression (str, optional): Compressor for large values ("zlib", "lz4",
+                "zstd", "auto" for the best one installed, or "none").
+                Defaults to "none".
+            compression_threshold (int, optional): Encoded values of at least this
+                many bytes are compressed. Defaults to 1024.
+            max_key_length (int, optional): Keys longer than this are stored under a
+                fixed-length digest of the endpoint arguments. Defaults to 256.
+            metrics_flush_interval (float, optional): If set, the metrics of this
+                worker are added to the totals kept in Redis every this many seconds.
+                Defaults to 0.
+            max_connections (int, optional): Size of the Redis connection pool.
+                Defaults to 50.
+            socket_timeout (float, optional): Seconds to wait for a connection, a
+                free connection in the pool or a reply. Defaults to 5.
+            failure_threshold (int, optional): Consecutive Redis errors after which
+                the cache is bypassed for `reset_timeout` seconds. Defaults to 5.
+            reset_timeout (float, optional): Cool-down window of the circuit
+                breaker, in seconds. Defaults to 30.
+            budgets (Mapping[str, NamespaceBudget], optional): Limits on the number
+                and size of the entries kept in Redis, by namespace. Entries over
+                budget are evicted LRU or LFU. Defaults to None.
+            budget_prune_interval (float, optional): Seconds between the removals
+                of expired entries from the budget indexes. Defaults to 60.
+            denylist_capacity (int, optional): Expected number of denied keys, see
+                `deny`. Defaults to 100000.
+            denylist_error_rate (float, optional): Rate of the allowed keys that
+                `is_denied` looks up in Redis at `denylist_capacity` denied keys.
+                Defaults to 0.001.
+            denylist_reload_interval (float, optional): Seconds between the
+                rebuilds of the denylist filter, which drop the expired keys, 0 to
+                only rebuild it when subscribing. Defaults to 3600.
         """
         self.host_url = host_url
         self.prefix = prefix
         self.response_header = response_header or DEFAULT_RESPONSE_HEADER
         self.ignore_arg_types = ignore_arg_types
+        self.ignored_arg_types = get_ignored_arg_types(ignore_arg_types)
+        self.max_key_length = max_key_length
+        self.key_builders = {}
+        self.max_connections = max_connections
+        self.socket_timeout = socket_timeout
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.local = LocalCache(
+            max_entries=local_max_entries, max_bytes=local_max_bytes
+        )
+        try:
+            self.codec = get_codec(codec)
+        except CodecError as e:  # pragma: no cover
+            self.log(RedisEvent.CODEC_UNAVAILABLE, msg=f"{e}, falling back to json")
+            self.codec = get_codec(JSONCodec.name)
+        try:
+            compressor = get_compressor(compression)
+        except ValueError as e:
+            self.log(
+                RedisEvent.COMPRESSOR_UNAVAILABLE,
+                msg=f"{e}, falling back to no compression",
+            )
+            compressor = get_compressor(NONE)
+        self.compression = CompressionPolicy(compressor, compression_threshold)
+        self.metrics_flush_interval = metrics_flush_interval
+        self.budgets = dict(budgets or {})
+        self.budget_prune_interval = budget_prune_interval
+        self.denylist = BloomFilter(denylist_capacity, denylist_error_rate)
+        self.denylist_loaded = False
+        self.denylist_reload_interval = denylist_reload_interval
+        self.stop_background_tasks()
         await self._connect()
+        if self.status == RedisStatus.CONN_ERROR:
+            self.reconnect_task = asyncio.ensure_future(self.reconnect())
+        elif self.status == RedisStatus.CONNECTED:
+            self.start_background_tasks()
 
     async def _connect(self):
         self.log(
             RedisEvent.CONNECT_BEGIN, msg="Attempting to connect to Redis server..."
         )
-        self.status, self.redis = await redis_connect(self.host_url)
+        self.status, self.redis = await redis_connect(
+            self.host_url, self.max_connections, self.socket_timeout
+        )
         if self.status == RedisStatus.CONNECTED:
+            self.store_script = self.redis.register_script(STORE_SCRIPT)
+            self.forget_script = self.redis.register_script(FORGET_SCRIPT)
+            self.record_writes_script = self.redis.register_script(
+                RECORD_WRITES_SCRIPT
+            )
             self.log(
                 RedisEvent.CONNECT_SUCCESS, msg="Redis client is connected to server."
             )
@@ -96,6 +324,53 @@ class Cache(metaclass=MetaSingleton):
                 msg="Redis server did not respond to PING message.",
             )
 
+    async def reconnect(self) -> None:
+        """Retry connecting with exponential backoff until Redis is reachable."""
+        delay = RECONNECT_MIN_DELAY
+        while self.status == RedisStatus.CONN_ERROR:
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+            await self._connect()
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+        if self.status == RedisStatus.CONNECTED:
+            self.breaker.record_success()
+            self.start_background_tasks()
+
+    def start_background_tasks(self) -> None:
+        """Start the tasks that run for as long as the client is connected."""
+        # also keeps the denylist filter current, so it runs without a local tier
+        self.background_tasks.append(
+            asyncio.ensure_future(self.listen_for_invalidations())
+        )
+        if self.metrics_flush_interval:
+            self.background_tasks.append(
+                asyncio.ensure_future(
+                    self.flush_metrics_periodically(self.metrics_flush_interval)
+                )
+            )
+        if self.budgets and self.budget_prune_interval:
+            self.background_tasks.append(
+                asyncio.ensure_future(
+                    self.prune_budgets_periodically(self.budget_prune_interval)
+                )
+            )
+
+    def stop_background_tasks(self) -> None:
+        for task in (self.reconnect_task, *self.background_tasks):
+            if task is not None:
+                task.cancel()
+        self.reconnect_task = None
+        self.background_tasks = []
+
+    def record_failure(self, error: Exception) -> None:
+        """Count a failed Redis call towards opening the circuit breaker."""
+        self.log(RedisEvent.REDIS_ERROR, msg=repr(error))
+        if self.breaker.record_failure():
+            self.log(
+                RedisEvent.CIRCUIT_OPENED,
+                msg=f"{repr(error)}, bypassing the cache for "
+                f"{self.breaker.reset_timeout} seconds",
+            )
+
     def request_is_not_cacheable(self, request: Request) -> bool:
         return request and (
             request.method not in ALLOWED_HTTP_TYPES
@@ -105,26 +380,140 @@ class Cache(metaclass=MetaSingleton):
             )
         )
 
+    def get_key_builder(self, func: Callable) -> KeyBuilder:
+        """Return the key builder for `func`, compiling it on first use."""
+        key_builder = self.key_builders.get(func)
+        if key_builder is None:
+            key_builder = self.key_builders[func] = KeyBuilder(func)
+        return key_builder
+
     def get_cache_key(
-        self, func: Callable, namespace: str, *args: List, **kwargs: Dict
+        self,
+        func: Union[Callable, KeyBuilder],
+        namespace: str,
+        *args: List,
+        **kwargs: Dict,
     ) -> str:
-        return get_cache_key(
-            f"{self.prefix}|{namespace}", self.ignore_arg_types, func, *args, **kwargs
+        if not isinstance(func, KeyBuilder):
+            func = self.get_key_builder(func)
+        return func(
+            self.get_cache_key_prefix(namespace),
+            self.ignored_arg_types,
+            args,
+            kwargs,
+            self.max_key_length,
         )
 
     def get_cache_key_pattern(self, namespace: str) -> str:
         return get_cache_key_pattern(f"{self.prefix}|{namespace}")
 
-    async def check_cache(self, key: str) -> Tuple[int, str]:
+    def get_cache_key_prefix(self, namespace: str) -> str:
+        return get_namespace_prefix(self.prefix, namespace)
+
+    def get_tag_key(self, tag: str) -> str:
+        """Return the name of the Redis set that indexes every key carrying `tag`."""
+        return get_tag_key(self.prefix, tag)
+
+    def get_tag_keys(
+        self, namespace: Optional[str] = None, tags: Iterable[str] = ()
+    ) -> List[str]:
+        return get_tag_keys(self.prefix, namespace, tags)
+
+    async def check_cache(
+        self, key: str, namespace: Optional[str] = None
+    ) -> Tuple[int, str]:
+        """Return the remaining TTL and the entry of `key`.
+
+        Pass the `namespace` of the key to record the access in its budget index.
+        """
+        budget = self.budgets.get(namespace)
         async with self.redis.pipeline() as pipe:
-            ttl, in_cache = await pipe.ttl(key).get(key).execute()
+            pipe.ttl(key).get(key)
+            if budget is not None:
+                # only entries that are still indexed are updated
+                index_key, _, _ = get_budget_keys(self.prefix, namespace)
+                if budget.lfu:
+                    pipe.zadd(index_key, {key: 1}, xx=True, incr=True)
+                else:
+                    pipe.zadd(index_key, {key: time.time()}, xx=True)
+            ttl, in_cache, *_ = await pipe.execute()
+            self.breaker.record_success()
             if in_cache:
                 self.log(RedisEvent.KEY_FOUND_IN_CACHE, key=key)
             return (ttl, in_cache)
 
-    def requested_resource_not_modified(
-        self, request: Request, cached_data: str
-    ) -> bool:
+    def check_local_cache(
+        self, key: str, namespace: Optional[str] = None
+    ) -> Optional[Tuple[Any, str, int]]:
+        """Return the value, ETag and remaining TTL of `key` in the in-process tier."""
+        in_local = self.local.get(key, namespace)
+        if in_local is None:
+            return None
+        value, etag, expires_at = in_local
+        return (value, etag, max(int(expires_at - time.monotonic()), 0))
+
+    def add_to_local_cache(
+        self,
+        key: str,
+        in_cache: Union[str, bytes],
+        expire: int,
+        namespace: Optional[str] = None,
+        ttl: int = -1,
+    ) -> Tuple[Any, str]:
+        """Decode `in_cache` once and keep the result in the in-process tier.
+
+        `expire` is the lifetime of the local entry and `ttl` the remaining TTL of
+        the Redis entry (-1 if it does not expire), used for the response headers.
+        """
+        etag = self.get_etag(in_cache)
+        value = self.deserialize_response(in_cache)
+        expires_at = time.monotonic() + (ttl if ttl >= 0 else expire)
+        self.local.set(key, (value, etag, expires_at), len(in_cache), expire, namespace)
+        return (value, etag)
+
+    def get_lock_key(self, key: str) -> str:
+        return f"{self.prefix}|{LOCK_KEY_PREFIX}:{key}"
+
+    async def acquire_lock(self, key: str, timeout: int) -> Optional[Lock]:
+        """Try to take the recomputation lock for `key` without blocking.
+
+        Returns the held lock, or None if another worker already holds it.
+        """
+        lock = self.redis.lock(
+            self.get_lock_key(key), timeout=timeout, blocking=False
+        )
+        return lock if await lock.acquire() else None
+
+    async def release_lock(self, lock: Lock) -> None:
+        try:
+            await lock.release()
+        except LockError:  # pragma: no cover
+            # the lock expired while the value was computed
+            pass
+        except RedisError as e:  # pragma: no cover
+            # the lock expires on its own
+            self.record_failure(e)
+
+    async def wait_for_cache(
+        self, key: str, timeout: float
+    ) -> Tuple[int, Optional[bytes]]:
+        """Poll for `key` while another worker holds its recomputation lock.
+
+        Returns as soon as the value is stored, the lock is released or `timeout`
+        seconds have passed, whichever comes first.
+        """
+        lock_key = self.get_lock_key(key)
+        deadline = time.monotonic() + timeout
+        while True:
+            async with self.redis.pipeline() as pipe:
+                ttl, in_cache, locked = (
+                    await pipe.ttl(key).get(key).exists(lock_key).execute()
+                )
+            if in_cache or not locked or time.monotonic() >= deadline:
+                return (ttl, in_cache)
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+
+    def requested_resource_not_modified(self, request: Request, etag: str) -> bool:
         if not request or "If-None-Match" not in request.headers:
             return False
         check_etags = [
@@ -132,46 +521,534 @@ class Cache(metaclass=MetaSingleton):
         ]
         if len(check_etags) == 1 and check_etags[0] == "*":
             return True
-        return self.get_etag(cached_data) in check_etags
+        # weak comparison (RFC 9110 section 8.8.3.2)
+        return etag.removeprefix("W/") in [e.removeprefix("W/") for e in check_etags]
 
-    async def add_to_cache(self, key: str, value: Dict, expire: int) -> bool:
-        try:
-            if isinstance(value, Response):
-                response_data = value.body
-            else:
-                response_data = serialize_json(value)
+    async def add_to_cache(
+        self,
+        key: str,
+        value: Dict,
+        expire: int,
+        local_expire: int = 0,
+        namespace: Optional[str] = None,
+        tags: Iterable[str] = (),
+        stale_expire: int = 0,
+        metrics: Optional[EndpointMetrics] = None,
+    ) -> Optional[str]:
+        """Store `value` under `key` for `expire` seconds.
 
-        except TypeError:
+        The Redis key is kept for `stale_expire` more seconds so a stale value can be
+        served while it is refreshed. Returns the ETag of the stored entry, or None
+        if the value could not be cached.
+        """
+        metrics = metrics or EndpointMetrics()
+        started = time.perf_counter()
+        try:
+            response_data = self.serialize(value, namespace)
+        except CodecError:
+            metrics.store_errors += 1
             message = f"Object of type {type(value)} is not JSON-serializable"
             self.log(RedisEvent.FAILED_TO_CACHE_KEY, msg=message, key=key)
-            return False
-        cached = await self.redis.set(name=key, value=response_data, ex=expire)
-        if cached:
-            self.log(RedisEvent.KEY_ADDED_TO_CACHE, key=key)
-        else:  # pragma: no cover
+            return None
+        serialized = time.perf_counter()
+        metrics.encode.observe(serialized - started)
+        cached = await self._set_tagged(
+            key, response_data, expire + stale_expire, namespace, tags
+        )
+        metrics.redis.observe(time.perf_counter() - serialized)
+        if not cached:  # pragma: no cover
+            metrics.store_errors += 1
             self.log(RedisEvent.FAILED_TO_CACHE_KEY, key=key, value=value)
-        return cached
+            return None
+        metrics.stores += 1
+        metrics.bytes_written += len(response_data)
+        self.log(RedisEvent.KEY_ADDED_TO_CACHE, key=key)
+        if local_expire:
+            self.add_to_local_cache(
+                key, response_data, min(local_expire, expire), namespace, ttl=expire
+            )
+        return self.get_etag(response_data)
+
+    async def add_not_found_to_cache(
+        self,
+        key: str,
+        response: Response,
+        expire: int,
+        namespace: Optional[str] = None,
+        tags: Iterable[str] = (),
+    ) -> None:
+        """Record for `expire` seconds that `key` is answered with the error `response`.
+
+        The entry is only kept in Redis, so invalidating one of its tags removes it
+        from every worker at once.
+        """
+        headers = {
+            name: value
+            for name, value in response.headers.items()
+            if name != "content-length"
+        }
+        data = pack_not_found(response.status_code, headers, response.body)
+        if await self._set_tagged(key, data, expire, namespace, tags):
+            self.log(RedisEvent.KEY_ADDED_TO_CACHE, key=key)
+
+    def get_not_found_response(
+        self, in_cache: Union[str, bytes]
+    ) -> Optional[Response]:
+        """Return the error response recorded in a cache entry, or None."""
+        if isinstance(in_cache, str):
+            in_cache = in_cache.encode()
+        not_found = unpack_not_found(in_cache)
+        if not_found is None:
+            return None
+        status_code, headers, body = not_found
+        headers[self.response_header] = "Hit"
+        return Response(content=body, status_code=status_code, headers=headers)
+
+    async def _set_tagged(
+        self,
+        key: str,
+        data: bytes,
+        expire: int,
+        namespace: Optional[str] = None,
+        tags: Iterable[str] = (),
+    ) -> bool:
+        """Store `data` under `key` and index it under its namespace and `tags`.
 
-    async def invalidate(self, pattern: str) -> bool:
-        keys_to_delete = await self.redis.keys(pattern=pattern)
-        if keys_to_delete:
-            await self.redis.delete(*keys_to_delete)
+        In a namespace with a budget, the entries over budget are evicted.
+        """
+        budget = self.budgets.get(namespace)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            if budget is None:
+                pipe.set(name=key, value=data, ex=expire)
+            else:
+                await self.store_script(
+                    keys=[key, *get_budget_keys(self.prefix, namespace)],
+                    args=[
+                        data,
+                        expire,
+                        time.time(),
+                        len(data),
+                        budget.max_entries,
+                        budget.max_bytes,
+                        int(budget.lfu),
+                    ],
+                    client=pipe,
+                )
+            self._add_to_tags(pipe, key, expire, namespace, tags)
+            cached, *_ = await pipe.execute()
+        if budget is None:
+            return bool(cached)
+        # the script returns the keys it evicted
+        if cached:
+            await self._announce_evictions(cached, namespace)
+        return True
+
+    def _add_to_tags(
+        self,
+        pipe: client.Pipeline,
+        key: str,
+        expire: int,
+        namespace: Optional[str] = None,
+        tags: Iterable[str] = (),
+    ) -> None:
+        for tag_key in self.get_tag_keys(str(namespace), tags):
+            # the tag set lives as long as the longest-lived key it indexes
+            pipe.sadd(tag_key, key)
+            pipe.expire(tag_key, expire, nx=True)
+            pipe.expire(tag_key, expire, gt=True)
+
+    async def compare_shadow(
+        self,
+        key: str,
+        value: Any,
+        expire: int,
+        namespace: Optional[str] = None,
+        tags: Iterable[str] = (),
+    ) -> Optional[bool]:
+        """Compare `value` with the response recorded for `key` in shadow mode.
+
+        Only a digest of the response is stored, for `expire` seconds and under
+        the same tags as a cached entry, so that invalidations reset it. Returns
+        None if nothing was recorded (a would-be miss), otherwise whether the
+        recorded response equals `value`.
+        """
+        digest = get_digest(self._encode(value))
+        shadow_key = get_shadow_key(key)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.get(shadow_key)
+            pipe.set(shadow_key, digest, ex=expire, nx=True)
+            self._add_to_tags(pipe, shadow_key, expire, namespace, tags)
+            recorded, *_ = await pipe.execute()
+        return None if recorded is None else recorded == digest
+
+    async def _announce_evictions(
+        self, keys: List[Union[str, bytes]], namespace: Optional[str]
+    ) -> None:
+        keys = [key.decode() if isinstance(key, bytes) else key for key in keys]
+        self.evict_local(keys)
+        await self.redis.publish(
+            get_invalidation_channel(self.prefix),
+            encode_invalidation(keys, origin=PROCESS_ID),
+        )
+        self.log(
+            RedisEvent.KEYS_EVICTED,
+            msg=f"{len(keys)} keys of namespace {namespace} over budget",
+        )
+
+    async def get_adaptive_ttl(
+        self,
+        namespace: Optional[str],
+        tags: Iterable[str],
+        default: int,
+        min_ttl: int,
+        max_ttl: int,
+    ) -> int:
+        """Return a TTL between `min_ttl` and `max_ttl` from the write rate of `tags`.
+
+        See `cache.adaptive.choose_ttl`; `namespace` counts as one of the tags.
+        """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for tag in get_tags(namespace, tags):
+                pipe.hmget(get_writes_key(self.prefix, tag), "last", "interval")
+            stats = await pipe.execute()
+        return choose_ttl(stats, time.time(), default, min_ttl, max_ttl)
+
+    def serialize(self, value: Any, namespace: Optional[str] = None) -> bytes:
+        """Encode `value` into a cache entry.
+
+        The value is encoded with the configured codec, compressed if it is large
+        and prefixed with the digest used as its ETag.
+        """
+        return pack_entry(self.compression.apply(self._encode(value), namespace))
+
+    def _encode(self, value: Any) -> bytes:
+        if isinstance(value, Response):
+            return bytes((ResponseBodyCodec.format_id,)) + value.body
+        return encode(value, self.codec)
+
+    @staticmethod
+    def deserialize(in_cache: Union[str, bytes]) -> Any:
+        if isinstance(in_cache, str):
+            in_cache = in_cache.encode()
+        _, data = unpack_entry(in_cache)
+        return decode(decompress(data))
+
+    @staticmethod
+    def deserialize_response(in_cache: Union[str, bytes]) -> Any:
+        """Decode a cached response; rendered bodies are kept as `ResponseBody`."""
+        if isinstance(in_cache, str):
+            in_cache = in_cache.encode()
+        _, data = unpack_entry(in_cache)
+        return decode_response(decompress(data))
+
+    async def invalidate(
+        self, namespace: Optional[str] = None, tags: Iterable[str] = ()
+    ) -> int:
+        """Delete every key indexed under `namespace` and `tags`.
+
+        The cost is proportional to the number of affected keys. The first time a
+        namespace is invalidated, keys written before tags were recorded are
+        removed with an incremental `SCAN`.
+        """
+        all_tags = get_tags(namespace, tags)
+        if not all_tags:
+            return 0
+        tag_keys = [self.get_tag_key(tag) for tag in all_tags]
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for tag_key in tag_keys:
+                pipe.smembers(tag_key)
+            pipe.delete(*tag_keys)
+            if namespace is not None:
+                pipe.set(
+                    self.get_tag_key(f"{LEGACY_SCAN_DONE_TAG}:{namespace}"),
+                    1,
+                    nx=True,
+                    ex=ONE_YEAR_IN_SECONDS,
+                )
+            results = await pipe.execute()
+        keys = sorted(
+            key.decode() if isinstance(key, bytes) else key
+            for key in set().union(*results[: len(tag_keys)])
+        )
+        prefixes = [] if namespace is None else [self.get_cache_key_prefix(namespace)]
+        async with self.redis.pipeline(transaction=False) as pipe:
+            if keys:
+                pipe.unlink(*keys)
+                await self._forget_budgeted(pipe, keys)
+            # other processes evict the keys from their in-process tier
+            pipe.publish(
+                get_invalidation_channel(self.prefix),
+                encode_invalidation(keys, prefixes, origin=PROCESS_ID),
+            )
+            # the write rate of every tag drives the adaptive TTLs
+            await self.record_writes_script(
+                keys=[get_writes_key(self.prefix, tag) for tag in all_tags],
+                args=get_record_writes_args(time.time()),
+                client=pipe,
+            )
+            unlinked, *_ = await pipe.execute()
+        deleted = unlinked if keys else 0
+        self.evict_local(keys, prefixes)
+        if namespace is not None and results[-1]:
+            deleted += await self.invalidate_pattern(
+                self.get_cache_key_pattern(namespace)
+            )
+        self.metrics.invalidated(namespace, deleted)
+        self.log(RedisEvent.TAGS_INVALIDATED, msg=",".join(tag_keys))
+        return deleted
+
+    async def _forget_budgeted(
+        self, pipe: client.Pipeline, keys: List[str]
+    ) -> None:
+        """Remove deleted `keys` from the budget indexes of their namespaces."""
+        for namespace in self.budgets:
+            prefix = self.get_cache_key_prefix(namespace)
+            deleted = [key for key in keys if key.startswith(prefix)]
+            if deleted:
+                await self.forget_script(
+                    keys=get_budget_keys(self.prefix, namespace),
+                    args=deleted,
+                    client=pipe,
+                )
+
+    async def prune_budgets(self) -> int:
+        """Remove the expired entries from the budget indexes.
+
+        Entries that expire or are deleted outside `invalidate` stay indexed, and
+        counted against the budget, until they are pruned or evicted. Returns the
+        number of entries removed.
+        """
+        pruned = 0
+        for namespace in self.budgets:
+            budget_keys = get_budget_keys(self.prefix, namespace)
+            batch = []
+            async for key, _ in self.redis.zscan_iter(
+                budget_keys[0], count=SCAN_BATCH_SIZE
+            ):
+                batch.append(key)
+                if len(batch) >= SCAN_BATCH_SIZE:
+                    pruned += await self._prune_batch(budget_keys, batch)
+                    batch = []
+            if batch:
+                pruned += await self._prune_batch(budget_keys, batch)
+        return pruned
+
+    async def _prune_batch(
+        self, budget_keys: Tuple[str, str, str], keys: List[bytes]
+    ) -> int:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.exists(key)
+            found = await pipe.execute()
+        expired = [key for key, exists in zip(keys, found) if not exists]
+        if expired:
+            await self.forget_script(keys=budget_keys, args=expired)
+        return len(expired)
+
+    async def prune_budgets_periodically(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.prune_budgets()
+            except Exception as e:  # pragma: no cover
+                self.log(RedisEvent.FAILED_TO_PRUNE_BUDGETS, msg=str(e))
+
+    async def get_budget_usage(self) -> Dict[str, Dict[str, Any]]:
+        """Return the budget, entries, bytes and evictions of every namespace."""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for namespace in self.budgets:
+                index_key, _, usage_key = get_budget_keys(self.prefix, namespace)
+                pipe.zcard(index_key)
+                pipe.hgetall(usage_key)
+            results = await pipe.execute()
+        usage = {}
+        for (namespace, budget), entries, fields in zip(
+            self.budgets.items(), results[::2], results[1::2]
+        ):
+            fields = {
+                name.decode() if isinstance(name, bytes) else name: int(value)
+                for name, value in fields.items()
+            }
+            usage[namespace] = {
+                **budget.as_dict(),
+                "entries": entries,
+                "bytes": fields.get("bytes", 0),
+                "evictions": fields.get("evictions", 0),
+            }
+        return usage
+
+    def evict_local(self, keys: Iterable[str], prefixes: Iterable[str] = ()) -> None:
+        for key in keys:
+            self.local.delete(key)
+        for prefix in prefixes:
+            self.local.invalidate_prefix(prefix)
+
+    async def listen_for_invalidations(self) -> None:
+        """Evict the local entries invalidated by other processes.
+
+        Also adds the keys denied by any process to the denylist filter, which is
+        rebuilt from Redis once subscribed and every `denylist_reload_interval`
+        seconds. Invalidations published while the subscription is down are lost,
+        so the in-process tier is cleared and the filter rebuilt whenever the
+        subscription fails.
+        """
+        channel = get_invalidation_channel(self.prefix)
+        delay = RECONNECT_MIN_DELAY
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(channel)
+                    delay = RECONNECT_MIN_DELAY
+                    # messages published meanwhile wait in the subscription
+                    await self.load_denylist()
+                    reload_at = time.monotonic() + self.denylist_reload_interval
+                    while True:
+                        if (
+                            self.denylist_reload_interval
+                            and time.monotonic() >= reload_at
+                        ):
+                            await self.load_denylist()
+                            reload_at = time.monotonic() + self.denylist_reload_interval
+                        message = await pubsub.get_message(
+                            ignore_subscribe_messages=True,
+                            timeout=INVALIDATION_POLL_TIMEOUT,
+                        )
+                        if message is None:
+                            continue
+                        origin, keys, prefixes, denied = decode_invalidation(
+                            message["data"]
+                        )
+                        for key in denied:
+                            self.denylist.add(key)
+                        if origin != PROCESS_ID:
+                            self.evict_local(keys, prefixes)
+            except (RedisError, ValueError, KeyError) as e:
+                self.log(RedisEvent.INVALIDATION_BUS_ERROR, msg=repr(e))
+                self.local.clear()
+                self.denylist_loaded = False
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    async def load_denylist(self) -> None:
+        """Rebuild the denylist filter from the keys denied in Redis that did not
+        expire yet."""
+        denylist = BloomFilter(self.denylist.capacity, self.denylist.error_rate)
+        keys = await self.redis.zrangebyscore(
+            get_denylist_key(self.prefix), time.time(), "+inf"
+        )
+        for key in keys:
+            denylist.add(key.decode() if isinstance(key, bytes) else key)
+        self.denylist = denylist
+        self.denylist_loaded = True
+
+    async def deny(self, key: str, ttl: int) -> None:
+        """Deny `key` for `ttl` seconds in every process, see `is_denied`.
+
+        The key is added to the sorted set `get_denylist_key`, scored by the time
+        it expires, and announced on the invalidation channel, so that every
+        worker adds it to its denylist filter. Expired keys are removed from the
+        set meanwhile. Raises a `RedisError` if it could not be stored.
+        """
+        if ttl <= 0:
+            return
+        if self.not_connected:
+            raise ConnectionError("The cache is not connected to Redis")
+        self.denylist.add(key)
+        denylist_key = get_denylist_key(self.prefix)
+        now = time.time()
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.zremrangebyscore(denylist_key, "-inf", now)
+            pipe.zadd(denylist_key, {key: now + ttl}, gt=True)
+            pipe.publish(
+                get_invalidation_channel(self.prefix),
+                encode_invalidation(origin=PROCESS_ID, denied=[key]),
+            )
+            await pipe.execute()
+
+    async def is_denied(self, key: str) -> bool:
+        """Return True if `key` was denied by `deny` and did not expire yet.
+
+        Only the keys that the denylist filter may contain are looked up in
+        Redis. When that lookup fails, they are considered denied. Before the
+        filter is loaded every key is looked up, and considered allowed on errors.
+        """
+        if self.denylist_loaded and key not in self.denylist:
+            return False
+        if self.not_connected:
+            return self.denylist_loaded
+        try:
+            expires_at = await self.redis.zscore(get_denylist_key(self.prefix), key)
+        except RedisError as e:
+            self.record_failure(e)
+            return self.denylist_loaded
+        self.breaker.record_success()
+        return expires_at is not None and expires_at > time.time()
+
+    async def invalidate_pattern(self, pattern: str) -> int:
+        """Delete keys matching `pattern` without blocking Redis (uses `SCAN`)."""
+        deleted = 0
+        batch = []
+        async for key in self.redis.scan_iter(match=pattern, count=SCAN_BATCH_SIZE):
+            batch.append(key)
+            if len(batch) >= SCAN_BATCH_SIZE:
+                deleted += await self.redis.unlink(*batch)
+                batch = []
+        if batch:
+            deleted += await self.redis.unlink(*batch)
         self.log(RedisEvent.PATTERN_INVALIDATED, pattern=pattern)
+        return deleted
+
+    def get_metrics_key(self, namespace: str) -> str:
+        return f"{self.prefix}|{METRICS_KEY_PREFIX}:{namespace}"
+
+    async def flush_metrics(self) -> None:
+        """Add what this worker recorded since the last flush to the Redis totals."""
+        deltas = self.metrics.pop_deltas()
+        if not deltas:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for namespace, fields in deltas.items():
+                metrics_key = self.get_metrics_key(namespace)
+                for name, value in fields.items():
+                    pipe.hincrby(metrics_key, name, value)
+            await pipe.execute()
+
+    async def flush_metrics_periodically(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush_metrics()
+            except Exception as e:  # pragma: no cover
+                self.log(RedisEvent.FAILED_TO_FLUSH_METRICS, msg=str(e))
+
+    async def get_cluster_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Return the metrics of every worker, as aggregated in Redis."""
+        pattern = self.get_metrics_key("*")
+        fields_by_namespace = {}
+        async for metrics_key in self.redis.scan_iter(
+            match=pattern, count=SCAN_BATCH_SIZE
+        ):
+            if isinstance(metrics_key, bytes):
+                metrics_key = metrics_key.decode()
+            namespace = metrics_key.partition(f"|{METRICS_KEY_PREFIX}:")[2]
+            fields_by_namespace[namespace] = {
+                name.decode() if isinstance(name, bytes) else name: int(value)
+                for name, value in (await self.redis.hgetall(metrics_key)).items()
+            }
+        return CacheMetrics.from_fields(fields_by_namespace)
 
     def set_response_headers(
-        self,
-        response: Response,
-        cache_hit: bool,
-        response_data: Dict = None,
-        ttl: int = None,
+        self, response: Response, cache_hit: bool, etag: str
     ) -> None:
+        """Set the caching headers of a response served through `cache`.
+
+        Responses may be per user and are invalidated by writes at any time, so
+        clients and proxies may keep them but must revalidate them with the ETag
+        before every use.
+        """
         response.headers[self.response_header] = "Hit" if cache_hit else "Miss"
-        expires_at = datetime.utcnow() + timedelta(seconds=ttl)
-        response.headers["Expires"] = expires_at.strftime(HTTP_TIME)
-        response.headers["Cache-Control"] = f"max-age={ttl}"
-        response.headers["ETag"] = self.get_etag(response_data)
-        # if "last_modified" in response_data:  # pragma: no cover
-        #     response.headers["Last-Modified"] = response_data["last_modified"]
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = CACHE_CONTROL
 
     def log(
         self,
@@ -182,6 +1059,9 @@ class Cache(metaclass=MetaSingleton):
         value: Optional[str] = None,
     ):
         """Log `RedisEvent` using the configured `Logger` object"""
+        level = logging.DEBUG if event in DEBUG_EVENTS else logging.INFO
+        if not logger.isEnabledFor(level):
+            return
         message = f" {self.get_log_time()} | {event.name}"
         if msg:
             message += f": {msg}"
@@ -191,15 +1071,15 @@ class Cache(metaclass=MetaSingleton):
             message += f": pattern={pattern}"
         if value:  # pragma: no cover
             message += f", value={value}"
-        logger.info(message)
+        logger.log(level, message)
 
     @staticmethod
-    def get_etag(cached_data: Union[str, bytes, Dict]) -> str:
-        if isinstance(cached_data, bytes):
-            cached_data = cached_data.decode()
-        if not isinstance(cached_data, str):
-            cached_data = serialize_json(cached_data)
-        return f"W/{hash(cached_data)}"
+    def get_etag(in_cache: Union[str, bytes]) -> str:
+        """Return the ETag stored with a cache entry."""
+        if isinstance(in_cache, str):
+            in_cache = in_cache.encode()
+        etag, _ = unpack_entry(in_cache)
+        return etag
 
     @staticmethod
     def get_log_time():
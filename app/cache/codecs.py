@@ -0,0 +1,232 @@
+"""codecs.py"""
+import dataclasses
+import json
+from abc import ABC, abstractmethod
+from base64 import b64encode
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from pathlib import PurePath
+from typing import Any, Dict, Tuple, Union
+
+from pydantic import BaseModel
+
+from cache.util import deserialize_json, serialize_json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+# Values written before codecs existed are plain JSON documents, whose first byte
+# is always printable. Format bytes are kept below 0x10 so they collide neither
+# with those nor with the compression markers (0x10-0x1F).
+MAX_FORMAT_ID = 0x0F
+FIRST_PRINTABLE = 0x20
+SPEC_TYPE_MARKER = b'"_spec_type"'
+
+EXT_DECIMAL = 1
+EXT_DATETIME = 2
+EXT_DATE = 3
+
+
+class CodecError(ValueError):
+    """Raised when a cached value can not be encoded or decoded."""
+
+
+class Codec(ABC):
+    """Serializes cached payloads. Every codec owns a unique format byte.
+
+    `loads` returns values of the `native_types` with the type and value they
+    were given to `dumps`; callers convert other values to strings themselves.
+    """
+
+    name: str
+    format_id: int
+    native_types: Tuple[type, ...] = ()
+
+    @abstractmethod
+    def dumps(self, value: Any) -> bytes:
+        """Serialize `value`, without the format byte."""
+
+    @abstractmethod
+    def loads(self, data: bytes) -> Any:
+        """Deserialize data written by `dumps`."""
+
+
+class JSONCodec(Codec):
+    """The original encoder: `jsonable_encoder` followed by `json.dumps`."""
+
+    name = "json"
+    format_id = 0x01
+
+    def dumps(self, value: Any) -> bytes:
+        return serialize_json(value).encode()
+
+    def loads(self, data: bytes) -> Any:
+        return deserialize_json(data)
+
+
+class ORJSONCodec(Codec):
+    """JSON through orjson; like `JSONCodec`, except that `Decimal` values are
+    written as strings, which keeps their precision."""
+
+    name = "orjson"
+    format_id = 0x02
+
+    def dumps(self, value: Any) -> bytes:
+        return orjson.dumps(
+            value, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS
+        )
+
+    def loads(self, data: bytes) -> Any:
+        if SPEC_TYPE_MARKER in data:
+            # only bytes values are written with a type marker
+            return deserialize_json(data)
+        return orjson.loads(data)
+
+
+class MsgpackCodec(Codec):
+    """Binary msgpack; Decimal, datetime and date round-trip as ext types."""
+
+    name = "msgpack"
+    format_id = 0x03
+    native_types = (Decimal, datetime, date)
+
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, default=_msgpack_default, use_bin_type=True)
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(
+            data, ext_hook=_msgpack_ext_hook, raw=False, strict_map_key=False
+        )
+
+
+class ResponseBodyCodec(Codec):
+    """A JSON response body, rendered once through the endpoint's response model.
+
+    `dumps` takes the body. Cache hits send it to clients without decoding it,
+    see `decode_response`.
+    """
+
+    name = "response"
+    format_id = 0x04
+
+    def dumps(self, value: bytes) -> bytes:
+        return bytes(value)
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class ResponseBody(bytes):
+    """A rendered JSON response body read from the cache."""
+
+
+CODECS_BY_NAME: Dict[str, Codec] = {}
+CODECS_BY_FORMAT: Dict[int, Codec] = {}
+
+
+def register_codec(codec: Codec) -> None:
+    if not 0 < codec.format_id <= MAX_FORMAT_ID:
+        raise CodecError(f"Invalid format byte {codec.format_id} for {codec.name}")
+    CODECS_BY_NAME[codec.name] = codec
+    CODECS_BY_FORMAT[codec.format_id] = codec
+
+
+def get_codec(name: str) -> Codec:
+    try:
+        return CODECS_BY_NAME[name]
+    except KeyError:
+        raise CodecError(
+            f'Codec "{name}" is not available, choose one of {list(CODECS_BY_NAME)}'
+        )
+
+
+def encode(value: Any, codec: Codec) -> bytes:
+    """Serialize `value` with `codec`, prefixed with the codec's format byte."""
+    try:
+        return bytes((codec.format_id,)) + codec.dumps(value)
+    except (TypeError, ValueError) as e:
+        raise CodecError(str(e)) from e
+
+
+def decode(data: Union[str, bytes]) -> Any:
+    """Deserialize a cached value written by any registered codec."""
+    if isinstance(data, str):
+        data = data.encode()
+    if not data or data[0] >= FIRST_PRINTABLE:
+        # legacy entry without a format byte
+        return deserialize_json(data)
+    codec = CODECS_BY_FORMAT.get(data[0])
+    if codec is None:
+        raise CodecError(f"No codec registered for format byte {data[0]}")
+    return codec.loads(data[1:])
+
+
+def decode_response(data: bytes) -> Any:
+    """Like `decode`, but return rendered response bodies as a `ResponseBody`."""
+    if data and data[0] == ResponseBodyCodec.format_id:
+        return ResponseBody(data[1:])
+    return decode(data)
+
+
+def _to_builtin(obj: Any) -> Any:
+    """Convert the objects returned by endpoints into types the codecs support."""
+    if isinstance(obj, BaseModel):
+        obj_dict = obj.dict(by_alias=True)
+        return obj_dict.get("__root__", obj_dict)
+    if hasattr(obj, "_sa_instance_state"):
+        return {k: v for k, v in vars(obj).items() if not k.startswith("_sa")}
+    if dataclasses.is_dataclass(obj):
+        return dataclasses.asdict(obj)
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, PurePath):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj)} is not serializable")
+
+
+def _orjson_default(obj: Any) -> Any:
+    if isinstance(obj, Decimal):
+        # a float would round balances and totals
+        return str(obj)
+    if isinstance(obj, bytes):
+        return {"_spec_type": str(bytes), "val": b64encode(obj).decode()}
+    return _to_builtin(obj)
+
+
+def _msgpack_default(obj: Any) -> Any:
+    if isinstance(obj, Decimal):
+        return msgpack.ExtType(EXT_DECIMAL, str(obj).encode())
+    if isinstance(obj, datetime):
+        return msgpack.ExtType(EXT_DATETIME, obj.isoformat().encode())
+    if isinstance(obj, date):
+        return msgpack.ExtType(EXT_DATE, obj.isoformat().encode())
+    return _to_builtin(obj)
+
+
+def _msgpack_ext_hook(code: int, data: bytes) -> Any:
+    if code == EXT_DECIMAL:
+        return Decimal(data.decode())
+    if code == EXT_DATETIME:
+        return datetime.fromisoformat(data.decode())
+    if code == EXT_DATE:
+        return date.fromisoformat(data.decode())
+    return msgpack.ExtType(code, data)  # pragma: no cover
+
+
+register_codec(JSONCodec())
+# only written by `Cache.serialize` for responses, so it can not be configured
+CODECS_BY_FORMAT[ResponseBodyCodec.format_id] = ResponseBodyCodec()
+if orjson is not None:
+    register_codec(ORJSONCodec())
+if msgpack is not None:
+    register_codec(MsgpackCodec())
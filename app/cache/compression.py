@@ -0,0 +1,186 @@
+"""compression.py"""
+import zlib
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover
+    lz4_frame = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+# Codec format bytes use 0x01-0x0F; compression markers use 0x10-0x1E and wrap
+# the complete codec-encoded value. 0x1F is the entry marker (see `entry.py`).
+MIN_MARKER = 0x10
+MAX_MARKER = 0x1E
+DEFAULT_COMPRESSION_THRESHOLD = 1024
+AUTO = "auto"
+NONE = "none"
+
+
+class Compressor(ABC):
+    """Compresses encoded cache values. Every compressor owns a unique marker byte."""
+
+    name: str
+    marker: int
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        """Compress `data`, without the marker byte."""
+
+    @abstractmethod
+    def decompress(self, data: bytes) -> bytes:
+        """Restore data compressed by `compress`."""
+
+
+class ZlibCompressor(Compressor):
+    name = "zlib"
+    marker = 0x10
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, 6)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+class LZ4Compressor(Compressor):
+    name = "lz4"
+    marker = 0x11
+
+    def compress(self, data: bytes) -> bytes:
+        return lz4_frame.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return lz4_frame.decompress(data)
+
+
+class ZstdCompressor(Compressor):
+    name = "zstd"
+    marker = 0x12
+
+    def __init__(self) -> None:
+        self._compressor = zstandard.ZstdCompressor(level=3)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._decompressor.decompress(data)
+
+
+@dataclass
+class CompressionStats:
+    """Per-namespace counters of the bytes saved by compression."""
+
+    compressed: int = 0
+    skipped: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_in - self.bytes_out
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "compressed": self.compressed,
+            "skipped": self.skipped,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "bytes_saved": self.bytes_saved,
+        }
+
+
+COMPRESSORS_BY_NAME: Dict[str, Compressor] = {}
+COMPRESSORS_BY_MARKER: Dict[int, Compressor] = {}
+# the first available one is used when the compressor is "auto"
+PREFERENCE = ("zstd", "lz4", "zlib")
+
+
+def register_compressor(compressor: Compressor) -> None:
+    if not MIN_MARKER <= compressor.marker <= MAX_MARKER:
+        raise ValueError(
+            f"Invalid marker byte {compressor.marker} for {compressor.name}"
+        )
+    COMPRESSORS_BY_NAME[compressor.name] = compressor
+    COMPRESSORS_BY_MARKER[compressor.marker] = compressor
+
+
+def get_compressor(name: str) -> Optional[Compressor]:
+    """Return the compressor called `name`, the best available one for "auto",
+    or None when compression is disabled."""
+    if name == NONE:
+        return None
+    if name == AUTO:
+        return next(
+            COMPRESSORS_BY_NAME[n] for n in PREFERENCE if n in COMPRESSORS_BY_NAME
+        )
+    try:
+        return COMPRESSORS_BY_NAME[name]
+    except KeyError:
+        raise ValueError(
+            f'Compressor "{name}" is not available, '
+            f"choose one of {[AUTO, NONE, *COMPRESSORS_BY_NAME]}"
+        )
+
+
+def is_compressed(data: bytes) -> bool:
+    return bool(data) and MIN_MARKER <= data[0] <= MAX_MARKER
+
+
+def compress(data: bytes, compressor: Compressor) -> bytes:
+    return bytes((compressor.marker,)) + compressor.compress(data)
+
+
+def decompress(data: bytes) -> bytes:
+    """Undo `compress`; values without a compression marker are returned as is."""
+    if not is_compressed(data):
+        return data
+    return COMPRESSORS_BY_MARKER[data[0]].decompress(data[1:])
+
+
+class CompressionPolicy:
+    """Compresses values of at least `threshold` bytes and keeps per-namespace stats."""
+
+    def __init__(
+        self,
+        compressor: Optional[Compressor],
+        threshold: int = DEFAULT_COMPRESSION_THRESHOLD,
+    ) -> None:
+        self.compressor = compressor
+        self.threshold = threshold
+        self._stats: Dict[str, CompressionStats] = defaultdict(CompressionStats)
+
+    def apply(self, data: bytes, namespace: Optional[str] = None) -> bytes:
+        if self.compressor is None or len(data) < self.threshold:
+            return data
+        stats = self._stats[namespace]
+        compressed = compress(data, self.compressor)
+        if len(compressed) >= len(data):
+            stats.skipped += 1
+            return data
+        stats.compressed += 1
+        stats.bytes_in += len(data)
+        stats.bytes_out += len(compressed)
+        return compressed
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            str(namespace): stats.as_dict()
+            for namespace, stats in self._stats.items()
+        }
+
+
+register_compressor(ZlibCompressor())
+if lz4_frame is not None:
+    register_compressor(LZ4Compressor())
+if zstandard is not None:
+    register_compressor(ZstdCompressor())
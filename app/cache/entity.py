@@ -0,0 +1,272 @@
+"""entity.py"""
+import time
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+
+from redis.exceptions import RedisError
+
+from cache.bus import encode_invalidation, get_invalidation_channel, PROCESS_ID
+from cache.client import Cache
+from cache.entry import ENTRY_MARKER
+from cache.enums import RedisEvent
+from cache.key_gen import get_entity_key
+
+DEFAULT_ENTITY_EXPIRE = 300
+DEFAULT_EVICTED_EXPIRE = 5
+# stored in place of evicted rows; too short to be an entry written by `serialize`
+EVICTED = bytes((ENTRY_MARKER,))
+# namespace of the entity caches in the metrics and the in-process tier stats
+ENTITY_NAMESPACE = "entity"
+
+
+class EntityCache:
+    """Caches the column values of single rows, keyed by table and primary key.
+
+    Rows are kept in Redis for `expire` seconds and, if `local_expire` is set, in
+    the in-process tier of the cache client. With `expire` 0 rows are only kept
+    in-process. Writers keep the entries current
+    with `set_many` and `evict`; both announce the keys on the invalidation
+    channel so that every worker drops its local copy. Ids without a row can be
+    recorded with `set_missing` for `not_found_expire` seconds; storing the row
+    replaces the record. Redis errors are counted by the circuit breaker and
+    treated as misses.
+
+    Readers store the rows they loaded after a miss with `fill_many`, which
+    never replaces an entry. `evict` leaves a marker for `evicted_expire`
+    seconds instead of deleting the entry, so that a reader that loaded a row
+    before it was changed can not store it again afterwards.
+
+    Args:
+        table (`str`): Name of the table, part of every key.
+        expire (`int`, optional): Seconds a row is kept in Redis, 0 to keep rows
+            in-process only. Defaults to 300.
+        local_expire (`int`, optional): Seconds a row is kept in the in-process
+            tier, 0 to disable it. Defaults to 0.
+        not_found_expire (`int`, optional): Seconds an id without a row is
+            remembered in Redis, 0 to disable it. Defaults to 0.
+        evicted_expire (`int`, optional): Seconds during which rows loaded before
+            an eviction can not be stored. Defaults to 5.
+    """
+
+    def __init__(
+        self,
+        table: str,
+        expire: int = DEFAULT_ENTITY_EXPIRE,
+        local_expire: int = 0,
+        not_found_expire: int = 0,
+        evicted_expire: int = DEFAULT_EVICTED_EXPIRE,
+    ) -> None:
+        self.table = table
+        self.expire = expire
+        self.local_expire = min(local_expire, expire) if expire else local_expire
+        self.not_found_expire = not_found_expire
+        self.evicted_expire = evicted_expire
+        self.metrics = Cache.metrics.endpoint(ENTITY_NAMESPACE, table)
+
+    def get_key(self, id: Any) -> str:
+        return get_entity_key(Cache().prefix, self.table, id)
+
+    @property
+    def version(self) -> int:
+        """Token to read before loading rows from the database and to pass to
+        `fill_many` when storing them."""
+        return Cache().local.version
+
+    async def get_many(
+        self, ids: Iterable[Any]
+    ) -> Dict[Any, Optional[Dict[str, Any]]]:
+        """Return the cached column values of `ids` by id.
+
+        Ids recorded with `set_missing` map to None; uncached and recently
+        evicted ids are left out.
+        """
+        redis_cache = Cache()
+        if redis_cache.not_connected:
+            return {}
+        rows = {}
+        keys = {}
+        for id in dict.fromkeys(ids):
+            key = self.get_key(id)
+            fields = (
+                redis_cache.local.get(key, ENTITY_NAMESPACE)
+                if self.local_expire
+                else None
+            )
+            if fields is None:
+                keys[id] = key
+            else:
+                rows[id] = fields
+                self.metrics.hits += 1
+                self.metrics.local_hits += 1
+        if not keys:
+            return rows
+        if not self.expire:
+            self.metrics.misses += len(keys)
+            return rows
+        version = redis_cache.local.version
+        started = time.perf_counter()
+        try:
+            values = await redis_cache.redis.mget(list(keys.values()))
+        except RedisError as e:
+            self._record_failure(e)
+            self.metrics.misses += len(keys)
+            return rows
+        redis_cache.breaker.record_success()
+        self.metrics.redis.observe(time.perf_counter() - started)
+        for (id, key), value in zip(keys.items(), values):
+            if value is None or value == EVICTED:
+                self.metrics.misses += 1
+                continue
+            decoding = time.perf_counter()
+            fields = redis_cache.deserialize(value)
+            self.metrics.decode.observe(time.perf_counter() - decoding)
+            self.metrics.hits += 1
+            self.metrics.bytes_read += len(value)
+            rows[id] = fields
+            if fields is None:
+                # recorded by `set_missing`, only kept in Redis
+                self.metrics.not_found_hits += 1
+            elif self.local_expire and redis_cache.local.version == version:
+                redis_cache.local.set(
+                    key, fields, len(value), self.local_expire, ENTITY_NAMESPACE
+                )
+        return rows
+
+    async def set(self, id: Any, fields: Mapping[str, Any]) -> None:
+        await self.set_many({id: fields})
+
+    async def set_many(self, rows: Mapping[Any, Mapping[str, Any]]) -> None:
+        """Store the column values of `rows`, keyed by id, replacing older versions."""
+        redis_cache = Cache()
+        if redis_cache.not_connected or not rows:
+            return
+        started = time.perf_counter()
+        data = {
+            self.get_key(id): redis_cache.serialize(dict(fields), ENTITY_NAMESPACE)
+            for id, fields in rows.items()
+        }
+        serialized = time.perf_counter()
+        self.metrics.encode.observe(serialized - started)
+        try:
+            async with redis_cache.redis.pipeline(transaction=False) as pipe:
+                for key, value in data.items():
+                    if self.expire:
+                        pipe.set(key, value, ex=self.expire)
+                pipe.publish(*self._get_invalidation(data))
+                await pipe.execute()
+        except RedisError as e:
+            self._record_failure(e)
+            redis_cache.evict_local(data)
+            return
+        self.metrics.redis.observe(time.perf_counter() - serialized)
+        self.metrics.stores += len(data)
+        self.metrics.bytes_written += sum(len(value) for value in data.values())
+        for (key, value), fields in zip(data.items(), rows.values()):
+            redis_cache.local.delete(key)
+            if self.local_expire:
+                redis_cache.local.set(
+                    key, dict(fields), len(value), self.local_expire, ENTITY_NAMESPACE
+                )
+
+    async def fill(self, id: Any, fields: Mapping[str, Any], version: int) -> None:
+        await self.fill_many({id: fields}, version)
+
+    async def fill_many(
+        self, rows: Mapping[Any, Mapping[str, Any]], version: int
+    ) -> None:
+        """Store the column values of `rows`, keyed by id, read after a miss.
+
+        Unlike `set_many`, existing entries and eviction markers are kept, and the
+        rows are kept in-process only if nothing was evicted since `version` was
+        read. Nothing is published, as other workers have no copy to drop.
+        """
+        redis_cache = Cache()
+        if redis_cache.not_connected or not rows:
+            return
+        started = time.perf_counter()
+        data = {
+            self.get_key(id): redis_cache.serialize(dict(fields), ENTITY_NAMESPACE)
+            for id, fields in rows.items()
+        }
+        serialized = time.perf_counter()
+        self.metrics.encode.observe(serialized - started)
+        stored = [True] * len(data)
+        if self.expire:
+            try:
+                async with redis_cache.redis.pipeline(transaction=False) as pipe:
+                    for key, value in data.items():
+                        pipe.set(key, value, ex=self.expire, nx=True)
+                    stored = await pipe.execute()
+            except RedisError as e:
+                self._record_failure(e)
+                return
+            self.metrics.redis.observe(time.perf_counter() - serialized)
+        for is_stored, (key, value), fields in zip(
+            stored, data.items(), rows.values()
+        ):
+            if not is_stored:
+                continue
+            self.metrics.stores += 1
+            self.metrics.bytes_written += len(value)
+            if self.local_expire and redis_cache.local.version == version:
+                redis_cache.local.set(
+                    key, dict(fields), len(value), self.local_expire, ENTITY_NAMESPACE
+                )
+
+    async def set_missing(self, *ids: Any) -> None:
+        """Remember for `not_found_expire` seconds that `ids` have no row.
+
+        Like `fill_many`, existing entries and eviction markers are kept.
+        """
+        redis_cache = Cache()
+        if redis_cache.not_connected or not self.not_found_expire or not ids:
+            return
+        value = redis_cache.serialize(None, ENTITY_NAMESPACE)
+        try:
+            async with redis_cache.redis.pipeline(transaction=False) as pipe:
+                for id in ids:
+                    pipe.set(
+                        self.get_key(id), value, ex=self.not_found_expire, nx=True
+                    )
+                stored = sum(map(bool, await pipe.execute()))
+        except RedisError as e:
+            self._record_failure(e)
+            return
+        self.metrics.stores += stored
+        self.metrics.bytes_written += len(value) * stored
+
+    async def evict(self, *ids: Any) -> None:
+        """Delete the cached versions of `ids` in Redis and in every worker.
+
+        The entries are replaced by a marker for `evicted_expire` seconds.
+        """
+        redis_cache = Cache()
+        keys = [self.get_key(id) for id in ids]
+        redis_cache.evict_local(keys)
+        if redis_cache.not_connected or not keys:
+            return
+        try:
+            async with redis_cache.redis.pipeline(transaction=False) as pipe:
+                if self.expire and self.evicted_expire:
+                    for key in keys:
+                        pipe.set(key, EVICTED, ex=self.evicted_expire)
+                else:
+                    pipe.unlink(*keys)
+                pipe.publish(*self._get_invalidation(keys))
+                await pipe.execute()
+        except RedisError as e:
+            self._record_failure(e)
+
+    @staticmethod
+    def _get_invalidation(keys: Iterable[str]) -> Tuple[str, str]:
+        """Return the channel and message that tell other workers to drop `keys`."""
+        return (
+            get_invalidation_channel(Cache().prefix),
+            encode_invalidation(keys, origin=PROCESS_ID),
+        )
+
+    def _record_failure(self, error: RedisError) -> None:
+        redis_cache = Cache()
+        redis_cache.record_failure(error)
+        redis_cache.log(
+            RedisEvent.FAILED_TO_CACHE_ENTITY, msg=f"{self.table}: {error!r}"
+        )
@@ -0,0 +1,54 @@
+"""entry.py"""
+import json
+from hashlib import blake2b
+from typing import Dict, Optional, Tuple
+
+# Stored entries start with this marker, followed by the digest of the encoded
+# value, so the ETag is computed once when the entry is written. The marker sits
+# above the codec (0x01-0x0F) and compression (0x10-0x1E) ranges.
+ENTRY_MARKER = 0x1F
+DIGEST_SIZE = 16
+# Entries recording that a lookup answered "not found" start with this marker,
+# followed by the status and headers of the error response as JSON, a newline and
+# the response body. Legacy entries start with a printable byte.
+NOT_FOUND_MARKER = 0x00
+
+
+def get_digest(data: bytes) -> bytes:
+    """Return a digest of `data` that is stable across processes and restarts."""
+    return blake2b(data, digest_size=DIGEST_SIZE).digest()
+
+
+def format_etag(digest: bytes) -> str:
+    return f'W/"{digest.hex()}"'
+
+
+def pack_entry(data: bytes) -> bytes:
+    """Prefix the encoded value `data` with its digest."""
+    return bytes((ENTRY_MARKER,)) + get_digest(data) + data
+
+
+def unpack_entry(raw: bytes) -> Tuple[str, bytes]:
+    """Split a stored entry into its ETag and encoded value.
+
+    Entries written before the digest was stored get their ETag computed here.
+    """
+    header_size = DIGEST_SIZE + 1
+    if raw and raw[0] == ENTRY_MARKER:
+        return (format_etag(raw[1:header_size]), raw[header_size:])
+    return (format_etag(get_digest(raw)), raw)
+
+
+def pack_not_found(status_code: int, headers: Dict[str, str], body: bytes) -> bytes:
+    """Encode an error response into a "not found" entry."""
+    header = json.dumps({"status_code": status_code, "headers": headers})
+    return bytes((NOT_FOUND_MARKER,)) + header.encode() + b"\n" + body
+
+
+def unpack_not_found(raw: bytes) -> Optional[Tuple[int, Dict[str, str], bytes]]:
+    """Return the status, headers and body of a "not found" entry, or None."""
+    if not raw or raw[0] != NOT_FOUND_MARKER:
+        return None
+    header, _, body = raw[1:].partition(b"\n")
+    message = json.loads(header)
+    return (message["status_code"], message["headers"], body)
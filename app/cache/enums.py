@@ -20,3 +20,17 @@ class RedisEvent(IntEnum):
     KEY_FOUND_IN_CACHE = 5
     FAILED_TO_CACHE_KEY = 6
     PATTERN_INVALIDATED = 7
+    TAGS_INVALIDATED = 8
+    KEY_REFRESHED = 9
+    FAILED_TO_REFRESH_KEY = 10
+    CODEC_UNAVAILABLE = 11
+    FAILED_TO_FLUSH_METRICS = 12
+    REDIS_ERROR = 13
+    CIRCUIT_OPENED = 14
+    FAILED_TO_INVALIDATE = 15
+    INVALIDATION_BUS_ERROR = 16
+    FAILED_TO_WARM_KEY = 17
+    FAILED_TO_CACHE_ENTITY = 18
+    KEYS_EVICTED = 19
+    FAILED_TO_PRUNE_BUDGETS = 20
+    COMPRESSOR_UNAVAILABLE = 21
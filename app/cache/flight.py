@@ -0,0 +1,47 @@
+"""flight.py"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """Collapses concurrent evaluations for the same key into a single call.
+
+    The first caller for a key runs `fn`; every caller that arrives while it is
+    still running awaits the same future and receives the same result (or
+    exception). If the first caller is cancelled, the callers waiting for it try
+    again, and one of them runs `fn`.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[str, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        in_flight = self._calls.get(key)
+        while in_flight is not None:
+            try:
+                return await asyncio.shield(in_flight)
+            except asyncio.CancelledError:
+                if not in_flight.cancelled():
+                    # this caller was cancelled, not the one running `fn`
+                    raise
+            in_flight = self._calls.get(key)
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # mark the exception as retrieved when nobody else is waiting for it
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
@@ -1,13 +1,26 @@
 """cache.py"""
 from collections import OrderedDict
-from inspect import signature, Signature
-from typing import Any, Callable, Dict, List
+from hashlib import blake2b
+from inspect import Parameter, signature, Signature
+from operator import attrgetter
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
 
 from fastapi import Request, Response
 
 from cache.types import ArgType, SigParameters
 
 ALWAYS_IGNORE_ARG_TYPES = [Response, Request]
+# keys longer than this are stored under a digest of their arguments
+DEFAULT_MAX_KEY_LENGTH = 256
+KEY_DIGEST_SIZE = 16
+TAG_KEY_PREFIX = "tag"
+ENTITY_KEY_PREFIX = "entity"
+NOT_FOUND_TAG_PREFIX = "not-found"
+BUDGET_KEY_PREFIX = "budget"
+WRITES_KEY_PREFIX = "writes"
+DENIED_KEY_PREFIX = "denied"
+SHADOW_KEY_SUFFIX = "shadow"
+SIMPLE_PARAMETER_KINDS = (Parameter.POSITIONAL_OR_KEYWORD, Parameter.KEYWORD_ONLY)
 
 
 def get_cache_key_pattern(
@@ -26,6 +39,186 @@ def get_cache_key_pattern(
     return f"{prefix}*.*(*)"
 
 
+def get_namespace_prefix(prefix: str, namespace: Optional[str]) -> str:
+    """Return the prefix shared by every cache key of `namespace`."""
+    return f"{prefix}|{namespace}:"
+
+
+def get_tag_key(prefix: str, tag: str) -> str:
+    """Return the name of the Redis set that indexes every key carrying `tag`."""
+    return f"{prefix}|{TAG_KEY_PREFIX}:{tag}"
+
+
+def get_not_found_tag(namespace: Optional[str]) -> str:
+    """Return the tag of the "not found" responses cached in `namespace`.
+
+    Endpoints that create entities invalidate it, so a lookup that answered 404
+    before the entity existed is not served from the cache afterwards.
+    """
+    return f"{NOT_FOUND_TAG_PREFIX}:{namespace}"
+
+
+def get_budget_keys(prefix: str, namespace: Optional[str]) -> Tuple[str, str, str]:
+    """Return the keys of the access index, entry sizes and usage of `namespace`."""
+    budget_key = f"{prefix}|{BUDGET_KEY_PREFIX}:{namespace}"
+    return (f"{budget_key}:index", f"{budget_key}:sizes", f"{budget_key}:usage")
+
+
+def get_shadow_key(key: str) -> str:
+    """Return the key holding the digest recorded for `key` in shadow mode."""
+    return f"{key}|{SHADOW_KEY_SUFFIX}"
+
+
+def get_entity_key(prefix: str, table: str, id: Any) -> str:
+    """Return the key under which the row of `table` with primary key `id` is cached."""
+    return f"{prefix}|{ENTITY_KEY_PREFIX}:{table}:{id}"
+
+
+def get_tags(namespace: Optional[str] = None, tags: Iterable[str] = ()) -> List[str]:
+    """Return `tags` and the tag of `namespace`, which every key carries."""
+    all_tags = {str(namespace)} if namespace is not None else set()
+    all_tags.update(tags)
+    return sorted(all_tags)
+
+
+def get_tag_keys(
+    prefix: str, namespace: Optional[str] = None, tags: Iterable[str] = ()
+) -> List[str]:
+    """Return the tag sets of `tags`; every key is also tagged with its namespace."""
+    return [get_tag_key(prefix, tag) for tag in get_tags(namespace, tags)]
+
+
+def get_writes_key(prefix: str, tag: str) -> str:
+    """Return the hash that records when the entries tagged `tag` were invalidated."""
+    return f"{prefix}|{WRITES_KEY_PREFIX}:{tag}"
+
+
+def get_denied_key(prefix: str, name: str, id: Any) -> str:
+    """Return the key marking `id` as denied by the denylist `name`."""
+    return f"{prefix}|{DENIED_KEY_PREFIX}:{name}:{id}"
+
+
+def get_denylist_key(prefix: str) -> str:
+    """Return the name of the sorted set of the denied keys, scored by expiry."""
+    return f"{prefix}|{DENIED_KEY_PREFIX}"
+
+
+def get_ignored_arg_types(
+    ignore_arg_types: Optional[Iterable[ArgType]],
+) -> FrozenSet[ArgType]:
+    """Return `ignore_arg_types` together with the types that are always ignored."""
+    return frozenset(ignore_arg_types or ()).union(ALWAYS_IGNORE_ARG_TYPES)
+
+
+class KeyBuilder:
+    """Builds the cache keys of a single function.
+
+    The signature of `func` is inspected once, and the format string for the
+    arguments that make up the key is compiled the first time keys are built
+    with a given set of ignored types. Endpoints are called by FastAPI with
+    keyword arguments only, so those calls skip `Signature.bind`.
+
+    Args:
+        func (`Callable`): Path operation function for an API endpoint.
+        vary_by (`Iterable[str]`, optional): Attributes of arguments that are part
+            of the key even if the type of the argument is ignored, written as
+            `argument.attribute`, e.g. `current_user.is_superuser`. A bare argument
+            name adds the argument itself.
+
+    Raises:
+        ValueError: If an item of `vary_by` does not start with an argument name.
+    """
+
+    def __init__(self, func: Callable, vary_by: Iterable[str] = ()) -> None:
+        self.func = func
+        self.name = f"{func.__module__}.{func.__name__}"
+        self.signature = signature(func)
+        self.keyword_only_calls = all(
+            param.kind in SIMPLE_PARAMETER_KINDS
+            for param in self.signature.parameters.values()
+        )
+        self.vary_by = tuple(vary_by)
+        vary: List[Tuple[str, Any, Optional[Callable[[Any], Any]]]] = []
+        for path in self.vary_by:
+            name, _, attr = path.partition(".")
+            if name not in self.signature.parameters:
+                raise ValueError(f"{self.name} has no argument {name!r} to vary by")
+            default = self.signature.parameters[name].default
+            vary.append((name, default, attrgetter(attr) if attr else None))
+        self._vary = tuple(vary)
+        self._ignored: Optional[FrozenSet[ArgType]] = None
+        self._params: Tuple[Tuple[str, Any], ...] = ()
+        self._template = ""
+
+    def compile(self, ignored: FrozenSet[ArgType]) -> None:
+        """Precompute the arguments that are part of the key and their format."""
+        self._params = tuple(
+            (name, param.default)
+            for name, param in self.signature.parameters.items()
+            if param.annotation not in ignored
+        )
+        args_template = ",".join(
+            [f"{name}={{}}" for name, _ in self._params]
+            + [f"{path}={{}}" for path in self.vary_by]
+        )
+        self._template = f"{self.name}({args_template})"
+        self._ignored = ignored
+
+    def __call__(
+        self,
+        prefix: str,
+        ignored: FrozenSet[ArgType],
+        args: Tuple[Any, ...],
+        kwargs: Dict[str, Any],
+        max_key_length: int = DEFAULT_MAX_KEY_LENGTH,
+    ) -> str:
+        """Return the key for a call of the function with `args` and `kwargs`.
+
+        Args:
+            prefix (`str`): Prefix of the key, including its separator.
+            ignored (`FrozenSet[ArgType]`): Types of the arguments left out of the key,
+                see `get_ignored_arg_types`.
+            max_key_length (`int`, optional): Keys longer than this are shortened to
+                the function name and a fixed-length digest of the arguments.
+                Defaults to 256.
+        """
+        if ignored is not self._ignored:
+            self.compile(ignored)
+        if args or not self.keyword_only_calls:
+            values = self._bind(args, kwargs)
+        else:
+            values = [kwargs.get(name, default) for name, default in self._params]
+            if any(value is Parameter.empty for value in values):
+                # let `Signature.bind` report the missing argument
+                values = self._bind(args, kwargs)
+            elif self._vary:
+                values.extend(
+                    _get_vary_value(kwargs.get(name, default), getter)
+                    for name, default, getter in self._vary
+                )
+        key = prefix + self._template.format(*values)
+        if len(key) <= max_key_length:
+            return key
+        digest = blake2b(key.encode(), digest_size=KEY_DIGEST_SIZE).hexdigest()
+        return f"{prefix}{self.name}(#{digest})"
+
+    def _bind(self, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> List[Any]:
+        func_args = get_func_args(self.signature, *args, **kwargs)
+        return [func_args[name] for name, _ in self._params] + [
+            _get_vary_value(func_args[name], getter) for name, _, getter in self._vary
+        ]
+
+
+def _get_vary_value(value: Any, getter: Optional[Callable[[Any], Any]]) -> Any:
+    """Return the attribute of an argument that the key varies by, or None."""
+    if getter is None or value is None:
+        return value
+    try:
+        return getter(value)
+    except AttributeError:
+        return None
+
+
 def get_cache_key(
     prefix: str,
     ignore_arg_types: List[ArgType],
@@ -48,18 +241,9 @@ def get_cache_key(
         `str`: Unique identifier for `func`, `*args` and `**kwargs` that can be used as a
             Redis key to retrieve cached API response data.
     """
-
-    if not ignore_arg_types:
-        ignore_arg_types = []
-    ignore_arg_types.extend(ALWAYS_IGNORE_ARG_TYPES)
-    ignore_arg_types = list(set(ignore_arg_types))
     prefix = f"{prefix}:" if prefix else ""
-
-    sig = signature(func)
-    sig_params = sig.parameters
-    func_args = get_func_args(sig, *args, **kwargs)
-    args_str = get_args_str(sig_params, func_args, ignore_arg_types)
-    return f"{prefix}{func.__module__}.{func.__name__}({args_str})"
+    ignored = get_ignored_arg_types(ignore_arg_types)
+    return KeyBuilder(func)(prefix, ignored, args, kwargs)
 
 
 def get_func_args(
@@ -0,0 +1,150 @@
+"""local.py"""
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+DEFAULT_LOCAL_MAX_ENTRIES = 1024
+DEFAULT_LOCAL_MAX_BYTES = 16 * 1024 * 1024
+
+
+@dataclass
+class LocalEntry:
+    """A single in-process cache entry."""
+
+    value: Any
+    size: int
+    expires_at: float
+    namespace: Optional[str] = None
+
+
+@dataclass
+class LocalStats:
+    """Per-namespace counters for the in-process cache tier."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hit_ratio, 4),
+        }
+
+
+class LocalCache:
+    """Bounded LRU that keeps decoded cache entries in the worker process.
+
+    Entries are bounded both by count (`max_entries`) and by the size of their
+    serialized payload (`max_bytes`). Every entry carries its own expiry, which
+    callers cap at the remaining Redis TTL so the local tier never outlives the
+    shared one.
+
+    `version` grows whenever an entry is deleted or invalidated. A caller that
+    loads a value from elsewhere reads it first and stores the value only if it
+    has not changed, so that a value loaded before an invalidation is not stored
+    after it.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_LOCAL_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_LOCAL_MAX_BYTES,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.version = 0
+        self._entries: "OrderedDict[str, LocalEntry]" = OrderedDict()
+        self._stats: Dict[str, LocalStats] = defaultdict(LocalStats)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def get(self, key: str, namespace: Optional[str] = None) -> Optional[Any]:
+        """Return the value stored for `key`, or None if it is missing or expired."""
+        stats = self._stats[namespace]
+        entry = self._entries.get(key)
+        if entry is None:
+            stats.misses += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            stats.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        stats.hits += 1
+        return entry.value
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        size: int,
+        ttl: int,
+        namespace: Optional[str] = None,
+    ) -> bool:
+        """Store `value` for `ttl` seconds, evicting least recently used entries."""
+        if not self.enabled or ttl <= 0 or size > self.max_bytes:
+            return False
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = LocalEntry(
+            value=value,
+            size=size,
+            expires_at=time.monotonic() + ttl,
+            namespace=namespace,
+        )
+        self.current_bytes += size
+        while (
+            len(self._entries) > self.max_entries
+            or self.current_bytes > self.max_bytes
+        ):
+            victim = next(iter(self._entries))
+            self._stats[self._entries[victim].namespace].evictions += 1
+            self._remove(victim)
+        return True
+
+    def delete(self, key: str) -> None:
+        self.version += 1
+        if key in self._entries:
+            self._remove(key)
+
+    def invalidate_prefix(self, prefix: str) -> int:
+        """Remove every entry whose key starts with `prefix`."""
+        self.version += 1
+        keys = [key for key in self._entries if key.startswith(prefix)]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def clear(self) -> None:
+        self.version += 1
+        self._entries.clear()
+        self.current_bytes = 0
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return hit/miss counters keyed by namespace."""
+        return {
+            str(namespace): stats.as_dict()
+            for namespace, stats in self._stats.items()
+        }
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self.current_bytes -= entry.size
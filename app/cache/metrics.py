@@ -0,0 +1,266 @@
+"""metrics.py"""
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Mapping, Optional
+
+# upper bounds of the latency buckets in milliseconds, the last bucket is unbounded
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000)
+COUNTERS = (
+    "hits",
+    "local_hits",
+    "stale_hits",
+    "not_found_hits",
+    "misses",
+    "stores",
+    "store_errors",
+    "bytes_read",
+    "bytes_written",
+    "shadow_hits",
+    "shadow_misses",
+    "shadow_diverged",
+    "shadow_saved_us",
+)
+HISTOGRAMS = ("encode", "decode", "redis")
+NAMESPACE_COUNTERS = ("invalidations", "keys_invalidated")
+# endpoint name used for the fields of a namespace in the aggregated metrics
+NAMESPACE_FIELD = "*"
+FIELD_SEPARATOR = "|"
+
+
+class Histogram:
+    """Latency histogram with fixed buckets, see `LATENCY_BUCKETS_MS`."""
+
+    __slots__ = ("counts", "total_ms", "max_ms")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def observe(self, seconds: float) -> None:
+        ms = seconds * 1000
+        self.counts[bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Return the upper bound of the bucket holding the `q` quantile."""
+        count = self.count
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for bound, bucket_count in zip(LATENCY_BUCKETS_MS, self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return max(self.max_ms, LATENCY_BUCKETS_MS[-1])
+
+    def as_dict(self) -> Dict[str, Any]:
+        count = self.count
+        return {
+            "count": count,
+            "mean_ms": round(self.total_ms / count, 3) if count else None,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max_ms, 3) if self.max_ms else None,
+            "buckets": {
+                f"le_{bound}": bucket_count
+                for bound, bucket_count in zip(
+                    (*LATENCY_BUCKETS_MS, "inf"), self.counts
+                )
+            },
+        }
+
+
+@dataclass
+class EndpointMetrics:
+    """Counters and latencies of one cached endpoint."""
+
+    hits: int = 0
+    local_hits: int = 0
+    stale_hits: int = 0
+    not_found_hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    store_errors: int = 0
+    bytes_read: int = 0
+    bytes_written: int = 0
+    # would-be hits and misses of an endpoint in shadow mode, see `cache.cache`
+    shadow_hits: int = 0
+    shadow_misses: int = 0
+    shadow_diverged: int = 0
+    shadow_saved_us: int = 0
+    encode: Histogram = field(default_factory=Histogram)
+    decode: Histogram = field(default_factory=Histogram)
+    redis: Histogram = field(default_factory=Histogram)
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        stats = {
+            **{name: getattr(self, name) for name in COUNTERS},
+            "hit_ratio": round(self.hit_ratio, 4),
+            **{name: getattr(self, name).as_dict() for name in HISTOGRAMS},
+        }
+        if self.shadow_hits or self.shadow_misses:
+            stats["shadow"] = self.shadow_report()
+        return stats
+
+    def shadow_report(self) -> Dict[str, Any]:
+        """Summarize what caching would have saved and how often it served stale data.
+
+        `divergence_rate` is the share of would-be hits whose cached response
+        differed from the live one.
+        """
+        total = self.shadow_hits + self.shadow_misses
+        return {
+            "hit_ratio": round(self.shadow_hits / total, 4) if total else 0.0,
+            "divergence_rate": (
+                round(self.shadow_diverged / self.shadow_hits, 4)
+                if self.shadow_hits
+                else 0.0
+            ),
+            "saved_seconds": round(self.shadow_saved_us / 1e6, 3),
+        }
+
+    def as_fields(self) -> Dict[str, int]:
+        """Return every counter and histogram bucket as an integer field.
+
+        Latency sums are kept in microseconds so that all fields can be added up
+        with `HINCRBY`.
+        """
+        fields = {name: getattr(self, name) for name in COUNTERS}
+        for name in HISTOGRAMS:
+            histogram = getattr(self, name)
+            for i, bucket_count in enumerate(histogram.counts):
+                fields[f"{name}.{i}"] = bucket_count
+            fields[f"{name}.sum_us"] = int(histogram.total_ms * 1000)
+        return fields
+
+    @classmethod
+    def from_fields(cls, fields: Mapping[str, int]) -> "EndpointMetrics":
+        metrics = cls(**{name: int(fields.get(name, 0)) for name in COUNTERS})
+        for name in HISTOGRAMS:
+            histogram = getattr(metrics, name)
+            histogram.counts = [
+                int(fields.get(f"{name}.{i}", 0))
+                for i in range(len(histogram.counts))
+            ]
+            histogram.total_ms = int(fields.get(f"{name}.sum_us", 0)) / 1000
+        return metrics
+
+
+@dataclass
+class NamespaceMetrics:
+    """Invalidation counters of a namespace and the metrics of its endpoints."""
+
+    invalidations: int = 0
+    keys_invalidated: int = 0
+    endpoints: Dict[str, EndpointMetrics] = field(
+        default_factory=lambda: defaultdict(EndpointMetrics)
+    )
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "invalidations": self.invalidations,
+            "keys_invalidated": self.keys_invalidated,
+            "endpoints": {
+                endpoint: metrics.as_dict()
+                for endpoint, metrics in self.endpoints.items()
+            },
+        }
+
+
+class CacheMetrics:
+    """In-memory cache metrics of a worker, grouped by namespace and endpoint.
+
+    The decorator looks up the `EndpointMetrics` of an endpoint once and updates
+    its fields directly, so recording a request costs a few attribute updates.
+    """
+
+    def __init__(self) -> None:
+        self._namespaces: Dict[str, NamespaceMetrics] = defaultdict(NamespaceMetrics)
+        # fields already added to the aggregated metrics, see `pop_deltas`
+        self._flushed: Dict[str, Dict[str, int]] = defaultdict(dict)
+
+    def namespace(self, namespace: Optional[str]) -> NamespaceMetrics:
+        return self._namespaces[str(namespace)]
+
+    def endpoint(self, namespace: Optional[str], endpoint: str) -> EndpointMetrics:
+        return self.namespace(namespace).endpoints[endpoint]
+
+    def invalidated(self, namespace: Optional[str], keys: int) -> None:
+        metrics = self.namespace(namespace)
+        metrics.invalidations += 1
+        metrics.keys_invalidated += keys
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            namespace: metrics.as_dict()
+            for namespace, metrics in self._namespaces.items()
+        }
+
+    def as_fields(self) -> Dict[str, Dict[str, int]]:
+        """Return the fields of every namespace, keyed by `endpoint|field`."""
+        result = {}
+        for namespace, metrics in self._namespaces.items():
+            fields = {
+                f"{NAMESPACE_FIELD}{FIELD_SEPARATOR}{name}": getattr(metrics, name)
+                for name in NAMESPACE_COUNTERS
+            }
+            for endpoint, endpoint_metrics in metrics.endpoints.items():
+                for name, value in endpoint_metrics.as_fields().items():
+                    fields[f"{endpoint}{FIELD_SEPARATOR}{name}"] = value
+            result[namespace] = fields
+        return result
+
+    def pop_deltas(self) -> Dict[str, Dict[str, int]]:
+        """Return how much every field grew since the previous call."""
+        deltas = {}
+        for namespace, fields in self.as_fields().items():
+            flushed = self._flushed[namespace]
+            changed = {
+                name: value - flushed.get(name, 0)
+                for name, value in fields.items()
+                if value != flushed.get(name, 0)
+            }
+            if changed:
+                deltas[namespace] = changed
+            flushed.update(fields)
+        return deltas
+
+    @staticmethod
+    def from_fields(
+        fields_by_namespace: Mapping[str, Mapping[str, int]]
+    ) -> Dict[str, Dict[str, Any]]:
+        """Build a snapshot from fields aggregated by `as_fields`."""
+        snapshot = {}
+        for namespace, fields in fields_by_namespace.items():
+            by_endpoint: Dict[str, Dict[str, int]] = defaultdict(dict)
+            for name, value in fields.items():
+                endpoint, _, endpoint_field = name.rpartition(FIELD_SEPARATOR)
+                by_endpoint[endpoint][endpoint_field] = value
+            namespace_fields = by_endpoint.pop(NAMESPACE_FIELD, {})
+            metrics = NamespaceMetrics(
+                **{
+                    name: int(namespace_fields.get(name, 0))
+                    for name in NAMESPACE_COUNTERS
+                }
+            )
+            for endpoint, endpoint_fields in by_endpoint.items():
+                metrics.endpoints[endpoint] = EndpointMetrics.from_fields(
+                    endpoint_fields
+                )
+            snapshot[namespace] = metrics.as_dict()
+        return snapshot
@@ -1,15 +1,23 @@
 """redis.py"""
 import os
-from typing import Tuple
+from typing import Optional, Tuple
 
 import redis.asyncio as redis
 from cache.enums import RedisStatus
 
+DEFAULT_MAX_CONNECTIONS = 50
+DEFAULT_SOCKET_TIMEOUT = 5.0
+HEALTH_CHECK_INTERVAL = 30
 
-async def redis_connect(host_url: str) -> Tuple[RedisStatus, redis.Redis]:
+
+async def redis_connect(
+    host_url: str,
+    max_connections: int = DEFAULT_MAX_CONNECTIONS,
+    socket_timeout: Optional[float] = DEFAULT_SOCKET_TIMEOUT,
+) -> Tuple[RedisStatus, redis.Redis]:
     """Attempt to connect to `host_url` and return a Redis client instance if successful."""
     return (
-        await _connect(host_url)
+        await _connect(host_url, max_connections, socket_timeout)
         if os.environ.get("CACHE_ENV") != "TEST"
         else _connect_fake()
     )
@@ -17,19 +25,33 @@ async def redis_connect(host_url: str) -> Tuple[RedisStatus, redis.Redis]:
 
 async def _connect(
     host_url: str,
+    max_connections: int,
+    socket_timeout: Optional[float],
 ) -> tuple[RedisStatus, redis.Redis]:  # pragma: no cover
+    # requests wait up to `socket_timeout` for a free connection instead of
+    # failing as soon as all `max_connections` are in use
+    pool = redis.BlockingConnectionPool.from_url(
+        host_url,
+        max_connections=max_connections,
+        timeout=socket_timeout,
+        socket_timeout=socket_timeout,
+        socket_connect_timeout=socket_timeout,
+        health_check_interval=HEALTH_CHECK_INTERVAL,
+    )
+    redis_client = redis.Redis(connection_pool=pool)
     try:
-        redis_client = await redis.from_url(host_url)
         if await redis_client.ping():
             return (RedisStatus.CONNECTED, redis_client)
-        return (RedisStatus.CONN_ERROR, None)
+        status = RedisStatus.CONN_ERROR
     except redis.AuthenticationError:
-        return (RedisStatus.AUTH_ERROR, None)
-    except redis.ConnectionError:
-        return (RedisStatus.CONN_ERROR, None)
+        status = RedisStatus.AUTH_ERROR
+    except (redis.ConnectionError, redis.TimeoutError, OSError):
+        status = RedisStatus.CONN_ERROR
+    await redis_client.close(close_connection_pool=True)
+    return (status, None)
 
 
 def _connect_fake() -> Tuple[RedisStatus, redis.Redis]:
-    from fakeredis import FakeRedis
+    from fakeredis.aioredis import FakeRedis
 
     return (RedisStatus.CONNECTED, FakeRedis())
@@ -45,18 +45,7 @@ def object_hook(obj):
 
 
 def serialize_json(json_dict):
-    return json.dumps(
-        jsonable_encoder(
-            json_dict,
-            custom_encoder={
-                bytes: lambda x: {
-                    "_spec_type": str(bytes),
-                    "val": b64encode(x),
-                },
-            },
-            recursion=8,
-        )
-    )
+    return json.dumps(json_encoder(json_dict, recursion=8))
 
 
 def deserialize_json(json_str):
@@ -217,3 +206,197 @@ def jsonable_encoder(
         sqlalchemy_safe=sqlalchemy_safe,
         recursion=recursion,
     )
+
+
+# encoders receive the object and the recursion budget left after it was counted
+Handler = Callable[[Any, int], Any]
+SEQUENCE_TYPES = (list, set, frozenset, GeneratorType, tuple)
+SCALAR_TYPES = (str, int, float, bool, type(None))
+
+
+class JSONableEncoder:
+    """`jsonable_encoder` with a dispatch table cached per type.
+
+    The output is the same as `jsonable_encoder(obj, custom_encoder=...,
+    recursion=...)`, including the values cut off by the recursion limit, but the
+    checks that pick an encoder run once for every type instead of once for
+    every value. Pydantic models are encoded from their fields with the aliases
+    computed once per model instead of through `BaseModel.dict`, and SQLAlchemy
+    rows from their instance dict without first trying `dict(obj)`.
+
+    Args:
+        custom_encoder (`Dict[Any, Callable[[Any], Any]]`, optional): Encoders
+            for types that take precedence over the defaults.
+    """
+
+    def __init__(
+        self, custom_encoder: Optional[Dict[Any, Callable[[Any], Any]]] = None
+    ) -> None:
+        self.custom_encoder = dict(custom_encoder or {})
+        # values of these types are returned as they are, without a handler call
+        self._scalars = frozenset(
+            cls
+            for cls in SCALAR_TYPES
+            if not any(issubclass(cls, custom) for custom in self.custom_encoder)
+        )
+        self._handlers: Dict[type, Handler] = {}
+        self._field_handlers: Dict[type, Handler] = {}
+        self._aliases: Dict[type, Dict[str, str]] = {}
+
+    def __call__(self, obj: Any, recursion: int = 10) -> Any:
+        return self.encode(obj, recursion)
+
+    def encode(self, obj: Any, recursion: int) -> Any:
+        recursion -= 1
+        if recursion <= 0:
+            return None
+        try:
+            handler = self._handlers[type(obj)]
+        except KeyError:
+            handler = self._handlers[type(obj)] = self._get_handler(type(obj))
+        return handler(obj, recursion)
+
+    def _get_handler(self, cls: type) -> Handler:
+        """Return the encoder `jsonable_encoder` would pick for instances of `cls`."""
+        if issubclass(cls, type):
+            # classes can be dataclasses themselves, keep the per-object checks
+            return self._encode_slow
+        if cls in self.custom_encoder:
+            return _call_encoder(self.custom_encoder[cls])
+        for encoder_type, encoder_instance in self.custom_encoder.items():
+            if issubclass(cls, encoder_type):
+                return _call_encoder(encoder_instance)
+        if issubclass(cls, BaseModel):
+            json_encoders = getattr(cls.__config__, "json_encoders", {})
+            if (
+                set(json_encoders).difference(self.custom_encoder)
+                or cls.__include_fields__
+                or cls.__exclude_fields__
+            ):
+                return self._encode_slow
+            return self._encode_model
+        if dataclasses.is_dataclass(cls):
+            return lambda obj, recursion: dataclasses.asdict(obj)
+        if issubclass(cls, Enum):
+            return lambda obj, recursion: obj.value
+        if issubclass(cls, PurePath):
+            return lambda obj, recursion: str(obj)
+        if issubclass(cls, (str, int, float, type(None))):
+            return lambda obj, recursion: obj
+        if issubclass(cls, dict):
+            return lambda obj, recursion: self._encode_items(obj.items(), recursion)
+        if issubclass(cls, SEQUENCE_TYPES):
+            return lambda obj, recursion: [self.encode(item, recursion) for item in obj]
+        if cls in ENCODERS_BY_TYPE:
+            return _call_encoder(ENCODERS_BY_TYPE[cls])
+        for encoder, classes_tuple in encoders_by_class_tuples.items():
+            if issubclass(cls, classes_tuple):
+                return _call_encoder(encoder)
+        if hasattr(cls, "_sa_class_manager") and not (
+            hasattr(cls, "__iter__") or hasattr(cls, "keys")
+        ):
+            # `dict(obj)` fails for SQLAlchemy rows and their `vars` are used
+            return self._encode_row
+        return self._encode_slow
+
+    def _encode_slow(self, obj: Any, recursion: int) -> Any:
+        return jsonable_encoder(
+            obj, custom_encoder=self.custom_encoder, recursion=recursion + 1
+        )
+
+    def _encode_row(self, obj: Any, recursion: int) -> Any:
+        recursion -= 1
+        if recursion <= 0:
+            return None
+        return self._encode_items(obj.__dict__.items(), recursion)
+
+    def _encode_items(self, items: Any, recursion: int) -> Dict[Any, Any]:
+        return self._encode_mapping(items, recursion, self.encode)
+
+    def _encode_mapping(
+        self, items: Any, recursion: int, encode_value: Handler
+    ) -> Dict[Any, Any]:
+        """Encode the keys and values of a dict whose own recursion is counted."""
+        encode = self.encode
+        scalars = self._scalars
+        # what `encode` returns for a scalar at this depth
+        keep = recursion > 1
+        encoded = {}
+        for key, value in items:
+            if isinstance(key, str) and key.startswith("_sa"):
+                continue
+            if type(key) in scalars:
+                key = key if keep else None
+            else:
+                key = encode(key, recursion)
+            if type(value) in scalars:
+                encoded[key] = value if keep else None
+            else:
+                encoded[key] = encode_value(value, recursion)
+        return encoded
+
+    def _encode_field(self, value: Any, recursion: int) -> Any:
+        """Encode `value` as `jsonable_encoder` does after `BaseModel.dict`.
+
+        `BaseModel.dict` turns nested models into dicts, so they are counted once
+        against the recursion limit instead of twice.
+        """
+        try:
+            handler = self._field_handlers[type(value)]
+        except KeyError:
+            handler = self._field_handlers[type(value)] = self._get_field_handler(
+                type(value)
+            )
+        return handler(value, recursion)
+
+    def _get_field_handler(self, cls: type) -> Handler:
+        if issubclass(cls, BaseModel):
+            return self._encode_model
+        if issubclass(cls, dict):
+            return self._encode_field_items
+        if issubclass(cls, (list, tuple, set, frozenset)):
+            return self._encode_field_sequence
+        return self.encode
+
+    def _encode_model(self, obj: BaseModel, recursion: int) -> Any:
+        if "__root__" in obj.__dict__:
+            return self._encode_field(obj.__dict__["__root__"], recursion)
+        try:
+            aliases = self._aliases[type(obj)]
+        except KeyError:
+            aliases = self._aliases[type(obj)] = {
+                name: field.alias for name, field in obj.__fields__.items()
+            }
+        return self._encode_field_items(
+            ((aliases.get(name, name), value) for name, value in obj.__dict__.items()),
+            recursion,
+        )
+
+    def _encode_field_items(self, items: Any, recursion: int) -> Any:
+        recursion -= 1
+        if recursion <= 0:
+            return None
+        if isinstance(items, dict):
+            items = items.items()
+        return self._encode_mapping(items, recursion, self._encode_field)
+
+    def _encode_field_sequence(self, obj: Any, recursion: int) -> Any:
+        recursion -= 1
+        if recursion <= 0:
+            return None
+        return [self._encode_field(item, recursion) for item in obj]
+
+
+def _call_encoder(encoder: Callable[[Any], Any]) -> Handler:
+    return lambda obj, recursion: encoder(obj)
+
+
+# the encoder of cached values, see `serialize_json`
+json_encoder = JSONableEncoder(
+    custom_encoder={
+        bytes: lambda x: {
+            "_spec_type": str(bytes),
+            "val": b64encode(x).decode(),
+        },
+    },
+)
@@ -0,0 +1,144 @@
+"""warm.py"""
+import asyncio
+from contextlib import AsyncExitStack
+from dataclasses import dataclass
+from inspect import Parameter, Signature
+from typing import (
+    Any,
+    AsyncContextManager,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Type,
+)
+
+from fastapi import BackgroundTasks
+from fastapi.params import Depends
+from pydantic.fields import FieldInfo
+
+from cache.client import Cache
+from cache.enums import RedisEvent
+
+DEFAULT_WARM_UP_CONCURRENCY = 4
+
+# creates the value of every endpoint argument annotated with the key type, e.g.
+# `{AsyncSession: async_session}`
+Providers = Mapping[Type[object], Callable[[], AsyncContextManager]]
+
+
+@dataclass
+class WarmUp:
+    """Argument sets to precompute for a cached endpoint.
+
+    `func` is called with a `BackgroundTasks` object followed by the arguments.
+    """
+
+    name: str
+    func: Callable
+    signature: Signature
+    params: List[Dict[str, Any]]
+
+
+WARM_UPS: List[WarmUp] = []
+# strong references to warm-ups running in the background, see `start_warm_up`
+_warm_up_tasks: Set[asyncio.Task] = set()
+
+
+def register_warm_up(
+    name: str, func: Callable, signature: Signature, params: List[Dict[str, Any]]
+) -> None:
+    """Register `func` to be called with every item of `params`, see `WarmUp`."""
+    for item in params:
+        unknown = set(item).difference(signature.parameters)
+        if unknown:
+            raise ValueError(f"{name} has no arguments {sorted(unknown)} to warm up")
+    WARM_UPS.append(WarmUp(name, func, signature, params))
+
+
+async def warm_up(
+    providers: Optional[Providers] = None,
+    concurrency: int = DEFAULT_WARM_UP_CONCURRENCY,
+) -> Dict[str, int]:
+    """Evaluate every registered argument set through its cache decorator.
+
+    Missing keys are computed and stored and stale ones are refreshed, so the
+    first requests after a deploy or a Redis flush find them in the cache.
+    Arguments that are not in the argument set are created by `providers`, take
+    their default value, or are passed as None.
+
+    Args:
+        providers (Providers, optional): Factories of async context managers for
+            the arguments that need a resource, keyed by annotation.
+        concurrency (int, optional): Maximum number of endpoints evaluated at the
+            same time. Defaults to 4.
+
+    Returns:
+        Dict[str, int]: The number of argument sets warmed and failed.
+    """
+    redis_cache = Cache()
+    if redis_cache.not_connected:
+        return {"warmed": 0, "failed": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+    calls = [
+        _warm(entry, params, providers or {}, semaphore)
+        for entry in WARM_UPS
+        for params in entry.params
+    ]
+    results = await asyncio.gather(*calls)
+    return {"warmed": results.count(True), "failed": results.count(False)}
+
+
+def start_warm_up(
+    providers: Optional[Providers] = None,
+    concurrency: int = DEFAULT_WARM_UP_CONCURRENCY,
+) -> asyncio.Task:
+    """Run `warm_up` in the background, e.g. without delaying the startup hook."""
+    task = asyncio.ensure_future(warm_up(providers, concurrency))
+    _warm_up_tasks.add(task)
+    task.add_done_callback(_warm_up_tasks.discard)
+    return task
+
+
+async def _warm(
+    entry: WarmUp,
+    params: Dict[str, Any],
+    providers: Providers,
+    semaphore: asyncio.Semaphore,
+) -> bool:
+    async with semaphore:
+        try:
+            async with AsyncExitStack() as stack:
+                kwargs = {}
+                for name, param in entry.signature.parameters.items():
+                    if name in params:
+                        kwargs[name] = params[name]
+                    elif param.annotation in providers:
+                        kwargs[name] = await stack.enter_async_context(
+                            providers[param.annotation]()
+                        )
+                    else:
+                        kwargs[name] = _get_default(param)
+                background_tasks = BackgroundTasks()
+                await entry.func(background_tasks, **kwargs)
+                # refresh stale entries while the provided resources are open
+                await background_tasks()
+        except Exception as e:
+            Cache().log(
+                RedisEvent.FAILED_TO_WARM_KEY, msg=f"{entry.name}({params}): {e!r}"
+            )
+            return False
+    return True
+
+
+def _get_default(param: Parameter) -> Any:
+    """Return the value FastAPI would use for a parameter missing from the request."""
+    default = param.default
+    if default is Parameter.empty or isinstance(default, Depends):
+        return None
+    if isinstance(default, FieldInfo):
+        # `Query(...)`, `Body(...)` and the other parameter functions
+        return None if default.default is Ellipsis else default.default
+    return default
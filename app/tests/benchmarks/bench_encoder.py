@@ -0,0 +1,62 @@
+"""Cost of encoding a cached response with a list of 100 users.
+
+Run from the `app` directory with `python -m tests.benchmarks.bench_encoder`.
+"""
+import timeit
+from datetime import datetime
+from decimal import Decimal
+
+from app import models, schemas
+from cache.util import jsonable_encoder, json_encoder
+
+ROWS = 100
+NUMBER = 200
+
+
+def get_response(content):
+    return {
+        "header": {"status": 0, "message": "Successful Operation", "messageCode": 0},
+        "content": content,
+    }
+
+
+def main():
+    users = [
+        models.User(
+            id=i,
+            email=f"user{i}@example.com",
+            full_name=f"User {i}",
+            hashed_password="$2b$12$" + "x" * 53,
+            is_active=True,
+            is_superuser=False,
+            amount=Decimal("120.50"),
+            is_deleted=False,
+            created=datetime(2024, 1, 1, 10, 30),
+            modified=datetime(2024, 1, 2, 10, 30),
+        )
+        for i in range(ROWS)
+    ]
+    for name, content in (
+        ("rows", users),
+        ("schemas", [schemas.User.from_orm(user) for user in users]),
+    ):
+        response = get_response(content)
+        before = jsonable_encoder(
+            response, custom_encoder=json_encoder.custom_encoder, recursion=8
+        )
+        assert before == json_encoder(response, recursion=8)
+        for label, stmt in (
+            (
+                "before",
+                lambda: jsonable_encoder(
+                    response, custom_encoder=json_encoder.custom_encoder, recursion=8
+                ),
+            ),
+            ("after", lambda: json_encoder(response, recursion=8)),
+        ):
+            seconds = min(timeit.repeat(stmt, number=NUMBER, repeat=5))
+            print(f"{name:>7} {label:>6}: {seconds / NUMBER * 1e6:.1f} us per list")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Cost of answering a cache hit for a response with a list of 100 users.
+
+Before, hits decoded the cached value and FastAPI validated and rendered it again
+through the response model; now the body rendered on the miss is sent as is.
+
+Run from the `app` directory with `python -m tests.benchmarks.bench_hits`.
+"""
+import asyncio
+import time
+from datetime import datetime
+from decimal import Decimal
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+
+from app import models, schemas
+from app.utils import APIResponse, APIResponseType
+from cache.cache import get_response_field, render_response, to_response
+from cache.codecs import decode, decode_response, encode, get_codec, ResponseBodyCodec
+
+ROWS = 100
+NUMBER = 200
+
+
+async def read_users() -> APIResponseType[List[schemas.User]]:
+    return APIResponse(
+        [
+            models.User(
+                id=i,
+                email=f"user{i}@example.com",
+                full_name=f"User {i}",
+                hashed_password="$2b$12$" + "x" * 53,
+                is_active=True,
+                is_superuser=False,
+                amount=Decimal("120.50"),
+                is_deleted=False,
+                created=datetime(2024, 1, 1, 10, 30),
+                modified=datetime(2024, 1, 2, 10, 30),
+            )
+            for i in range(ROWS)
+        ]
+    )
+
+
+async def measure(label, hit):
+    best = None
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(NUMBER):
+            response = await hit()
+        seconds = time.perf_counter() - started
+        best = seconds if best is None else min(best, seconds)
+    print(f"{label:>6}: {best / NUMBER * 1e6:.1f} us per hit")
+    return response.body
+
+
+async def main():
+    field = get_response_field(read_users)
+    value = await read_users()
+    rendered = await render_response(field, value)
+    before_entry = encode(value, get_codec("json"))
+    after_entry = bytes((ResponseBodyCodec.format_id,)) + rendered.body
+
+    async def before():
+        content = await serialize_response(
+            field=field, response_content=decode(before_entry)
+        )
+        return JSONResponse(content)
+
+    async def after():
+        return to_response(decode_response(after_entry))
+
+    assert await measure("before", before) == await measure("after", after)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
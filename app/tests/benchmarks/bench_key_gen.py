@@ -0,0 +1,62 @@
+"""Per-call cost of building a cache key.
+
+Run from the `app` directory with `python -m tests.benchmarks.bench_key_gen`.
+"""
+import timeit
+from inspect import signature
+
+from fastapi import Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache.key_gen import get_args_str, get_func_args, get_ignored_arg_types, KeyBuilder
+
+IGNORE_ARG_TYPES = [Request, Response, AsyncSession]
+NUMBER = 100_000
+
+
+async def read_books(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    category_id: int = None,
+    q: str = None,
+):
+    pass
+
+
+def get_cache_key_before(prefix, ignore_arg_types, func, *args, **kwargs):
+    """`get_cache_key` before key builders were compiled per endpoint."""
+    ignore_arg_types.extend([Response, Request])
+    ignore_arg_types = list(set(ignore_arg_types))
+    prefix = f"{prefix}:" if prefix else ""
+    sig = signature(func)
+    func_args = get_func_args(sig, *args, **kwargs)
+    args_str = get_args_str(sig.parameters, func_args, ignore_arg_types)
+    return f"{prefix}{func.__module__}.{func.__name__}({args_str})"
+
+
+def main():
+    kwargs = {"db": AsyncSession(), "skip": 20, "limit": 10, "q": "dune"}
+    ignore_arg_types = list(IGNORE_ARG_TYPES)
+    ignored = get_ignored_arg_types(IGNORE_ARG_TYPES)
+    key_builder = KeyBuilder(read_books)
+
+    before = get_cache_key_before("api|books", ignore_arg_types, read_books, **kwargs)
+    after = key_builder("api|books:", ignored, (), kwargs)
+    assert before == after, (before, after)
+
+    for name, stmt in (
+        (
+            "before",
+            lambda: get_cache_key_before(
+                "api|books", list(IGNORE_ARG_TYPES), read_books, **kwargs
+            ),
+        ),
+        ("after", lambda: key_builder("api|books:", ignored, (), kwargs)),
+    ):
+        seconds = min(timeit.repeat(stmt, number=NUMBER, repeat=5))
+        print(f"{name:>6}: {seconds / NUMBER * 1e6:.2f} us per key")
+
+
+if __name__ == "__main__":
+    main()
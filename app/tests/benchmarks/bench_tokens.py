@@ -0,0 +1,34 @@
+"""Per-request cost of authenticating the same access token again.
+
+Run from the `app` directory with `python -m tests.benchmarks.bench_tokens`.
+"""
+import timeit
+
+import jwt
+
+from app.core.config import settings
+from app.core.security import create_access_token, decode_token
+
+NUMBER = 100_000
+
+
+def main():
+    token = create_access_token(data=42)
+    assert decode_token(token) == jwt.decode(
+        token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+    )
+    for label, stmt in (
+        (
+            "before",
+            lambda: jwt.decode(
+                token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+            ),
+        ),
+        ("after", lambda: decode_token(token)),
+    ):
+        seconds = min(timeit.repeat(stmt, number=NUMBER, repeat=5))
+        print(f"{label:>6}: {seconds / NUMBER * 1e6:.2f} us per token")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+import pytest
+
+from cache.client import Cache
+
+
+@pytest.fixture
+def redis_cache(monkeypatch):
+    """The cache client, connected to fakeredis by `Cache.init`."""
+    monkeypatch.setenv("CACHE_ENV", "TEST")
+    yield Cache()
+    Cache().stop_background_tasks()
+    Cache().local.clear()
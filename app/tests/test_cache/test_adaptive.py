@@ -0,0 +1,18 @@
+from cache.adaptive import choose_ttl
+
+NOW = 1_000_000
+
+
+def test_entries_without_history_get_the_default_ttl():
+    assert choose_ttl([(None, None)], NOW, 3600, 60, 86400) == 3600
+
+
+def test_the_most_volatile_tag_sets_the_ttl():
+    stats = [(str(NOW - 10).encode(), b"600"), (str(NOW - 10).encode(), b"7200")]
+
+    assert choose_ttl(stats, NOW, 3600, 60, 86400) == 600
+
+
+def test_time_since_the_last_write_extends_the_ttl_within_bounds():
+    assert choose_ttl([(str(NOW - 5000).encode(), b"600")], NOW, 60, 60, 3600) == 3600
+    assert choose_ttl([(str(NOW - 5).encode(), None)], NOW, 3600, 60, 86400) == 60
@@ -0,0 +1,21 @@
+import pytest
+
+from cache.bloom import BloomFilter
+
+
+def test_bloom_filter_contains_every_added_item():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    items = [f"api|denied:token:{i}" for i in range(1000)]
+    for item in items:
+        bloom.add(item)
+
+    assert all(item in bloom for item in items)
+    false_positives = sum(f"api|denied:token:x{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+    assert len(bloom) == 1000
+
+
+@pytest.mark.parametrize("capacity, error_rate", [(0, 0.01), (10, 0), (10, 1)])
+def test_bloom_filter_rejects_invalid_sizes(capacity, error_rate):
+    with pytest.raises(ValueError):
+        BloomFilter(capacity, error_rate)
@@ -0,0 +1,60 @@
+import pytest
+from fakeredis import FakeRedis
+
+from cache.budget import FORGET_SCRIPT, NamespaceBudget, STORE_SCRIPT
+from cache.key_gen import get_budget_keys
+
+BUDGET_KEYS = get_budget_keys("api", "book")
+
+
+def store(redis_client, key, score, budget):
+    args = [b"value", 60, score, 5, budget.max_entries, budget.max_bytes]
+    evicted = redis_client.register_script(STORE_SCRIPT)(
+        keys=[key, *BUDGET_KEYS], args=[*args, int(budget.lfu)]
+    )
+    return [key.decode() for key in evicted]
+
+
+def test_store_evicts_least_recently_used_entries():
+    redis_client = FakeRedis()
+    budget = NamespaceBudget(max_entries=2)
+    store(redis_client, "api|book:a", 1, budget)
+    store(redis_client, "api|book:b", 2, budget)
+    # "a" is read again, so "b" is now the least recently used
+    redis_client.zadd(BUDGET_KEYS[0], {"api|book:a": 3}, xx=True)
+
+    assert store(redis_client, "api|book:c", 4, budget) == ["api|book:b"]
+    assert not redis_client.exists("api|book:b")
+    assert redis_client.hget(BUDGET_KEYS[2], "bytes") == b"10"
+    assert redis_client.hget(BUDGET_KEYS[2], "evictions") == b"1"
+
+
+def test_store_evicts_least_frequently_used_entries_by_size():
+    redis_client = FakeRedis()
+    budget = NamespaceBudget(max_bytes=10, policy="lfu")
+    store(redis_client, "api|book:a", 0, budget)
+    store(redis_client, "api|book:a", 0, budget)
+    store(redis_client, "api|book:b", 0, budget)
+
+    # the entry just stored is kept even though it has the fewest accesses
+    assert store(redis_client, "api|book:c", 0, budget) == ["api|book:b"]
+    assert redis_client.zrange(BUDGET_KEYS[0], 0, -1) == [b"api|book:c", b"api|book:a"]
+
+
+def test_forget_releases_deleted_entries():
+    redis_client = FakeRedis()
+    store(redis_client, "api|book:a", 1, NamespaceBudget())
+    redis_client.delete("api|book:a")
+
+    freed = redis_client.register_script(FORGET_SCRIPT)(
+        keys=BUDGET_KEYS, args=["api|book:a", "api|book:unknown"]
+    )
+
+    assert freed == 5
+    assert redis_client.zcard(BUDGET_KEYS[0]) == 0
+    assert redis_client.hget(BUDGET_KEYS[2], "bytes") == b"0"
+
+
+def test_budget_rejects_unknown_policy():
+    with pytest.raises(ValueError):
+        NamespaceBudget(max_entries=1, policy="fifo")
@@ -0,0 +1,109 @@
+import asyncio
+
+from fakeredis import FakeRedis
+
+from cache.bus import (
+    decode_invalidation,
+    encode_invalidation,
+    get_invalidation_channel,
+    invalidate_sync,
+    PROCESS_ID,
+)
+from cache.key_gen import get_entity_key, get_writes_key
+
+
+def test_invalidate_sync_deletes_tagged_keys_and_publishes():
+    redis_client = FakeRedis()
+    redis_client.set("api|user:users.read_user(user_id=1)", b"1")
+    redis_client.sadd("api|tag:user:1", "api|user:users.read_user(user_id=1)")
+    pubsub = redis_client.pubsub()
+    pubsub.subscribe(get_invalidation_channel("api"))
+    assert pubsub.get_message(timeout=1)["type"] == "subscribe"
+
+    assert invalidate_sync(redis_client, "api", tags=["user:1"]) == 1
+
+    assert not redis_client.exists("api|user:users.read_user(user_id=1)")
+    assert not redis_client.exists("api|tag:user:1")
+    message = pubsub.get_message(timeout=1)
+    origin, keys, prefixes, denied = decode_invalidation(message["data"])
+    assert origin is None
+    assert keys == ["api|user:users.read_user(user_id=1)"]
+    assert prefixes == []
+    assert denied == []
+    assert redis_client.hexists(get_writes_key("api", "user:1"), "last")
+
+
+def test_invalidate_sync_deletes_keys():
+    redis_client = FakeRedis()
+    key = get_entity_key("api", "user", 1)
+    redis_client.set(key, b"1")
+
+    assert invalidate_sync(redis_client, "api", keys=[key]) == 1
+    assert not redis_client.exists(key)
+
+
+def test_async_invalidate_publishes_the_keys_for_other_processes(redis_cache):
+    async def main():
+        await redis_cache.init(host_url="redis://", prefix="pub")
+        redis_cache.stop_background_tasks()
+        await redis_cache.add_to_cache(
+            "pub|item:a", {"id": 1}, 60, namespace="item", tags=["item:1"]
+        )
+        async with redis_cache.redis.pubsub() as pubsub:
+            await pubsub.subscribe(get_invalidation_channel("pub"))
+
+            await redis_cache.invalidate("item", tags=["item:1"])
+
+            # the first call reads the confirmation of the subscription
+            message = None
+            while message is None:
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=1
+                )
+        return decode_invalidation(message["data"])
+
+    origin, keys, prefixes, denied = asyncio.run(main())
+
+    assert origin == PROCESS_ID
+    assert keys == ["pub|item:a"]
+    assert prefixes == ["pub|item:"]
+    assert denied == []
+
+
+def test_listener_drops_the_local_entries_invalidated_by_another_process(
+    redis_cache,
+):
+    async def wait_until(condition):
+        for _ in range(100):
+            if condition():
+                return True
+            await asyncio.sleep(0.01)
+        return False
+
+    async def main():
+        await redis_cache.init(host_url="redis://", prefix="sub", local_max_entries=10)
+        channel = get_invalidation_channel("sub")
+        for key in ("sub|item:a", "sub|item:b", "sub|other:c"):
+            await redis_cache.add_to_cache(key, {"key": key}, 60, local_expire=60)
+        # the listener started by `init` subscribes in the background
+        while not (await redis_cache.redis.pubsub_numsub(channel))[0][1]:
+            await asyncio.sleep(0.01)
+
+        # this process evicted the keys of its own messages already
+        await redis_cache.redis.publish(
+            channel, encode_invalidation(["sub|item:a"], origin=PROCESS_ID)
+        )
+        await redis_cache.redis.publish(
+            channel, encode_invalidation(prefixes=["sub|other:"], origin="worker-2")
+        )
+        await redis_cache.redis.publish(
+            channel, encode_invalidation(["sub|item:b"], origin="worker-2")
+        )
+
+        local = redis_cache.local
+        assert await wait_until(lambda: local.get("sub|item:b") is None)
+        assert local.get("sub|other:c") is None
+        assert local.get("sub|item:a") is not None
+        redis_cache.stop_background_tasks()
+
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+import asyncio
+
+from cache.key_gen import get_denylist_key
+
+
+def test_init_falls_back_to_no_compression_when_compressor_is_missing(
+    redis_cache,
+):
+    asyncio.run(redis_cache.init(host_url="redis://", compression="brotli"))
+
+    assert redis_cache.connected
+    assert redis_cache.compression.compressor is None
+
+
+def test_denied_keys_are_kept_in_one_sorted_set_until_they_expire(redis_cache):
+    async def main():
+        await redis_cache.init(host_url="redis://", prefix="deny")
+        redis_cache.stop_background_tasks()
+        denylist_key = get_denylist_key("deny")
+        await redis_cache.redis.zadd(denylist_key, {"deny|denied:token:old": 1})
+
+        await redis_cache.deny("deny|denied:token:a", 60)
+        await redis_cache.load_denylist()
+
+        assert await redis_cache.redis.keys("deny|*") == [denylist_key.encode()]
+        assert await redis_cache.redis.zrange(denylist_key, 0, -1) == [
+            b"deny|denied:token:a"
+        ]
+        assert "deny|denied:token:a" in redis_cache.denylist
+        assert await redis_cache.is_denied("deny|denied:token:a")
+        assert not await redis_cache.is_denied("deny|denied:token:b")
+
+    asyncio.run(main())
+
+
+def test_load_denylist_skips_expired_keys(redis_cache):
+    async def main():
+        await redis_cache.init(host_url="redis://", prefix="reload")
+        redis_cache.stop_background_tasks()
+        await redis_cache.redis.zadd(
+            get_denylist_key("reload"),
+            {"reload|denied:token:old": 1, "reload|denied:token:new": 2e10},
+        )
+
+        await redis_cache.load_denylist()
+
+        assert len(redis_cache.denylist) == 1
+        assert "reload|denied:token:new" in redis_cache.denylist
+        assert not await redis_cache.is_denied("reload|denied:token:old")
+
+    asyncio.run(main())
+
+
+def test_invalidating_a_tag_deletes_its_keys_and_its_set(redis_cache):
+    async def main():
+        await redis_cache.init(host_url="redis://", prefix="inv")
+        redis_cache.stop_background_tasks()
+        await redis_cache.redis.flushall()
+        for key, tag in (("a", "item:1"), ("b", "item:1"), ("c", "item:2")):
+            await redis_cache.add_to_cache(
+                f"inv|item:{key}", {"key": key}, 60, namespace="item", tags=[tag]
+            )
+
+        deleted = await redis_cache.invalidate(tags=["item:1"])
+
+        assert deleted == 2
+        assert await redis_cache.redis.exists("inv|item:a", "inv|item:b") == 0
+        assert await redis_cache.redis.exists("inv|item:c") == 1
+        assert not await redis_cache.redis.exists(redis_cache.get_tag_key("item:1"))
+        assert await redis_cache.redis.exists(redis_cache.get_tag_key("item:2"))
+
+    asyncio.run(main())
+
+
+def test_untagged_keys_of_a_namespace_are_scanned_only_once(
+    redis_cache, monkeypatch
+):
+    async def main():
+        await redis_cache.init(host_url="redis://", prefix="legacy")
+        redis_cache.stop_background_tasks()
+        await redis_cache.redis.flushall()
+        scanned = []
+        invalidate_pattern = redis_cache.invalidate_pattern
+
+        async def record_scan(pattern):
+            scanned.append(pattern)
+            return await invalidate_pattern(pattern)
+
+        monkeypatch.setattr(redis_cache, "invalidate_pattern", record_scan)
+        # written before keys were indexed by their tags
+        await redis_cache.redis.set("legacy|item:app.read_item(id=1)", b"value")
+
+        first = await redis_cache.invalidate("item")
+        await redis_cache.redis.set("legacy|item:app.read_item(id=2)", b"value")
+        second = await redis_cache.invalidate("item")
+
+        assert first == 1
+        assert second == 0
+        assert scanned == [redis_cache.get_cache_key_pattern("item")]
+        assert not await redis_cache.redis.exists("legacy|item:app.read_item(id=1)")
+
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from cache.codecs import CODECS_BY_NAME, Codec, decode, encode, get_codec
+from cache.compression import (
+    CompressionPolicy,
+    Compressor,
+    decompress,
+    get_compressor,
+)
+from cache.entry import pack_entry, pack_not_found, unpack_not_found
+from cache.util import serialize_json
+
+
+@pytest.mark.parametrize("name", list(CODECS_BY_NAME))
+def test_codec_round_trip(name):
+    codec = get_codec(name)
+    value = {"id": 1, "title": "book", "tags": ["a", "b"], "raw": b"\x00\x01"}
+
+    data = encode(value, codec)
+
+    assert data[0] == codec.format_id
+    assert decode(data) == value
+
+
+def test_msgpack_keeps_decimal_and_datetime():
+    if "msgpack" not in CODECS_BY_NAME:
+        pytest.skip("msgpack is not installed")
+    value = {"amount": Decimal("12.50"), "created": datetime(2024, 1, 1, 10, 30)}
+
+    assert decode(encode(value, get_codec("msgpack"))) == value
+
+
+def test_orjson_keeps_the_precision_of_decimals():
+    if "orjson" not in CODECS_BY_NAME:
+        pytest.skip("orjson is not installed")
+    value = {"total": Decimal("12345678901234567.89")}
+
+    assert decode(encode(value, get_codec("orjson"))) == {
+        "total": "12345678901234567.89"
+    }
+
+
+def test_decode_legacy_entry_without_format_byte():
+    assert decode(serialize_json({"id": 1}).encode()) == {"id": 1}
+
+
+def test_compression_policy_compresses_large_values():
+    policy = CompressionPolicy(get_compressor("zlib"), threshold=100)
+    data = encode({"content": ["same value"] * 100}, get_codec("json"))
+
+    compressed = policy.apply(data, "user")
+
+    assert len(compressed) < len(data)
+    assert decompress(compressed) == data
+    assert policy.stats()["user"]["bytes_saved"] == len(data) - len(compressed)
+    assert policy.apply(b"\x01{}", "user") == b"\x01{}"
+
+
+def test_not_found_entry_round_trip():
+    headers = {"content-type": "application/json"}
+    raw = pack_not_found(404, headers, b'{"detail":"Book not found"}')
+
+    assert unpack_not_found(raw) == (404, headers, b'{"detail":"Book not found"}')
+    assert unpack_not_found(pack_entry(encode(None, get_codec("json")))) is None
+    assert unpack_not_found(serialize_json({"id": 1}).encode()) is None
+
+
+def test_incomplete_codecs_and_compressors_can_not_be_created():
+    class DumpsOnly(Codec):
+        name = "dumps-only"
+        format_id = 0x0E
+
+        def dumps(self, value):
+            return b""
+
+    class CompressOnly(Compressor):
+        name = "compress-only"
+        marker = 0x1E
+
+        def compress(self, data):
+            return data
+
+    with pytest.raises(TypeError):
+        DumpsOnly()
+    with pytest.raises(TypeError):
+        CompressOnly()
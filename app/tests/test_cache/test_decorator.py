@@ -0,0 +1,361 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from pydantic import BaseModel, validator
+from redis.exceptions import ConnectionError
+
+from cache.cache import cache, invalidate, invalidate_tags
+from cache.client import Cache
+from cache.codecs import ResponseBodyCodec
+from cache.compression import decompress
+from cache.entry import unpack_entry
+from cache.key_gen import get_not_found_tag
+
+
+def serve(app: FastAPI, **kwargs) -> TestClient:
+    """Return a client of `app`, which connects the cache client to an empty
+    fakeredis when it starts."""
+
+    @app.on_event("startup")
+    async def connect():
+        await Cache().init(host_url="redis://", prefix="test", **kwargs)
+        await Cache().redis.flushall()
+
+    @app.on_event("shutdown")
+    def disconnect():
+        Cache().stop_background_tasks()
+
+    return TestClient(app)
+
+
+def get_entry_key(client: TestClient) -> str:
+    """Return the key of the only cached response."""
+    (key,) = client.portal.call(Cache().redis.keys, "test|item:*")
+    return key.decode()
+
+
+def test_concurrent_misses_evaluate_the_endpoint_once(redis_cache):
+    app = FastAPI()
+    calls = []
+
+    @app.get("/items/{id}")
+    @cache(namespace="item", expire=60)
+    async def read_item(id: int) -> dict:
+        calls.append(id)
+        await asyncio.sleep(0.2)
+        return {"id": id}
+
+    with serve(app) as client, ThreadPoolExecutor(4) as pool:
+        responses = list(pool.map(lambda _: client.get("/items/1"), range(4)))
+
+    assert calls == [1]
+    assert [response.json() for response in responses] == [{"id": 1}] * 4
+
+
+def test_miss_is_evaluated_after_lock_wait_if_the_lock_holder_stores_nothing(
+    redis_cache,
+):
+    app = FastAPI()
+    calls = []
+
+    @app.get("/items/{id}")
+    @cache(namespace="item", expire=60, lock_wait=0.2)
+    async def read_item(id: int) -> dict:
+        calls.append(id)
+        return {"id": id}
+
+    with serve(app) as client:
+        client.get("/items/1")
+        key = get_entry_key(client)
+        client.portal.call(Cache().redis.delete, key)
+        # another worker is recomputing the entry
+        assert client.portal.call(Cache().acquire_lock, key, 10) is not None
+
+        started = time.monotonic()
+        response = client.get("/items/1")
+
+    assert time.monotonic() - started >= 0.2
+    assert response.json() == {"id": 1}
+    assert calls == [1, 1]
+
+
+def test_stale_entry_is_served_and_refreshed_in_the_background(redis_cache):
+    app = FastAPI()
+    versions = []
+
+    @app.get("/items/{id}")
+    @cache(namespace="item", expire=60, stale_ttl=60, early_refresh_beta=0)
+    async def read_item(id: int) -> dict:
+        versions.append(id)
+        return {"id": id, "version": len(versions)}
+
+    with serve(app) as client:
+        client.get("/items/1")
+        # the fresh part of the TTL has run out
+        client.portal.call(Cache().redis.expire, get_entry_key(client), 60)
+
+        stale = client.get("/items/1")
+        refreshed = client.get("/items/1")
+
+    assert stale.json() == {"id": 1, "version": 1}
+    assert stale.headers["X-FastAPI-Cache"] == "Hit"
+    assert refreshed.json() == {"id": 1, "version": 2}
+    assert versions == [1, 1]
+
+
+def test_fresh_entry_is_refreshed_early_with_a_large_beta(redis_cache):
+    app = FastAPI()
+    versions = []
+
+    @app.get("/items/{id}")
+    @cache(namespace="item", expire=60, early_refresh_beta=1e9)
+    async def read_item(id: int) -> dict:
+        versions.append(id)
+        await asyncio.sleep(0.01)
+        return {"id": id, "version": len(versions)}
+
+    with serve(app) as client:
+        first = client.get("/items/1")
+        hit = client.get("/items/1")
+        refreshed = client.get("/items/1")
+
+    assert first.json()["version"] == 1
+    assert hit.json()["version"] == 1
+    assert hit.headers["X-FastAPI-Cache"] == "Hit"
+    assert refreshed.json()["version"] == 2
+
+
+def test_matching_etag_is_answered_with_304_from_every_tier(redis_cache):
+    app = FastAPI()
+
+    @app.get("/items/{id}")
+    @cache(namespace="item", expire=60, local_expire=60)
+    async def read_item(id: int) -> dict:
+        return {"id": id}
+
+    with serve(app, local_max_entries=10) as client:
+        miss = client.get("/items/1")
+        etag = miss.headers["ETag"]
+        from_local = client.get("/items/1", headers={"If-None-Match": etag})
+        Cache().local.clear()
+        from_redis = client.get("/items/1", headers={"If-None-Match": etag})
+        other = client.get("/items/1", headers={"If-None-Match": 'W/"other"'})
+
+    assert miss.headers["X-FastAPI-Cache"] == "Miss"
+    assert miss.headers["Cache-Control"] == "private, no-cache"
+    assert "Expires" not in miss.headers
+    for response in (from_local, from_redis):
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+        assert response.headers["Cache-Control"] == "private, no-cache"
+    assert other.status_code == 200
+    assert other.json() == {"id": 1}
+
+
+def test_etag_depends_only_on_the_response_body(redis_cache):
+    app = FastAPI()
+    versions = []
+
+    @app.get("/items/{id}")
+    @cache(namespace="item", expire=60)
+    async def read_item(id: int) -> dict:
+        versions.append(id)
+        return {"id": id}
+
+    with serve(app) as client:
+        first = client.get("/items/1")
+        client.portal.call(Cache().redis.delete, get_entry_key(client))
+        recomputed = client.get("/items/1")
+
+    assert versions == [1, 1]
+    assert recomputed.headers["X-FastAPI-Cache"] == "Miss"
+    assert recomputed.headers["ETag"] == first.headers["ETag"]
+
+
+def test_hits_send_the_body_rendered_on_the_miss(redis_cache):
+    app = FastAPI()
+    validated = []
+
+    class Item(BaseModel):
+        id: int
+        name: str
+
+        @validator("name")
+        def count_validations(cls, name):
+            validated.append(name)
+            return name
+
+    @app.get("/items/{id}")
+    @cache(namespace="item", expire=60)
+    async def read_item(id: int) -> Item:
+        return {"id": id, "name": "one", "secret": "not in the response model"}
+
+    with serve(app) as client:
+        miss = client.get("/items/1")
+        hit = client.get("/items/1")
+        entry = client.portal.call(Cache().redis.get, get_entry_key(client))
+
+    assert hit.headers["X-FastAPI-Cache"] == "Hit"
+    assert hit.content == miss.content
+    assert hit.json() == {"id": 1, "name": "one"}
+    assert hit.headers["content-type"] == "application/json"
+    assert validated == ["one"]
+    _, data = unpack_entry(entry)
+    assert decompress(data)[0] == ResponseBodyCodec.format_id
+
+
+def test_endpoint_is_evaluated_when_redis_fails(redis_cache, monkeypatch):
+    app = FastAPI()
+    calls = []
+
+    @app.get("/items/{id}")
+    @cache(namespace="item", expire=60)
+    async def read_item(id: int) -> dict:
+        calls.append(id)
+        return {"id": id}
+
+    def fail(*args, **kwargs):
+        raise ConnectionError("Redis is down")
+
+    with serve(app) as client:
+        client.get("/items/1")
+        monkeypatch.setattr(Cache().redis, "pipeline", fail)
+        response = client.get("/items/1")
+        failures = Cache().breaker.failures
+
+    assert response.status_code == 200
+    assert response.json() == {"id": 1}
+    assert "X-FastAPI-Cache" not in response.headers
+    assert calls == [1, 1]
+    assert failures == 1
+
+
+def test_404_is_cached_as_rendered_by_the_app_until_the_entity_is_created(
+    redis_cache,
+):
+    app = FastAPI()
+    items = set()
+    calls = []
+
+    @app.exception_handler(HTTPException)
+    async def render_error(request: Request, error: HTTPException):
+        return JSONResponse({"error": error.detail}, status_code=error.status_code)
+
+    @app.get("/items/{id}")
+    @cache(namespace="item", expire=60, tags=["item:{id}"], not_found_ttl=60)
+    async def read_item(id: int) -> dict:
+        calls.append(id)
+        if id not in items:
+            raise HTTPException(status_code=404, detail="Item not found")
+        return {"id": id}
+
+    @app.post("/items/{id}")
+    @invalidate(tags=[get_not_found_tag("item")])
+    async def create_item(id: int) -> dict:
+        items.add(id)
+        return {"id": id}
+
+    with serve(app) as client:
+        missing = client.get("/items/1")
+        replayed = client.get("/items/1")
+        client.post("/items/1")
+        created = client.get("/items/1")
+
+    assert missing.status_code == replayed.status_code == 404
+    assert replayed.json() == missing.json() == {"error": "Item not found"}
+    assert replayed.headers["X-FastAPI-Cache"] == "Hit"
+    assert created.status_code == 200
+    assert created.json() == {"id": 1}
+    assert calls == [1, 1]
+
+
+def test_tags_looked_up_in_the_endpoint_are_invalidated(redis_cache):
+    app = FastAPI()
+    versions = []
+    borrows = {7: 1}
+
+    @app.get("/items/{id}")
+    @cache(namespace="item", expire=60, tags=["item:{id}"])
+    async def read_item(id: int) -> dict:
+        versions.append(id)
+        return {"id": id, "version": len(versions)}
+
+    @app.put("/borrows/{borrow_id}")
+    async def return_item(borrow_id: int) -> dict:
+        await invalidate_tags(tags=[f"item:{borrows[borrow_id]}"])
+        return {"id": borrow_id}
+
+    with serve(app) as client:
+        client.get("/items/1")
+        client.put("/borrows/7")
+        response = client.get("/items/1")
+
+    assert response.headers["X-FastAPI-Cache"] == "Miss"
+    assert response.json() == {"id": 1, "version": 2}
+
+
+def test_entry_is_invalidated_through_the_tag_of_a_dependency(redis_cache):
+    app = FastAPI()
+    versions = []
+
+    class User(BaseModel):
+        id: int
+
+    def get_current_user() -> User:
+        return User(id=2)
+
+    @app.get("/items/{id}")
+    @cache(
+        namespace="item",
+        expire=60,
+        tags=["item:{id}", "user:{current_user.id}"],
+        vary_by=["current_user.id"],
+    )
+    async def read_item(id: int, current_user: User = Depends(get_current_user)):
+        versions.append(id)
+        return {"id": id, "version": len(versions)}
+
+    with serve(app) as client:
+        client.get("/items/1")
+        client.portal.call(partial(invalidate_tags, tags=["user:2"]))
+        response = client.get("/items/1")
+
+    assert response.headers["X-FastAPI-Cache"] == "Miss"
+    assert response.json() == {"id": 1, "version": 2}
+
+
+def test_shadow_mode_serves_live_responses_and_records_what_caching_would_do(
+    redis_cache,
+):
+    app = FastAPI()
+    names = {1: "one"}
+    calls = []
+
+    @app.get("/items/{id}")
+    @cache(namespace="shadow-item", expire=60, shadow=True)
+    async def read_item(id: int) -> dict:
+        calls.append(id)
+        return {"id": id, "name": names[id]}
+
+    with serve(app) as client:
+        miss = client.get("/items/1")
+        hit = client.get("/items/1")
+        names[1] = "changed"
+        diverged = client.get("/items/1")
+
+    assert calls == [1, 1, 1]
+    assert miss.json() == hit.json() == {"id": 1, "name": "one"}
+    assert diverged.json() == {"id": 1, "name": "changed"}
+    for response in (miss, hit, diverged):
+        assert "X-FastAPI-Cache" not in response.headers
+    (metrics,) = Cache.metrics.namespace("shadow-item").endpoints.values()
+    assert metrics.shadow_misses == 1
+    assert metrics.shadow_hits == 2
+    assert metrics.shadow_diverged == 1
+    assert metrics.hits == metrics.misses == 0
@@ -0,0 +1,169 @@
+import asyncio
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.base import CRUDBase
+from app.models.user import User
+from cache.bus import decode_invalidation, get_invalidation_channel
+from cache.codecs import CODECS_BY_NAME
+from cache.entity import EVICTED, EntityCache
+
+
+async def init(redis_cache):
+    await redis_cache.init(host_url="redis://", prefix="api")
+    redis_cache.stop_background_tasks()
+
+
+def test_get_many_returns_hits_and_missing_rows_from_one_mget(redis_cache):
+    async def main():
+        await init(redis_cache)
+        users = EntityCache("reader", not_found_expire=60)
+        await users.set(1, {"id": 1, "full_name": "One"})
+        await users.set_missing(2)
+
+        assert await users.get_many([1, 2, 3]) == {
+            1: {"id": 1, "full_name": "One"},
+            2: None,
+        }
+        assert users.metrics.hits == 2
+        assert users.metrics.not_found_hits == 1
+        assert users.metrics.misses == 1
+
+    asyncio.run(main())
+
+
+def test_set_missing_keeps_stored_rows(redis_cache):
+    async def main():
+        await init(redis_cache)
+        users = EntityCache("user", not_found_expire=60)
+        await users.set(1, {"id": 1})
+
+        await users.set_missing(1)
+
+        assert await users.get_many([1]) == {1: {"id": 1}}
+
+    asyncio.run(main())
+
+
+def test_evict_publishes_and_blocks_fills_of_rows_loaded_before(redis_cache):
+    async def main():
+        await init(redis_cache)
+        users = EntityCache("user", local_expire=60)
+        pubsub = redis_cache.redis.pubsub()
+        await pubsub.subscribe(get_invalidation_channel("api"))
+        await users.set(1, {"id": 1, "amount": "10.00"})
+        version = users.version
+
+        await users.evict(1)
+        await users.fill(1, {"id": 1, "amount": "10.00"}, version)
+
+        assert await redis_cache.redis.get(users.get_key(1)) == EVICTED
+        assert await users.get_many([1]) == {}
+        messages = []
+        while (message := await pubsub.get_message(timeout=1)) is not None:
+            if message["type"] == "message":
+                messages.append(decode_invalidation(message["data"])[1])
+        assert messages == [[users.get_key(1)], [users.get_key(1)]]
+        await pubsub.close()
+
+    asyncio.run(main())
+
+
+def test_fill_keeps_rows_in_process_only_without_a_deletion_meanwhile(
+    redis_cache,
+):
+    async def main():
+        await init(redis_cache)
+        users = EntityCache("user", expire=0, local_expire=60)
+        version = users.version
+        redis_cache.local.delete(users.get_key(2))
+
+        await users.fill_many({1: {"id": 1}}, version)
+        await users.fill_many({3: {"id": 3}}, users.version)
+
+        assert await users.get_many([1, 3]) == {3: {"id": 3}}
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("codec", list(CODECS_BY_NAME))
+def test_cached_rows_keep_their_column_types(redis_cache, codec):
+    async def main():
+        await redis_cache.init(host_url="redis://", prefix="api", codec=codec)
+        redis_cache.stop_background_tasks()
+        crud_user = CRUDBase(User, entity_exclude=["hashed_password"])
+        created = datetime(2024, 1, 1, 10, 30, tzinfo=timezone.utc)
+        user = User(
+            id=1,
+            email="user@example.com",
+            hashed_password="secret",
+            amount=Decimal("12345678.50"),
+            created=created,
+        )
+        fields = crud_user._to_entity_fields(user)
+        cached = redis_cache.deserialize(redis_cache.serialize(fields))
+
+        merged = await crud_user._merge_entity(AsyncSession(), cached)
+
+        assert "hashed_password" not in fields
+        assert isinstance(merged.amount, Decimal)
+        assert str(merged.amount) == "12345678.50"
+        assert merged.created == created
+        assert inspect(merged).persistent
+        assert "hashed_password" in inspect(merged).unloaded
+
+    asyncio.run(main())
+
+
+def test_msgpack_stores_decimal_and_datetime_columns_natively(redis_cache):
+    if "msgpack" not in CODECS_BY_NAME:
+        pytest.skip("msgpack is not installed")
+
+    async def main():
+        await redis_cache.init(host_url="redis://", prefix="api", codec="msgpack")
+        redis_cache.stop_background_tasks()
+        user = User(id=1, amount=Decimal("0.10"), created=datetime(2024, 1, 1))
+
+        fields = CRUDBase(User)._to_entity_fields(user)
+
+        assert fields["amount"] == Decimal("0.10")
+        assert redis_cache.deserialize(redis_cache.serialize(fields)) == fields
+
+    asyncio.run(main())
+
+
+class RecordingSession(AsyncSession):
+    """Session without a database that records deletes and commits."""
+
+    def __init__(self):
+        super().__init__()
+        self.deleted_rows = []
+        self.commits = 0
+
+    async def delete(self, instance):
+        self.deleted_rows.append(instance)
+
+    async def commit(self):
+        self.commits += 1
+
+
+def test_async_delete_removes_the_row_and_evicts_it(redis_cache):
+    async def main():
+        await init(redis_cache)
+        users = EntityCache("deleted-user")
+        crud_user = CRUDBase(User, entity_cache=users)
+        await users.set(1, {"id": 1, "email": "user@example.com"})
+        db = RecordingSession()
+
+        deleted = await crud_user.delete(db, id=1)
+
+        assert db.deleted_rows == [deleted]
+        assert deleted.id == 1
+        assert db.commits == 1
+        assert await users.get_many([1]) == {}
+
+    asyncio.run(main())
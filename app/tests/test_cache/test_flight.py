@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from cache.flight import SingleFlight
+
+
+def test_waiters_take_over_when_the_leader_is_cancelled():
+    async def main():
+        flight = SingleFlight()
+        calls = []
+
+        async def compute():
+            calls.append(len(calls))
+            await asyncio.sleep(0.05)
+            return len(calls)
+
+        leader = asyncio.ensure_future(flight.do("key", compute))
+        await asyncio.sleep(0)
+        waiters = [asyncio.ensure_future(flight.do("key", compute)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+
+        results = await asyncio.gather(*waiters)
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return calls, results, len(flight)
+
+    calls, results, in_flight = asyncio.run(main())
+
+    assert calls == [0, 1]
+    assert results == [2, 2, 2]
+    assert in_flight == 0
+
+
+def test_cancelled_waiter_does_not_cancel_the_call():
+    async def main():
+        flight = SingleFlight()
+
+        async def compute():
+            await asyncio.sleep(0.05)
+            return "value"
+
+        leader = asyncio.ensure_future(flight.do("key", compute))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(flight.do("key", compute))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return await leader
+
+    assert asyncio.run(main()) == "value"
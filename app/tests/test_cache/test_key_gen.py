@@ -0,0 +1,62 @@
+import pytest
+from fastapi import Request
+from sqlalchemy.orm import Session
+
+from cache.key_gen import get_cache_key, get_ignored_arg_types, KeyBuilder
+
+
+def read_items(db: Session, skip: int = 0, limit: int = 100, q: str = None):
+    pass
+
+
+def test_key_builder_matches_get_cache_key():
+    ignored = get_ignored_arg_types([Session])
+    key_builder = KeyBuilder(read_items)
+
+    key = key_builder("api|items:", ignored, (), {"db": object(), "skip": 5})
+    assert key == f"api|items:{__name__}.read_items(skip=5,limit=100,q=None)"
+    assert key == get_cache_key(
+        "api|items", [Session], read_items, object(), skip=5
+    )
+
+
+def test_get_cache_key_does_not_grow_ignore_arg_types():
+    ignore_arg_types = [Session]
+    get_cache_key("api", ignore_arg_types, read_items, object())
+    get_cache_key("api", ignore_arg_types, read_items, object())
+    assert ignore_arg_types == [Session]
+    assert Request in get_ignored_arg_types(ignore_arg_types)
+
+
+def test_long_keys_are_hashed():
+    key_builder = KeyBuilder(read_items)
+    ignored = get_ignored_arg_types([Session])
+
+    key = key_builder("api|items:", ignored, (), {"q": "x" * 500}, 128)
+    assert len(key) < 128
+    assert key.startswith(f"api|items:{__name__}.read_items(#")
+    assert key == key_builder("api|items:", ignored, (), {"q": "x" * 500}, 128)
+    assert key != key_builder("api|items:", ignored, (), {"q": "y" * 500}, 128)
+
+
+class User:
+    def __init__(self, is_superuser: bool):
+        self.is_superuser = is_superuser
+
+
+def read_books(current_user: User, skip: int = 0):
+    pass
+
+
+def test_key_varies_by_ignored_argument_attribute():
+    key_builder = KeyBuilder(read_books, ["current_user.is_superuser"])
+    ignored = get_ignored_arg_types([User])
+
+    key = key_builder("api|books:", ignored, (), {"current_user": User(True)})
+    assert key == (
+        f"api|books:{__name__}.read_books(skip=0,current_user.is_superuser=True)"
+    )
+    assert key == key_builder("api|books:", ignored, (User(True),), {})
+    assert key != key_builder("api|books:", ignored, (User(False),), {})
+    with pytest.raises(ValueError):
+        KeyBuilder(read_books, ["user.is_superuser"])
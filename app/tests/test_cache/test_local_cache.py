@@ -0,0 +1,65 @@
+import time
+
+from cache.local import LocalCache
+
+
+def test_local_cache_hit_and_miss():
+    local = LocalCache(max_entries=10, max_bytes=1024)
+    assert local.get("key", "user") is None
+    local.set("key", {"id": 1}, size=10, ttl=60, namespace="user")
+    assert local.get("key", "user") == {"id": 1}
+
+    stats = local.stats()["user"]
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_local_cache_evicts_least_recently_used():
+    local = LocalCache(max_entries=2, max_bytes=1024)
+    local.set("a", 1, size=1, ttl=60)
+    local.set("b", 2, size=1, ttl=60)
+    local.get("a")
+    local.set("c", 3, size=1, ttl=60)
+
+    assert "a" in local
+    assert "b" not in local
+    assert "c" in local
+
+
+def test_local_cache_respects_byte_budget():
+    local = LocalCache(max_entries=10, max_bytes=10)
+    local.set("a", 1, size=6, ttl=60)
+    local.set("b", 2, size=6, ttl=60)
+
+    assert "a" not in local
+    assert local.current_bytes == 6
+    assert not local.set("c", 3, size=11, ttl=60)
+
+
+def test_local_cache_expires_entries(monkeypatch):
+    local = LocalCache(max_entries=10, max_bytes=1024)
+    local.set("a", 1, size=1, ttl=5)
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 6)
+
+    assert local.get("a") is None
+    assert len(local) == 0
+
+
+def test_local_cache_invalidate_prefix():
+    local = LocalCache(max_entries=10, max_bytes=1024)
+    local.set("api-cache|user:a", 1, size=1, ttl=60)
+    local.set("api-cache|book:b", 2, size=1, ttl=60)
+
+    assert local.invalidate_prefix("api-cache|user:") == 1
+    assert "api-cache|book:b" in local
+
+
+def test_local_cache_counts_evictions_against_the_evicted_namespace():
+    local = LocalCache(max_entries=1, max_bytes=1024)
+    local.set("api-cache|user:a", 1, size=1, ttl=60, namespace="user")
+    local.set("api-cache|book:b", 2, size=1, ttl=60, namespace="book")
+
+    stats = local.stats()
+    assert stats["user"]["evictions"] == 1
+    assert stats.get("book", {}).get("evictions", 0) == 0
@@ -0,0 +1,52 @@
+from cache.metrics import CacheMetrics, Histogram
+
+
+def test_histogram_percentiles():
+    histogram = Histogram()
+    for ms in (0.05, 0.3, 0.3, 2, 2000):
+        histogram.observe(ms / 1000)
+
+    assert histogram.count == 5
+    assert histogram.percentile(0.5) == 0.5
+    assert histogram.percentile(1.0) == 2000
+    assert Histogram().percentile(0.5) is None
+
+
+def test_metrics_deltas_rebuild_snapshot():
+    metrics = CacheMetrics()
+    endpoint = metrics.endpoint("user", "app.users.read_user")
+    endpoint.hits += 3
+    endpoint.misses += 1
+    endpoint.redis.observe(0.002)
+    metrics.invalidated("user", 4)
+
+    deltas = metrics.pop_deltas()
+    endpoint.hits += 1
+    second = metrics.pop_deltas()
+
+    assert second == {"user": {"app.users.read_user|hits": 1}}
+    snapshot = CacheMetrics.from_fields(deltas)["user"]
+    assert snapshot["keys_invalidated"] == 4
+    assert snapshot["endpoints"]["app.users.read_user"]["hits"] == 3
+    assert snapshot["endpoints"]["app.users.read_user"]["hit_ratio"] == 0.75
+    assert snapshot["endpoints"]["app.users.read_user"]["redis"]["count"] == 1
+
+
+def test_shadow_report():
+    metrics = CacheMetrics()
+    endpoint = metrics.endpoint("management", "get_revenue_report_by_category")
+    endpoint.shadow_hits = 3
+    endpoint.shadow_misses = 1
+    endpoint.shadow_diverged = 1
+    endpoint.shadow_saved_us = 1_500_000
+
+    report = metrics.snapshot()["management"]["endpoints"][
+        "get_revenue_report_by_category"
+    ]["shadow"]
+
+    assert report == {
+        "hit_ratio": 0.75,
+        "divergence_rate": 0.3333,
+        "saved_seconds": 1.5,
+    }
+    assert "shadow" not in metrics.endpoint("management", "other").as_dict()
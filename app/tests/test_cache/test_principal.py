@@ -0,0 +1,61 @@
+import asyncio
+
+from sqlalchemy.dialects import postgresql
+
+from app.crud.base import CRUDBase
+from app.crud.crud_user import CRUDUser
+from app.models.user import User
+from cache.entity import EntityCache
+
+
+class FakeResult:
+    def __init__(self, row):
+        self.row = row
+
+    def first(self):
+        return self.row
+
+
+class FakeSession:
+    """Answers every query with `row`, running `during_query` first."""
+
+    def __init__(self, row, during_query=None):
+        self.row = row
+        self.during_query = during_query
+        self.queries = []
+
+    def scalars(self, query):
+        return self._scalars(query)
+
+    async def _scalars(self, query):
+        self.queries.append(query)
+        if self.during_query is not None:
+            await self.during_query()
+        return FakeResult(self.row)
+
+
+def test_get_through_does_not_store_a_principal_evicted_during_the_query(
+    redis_cache,
+):
+    async def main():
+        await redis_cache.init(host_url="redis://", prefix="api")
+        redis_cache.stop_background_tasks()
+        principals = EntityCache("principal-test", expire=60, local_expire=30)
+        user = User(id=1, email="user@example.com", is_active=True)
+        db = FakeSession(user, during_query=lambda: principals.evict(1))
+
+        assert await CRUDBase(User).get_through(db, 1, principals) is user
+
+        assert await principals.get_many([1]) == {}
+
+    asyncio.run(main())
+
+
+def test_get_for_update_locks_the_row_and_refreshes_the_session_copy():
+    db = FakeSession(User(id=1))
+
+    asyncio.run(CRUDUser(User).get_for_update(db, 1))
+
+    (query,) = db.queries
+    assert "FOR UPDATE" in str(query.compile(dialect=postgresql.dialect()))
+    assert query.get_execution_options()["populate_existing"]
@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import threading
+import time
+from datetime import timedelta
+
+import jwt
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import exceptions as exc
+from app.api import deps
+from app.api.api_v1.endpoints import users
+from app.core import security
+from app.core.config import settings
+from app.models.user import User
+
+
+def test_hashing_is_refused_beyond_the_pending_limit(monkeypatch):
+    monkeypatch.setattr(
+        security, "_pending_hashes", settings.PASSWORD_HASH_MAX_PENDING
+    )
+
+    with pytest.raises(exc.InternalServiceError) as error:
+        asyncio.run(security.verify_password_async("password", "hash"))
+
+    assert error.value.status_code == 503
+    assert security._pending_hashes == settings.PASSWORD_HASH_MAX_PENDING
+
+
+def test_hashing_runs_in_the_password_executor():
+    released = threading.Event()
+
+    def wait_for_the_event_loop() -> str:
+        # times out if the hash runs on the event loop, which then can not release it
+        assert released.wait(timeout=5)
+        return threading.current_thread().name
+
+    async def release():
+        released.set()
+
+    async def main():
+        thread, _ = await asyncio.gather(
+            security._run_hashing(wait_for_the_event_loop), release()
+        )
+        return thread
+
+    assert asyncio.run(main()).startswith("password-hash")
+    assert security._pending_hashes == 0
+
+
+class LoginSession(AsyncSession):
+    """Session without a database that finds `user` and records commits."""
+
+    def __init__(self, user):
+        super().__init__()
+        self.user = user
+        self.commits = 0
+
+    async def scalars(self, query, *args, **kwargs):
+        return LoginResult(self.user)
+
+    def add(self, instance, _warn=True):
+        pass
+
+    async def commit(self):
+        self.commits += 1
+
+    async def refresh(self, instance, *args, **kwargs):
+        pass
+
+
+class LoginResult:
+    def __init__(self, row):
+        self.row = row
+
+    def first(self):
+        return self.row
+
+
+def test_login_rehashes_a_password_hashed_with_other_rounds(redis_cache):
+    old_hash = security.pwd_context.hash("password", rounds=4)
+    user = User(
+        id=1,
+        email="user@example.com",
+        hashed_password=old_hash,
+        is_active=True,
+        is_superuser=False,
+    )
+    db = LoginSession(user)
+    app = FastAPI()
+    app.include_router(users.router)
+    app.dependency_overrides[deps.get_db_async] = lambda: db
+
+    @app.on_event("startup")
+    async def connect():
+        await redis_cache.init(host_url="redis://", prefix="test")
+        redis_cache.stop_background_tasks()
+
+    with TestClient(app) as client:
+        response = client.post(
+            "/token/", json={"email": "user@example.com", "password": "password"}
+        )
+
+    assert response.status_code == 200
+    assert db.commits == 1
+    assert user.hashed_password != old_hash
+    assert f"$2b${settings.PASSWORD_HASH_ROUNDS:02d}$" in user.hashed_password
+    assert security.verify_password("password", user.hashed_password)
+
+
+def is_token_cached(token: str) -> bool:
+    digest = hashlib.sha256(token.encode()).hexdigest()
+    return security.token_cache.get(digest, security.TOKEN_NAMESPACE) is not None
+
+
+def test_cached_claims_are_not_returned_after_the_token_expires(monkeypatch):
+    security.token_cache.clear()
+    token = security.create_access_token(1, expires_delta=timedelta(minutes=5))
+    claims = security.decode_token(token)
+    assert is_token_cached(token)
+
+    monkeypatch.setattr(time, "time", lambda: claims["exp"] + 1)
+
+    with pytest.raises(jwt.ExpiredSignatureError):
+        security.decode_token(token)
+
+
+def test_tokens_that_fail_verification_are_not_cached():
+    security.token_cache.clear()
+    expired = security.create_access_token(1, expires_delta=timedelta(seconds=-60))
+    claims = security.decode_token(security.create_access_token(1))
+    security.token_cache.clear()
+    forged = jwt.encode(claims, "another key", algorithm=settings.ALGORITHM)
+
+    with pytest.raises(jwt.ExpiredSignatureError):
+        security.decode_token(expired)
+    with pytest.raises(jwt.InvalidSignatureError):
+        security.decode_token(forged)
+
+    assert len(security.token_cache) == 0
+
+
+def test_revoked_token_is_rejected_although_its_claims_are_cached(redis_cache):
+    async def main():
+        await redis_cache.init(host_url="redis://", prefix="test")
+        redis_cache.stop_background_tasks()
+        await redis_cache.redis.flushall()
+        token = security.create_access_token(1)
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+        payload = await deps.get_token_payload(credentials)
+        assert is_token_cached(token)
+
+        await security.revoke_token(payload.jti, security.decode_token(token)["exp"])
+
+        with pytest.raises(HTTPException) as error:
+            await deps.get_token_payload(credentials)
+        return error.value
+
+    security.token_cache.clear()
+    error = asyncio.run(main())
+
+    assert error.status_code == 403
+    assert error.detail == "Token has been revoked"
@@ -0,0 +1,42 @@
+import asyncio
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.api import deps
+from app.db.session import SessionMetrics
+
+
+def test_request_that_never_queries_checks_out_no_connection(monkeypatch):
+    # nothing listens on the port, so a checkout would fail the request
+    engine = create_async_engine("postgresql+asyncpg://user@127.0.0.1:1/db")
+    metrics = SessionMetrics()
+    monkeypatch.setattr(
+        deps, "async_session", sessionmaker(bind=engine, class_=AsyncSession)
+    )
+    monkeypatch.setattr(deps, "session_metrics", metrics)
+
+    async def main():
+        async for db in deps.get_db_async():
+            assert isinstance(db, AsyncSession)
+        return engine.pool.checkedout()
+
+    assert asyncio.run(main()) == 0
+    assert (metrics.sessions, metrics.untouched, metrics.held.count) == (1, 1, 0)
+
+
+def test_connection_is_held_from_the_first_query_until_commit():
+    engine = create_engine("sqlite://")
+    metrics = SessionMetrics()
+
+    with Session(engine) as db:
+        assert "held" not in db.info
+        db.execute(text("SELECT 1"))
+        db.commit()
+        # closing a session without a transaction adds nothing
+        db.close()
+        metrics.record(db.info)
+
+    assert (metrics.sessions, metrics.untouched, metrics.held.count) == (1, 0, 1)
+    assert metrics.as_dict()["untouched_ratio"] == 0.0
@@ -0,0 +1,73 @@
+from datetime import datetime
+from decimal import Decimal
+from enum import Enum
+from typing import List, Optional
+
+import pytest
+from pydantic import BaseModel, Field
+
+from app.models import Category, User
+from cache.util import jsonable_encoder, JSONableEncoder
+
+CUSTOM_ENCODER = {bytes: lambda x: {"_spec_type": str(bytes), "val": x.hex()}}
+
+
+class Role(Enum):
+    ADMIN = "admin"
+
+
+class CategoryOut(BaseModel):
+    title: str
+    price: Decimal = Field(alias="borrowPrice")
+
+
+class BookOut(BaseModel):
+    title: str
+    role: Role
+    category: CategoryOut
+    similar: List[CategoryOut] = []
+    cover: Optional[bytes] = None
+
+
+class Books(BaseModel):
+    __root__: List[BookOut]
+
+
+def make_user(id: int) -> User:
+    return User(
+        id=id,
+        email=f"user{id}@example.com",
+        full_name="User",
+        amount=Decimal("12.50"),
+        is_superuser=False,
+        created=datetime(2024, 1, 1, 10, 30),
+    )
+
+
+def make_book() -> BookOut:
+    category = CategoryOut(title="novel", borrowPrice=Decimal("1.5"))
+    return BookOut(
+        title="dune",
+        role=Role.ADMIN,
+        category=category,
+        similar=[category],
+        cover=b"\x00\x01",
+    )
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        {"header": {"status": 0}, "content": [make_user(1), make_user(2)]},
+        {"content": make_book()},
+        Books(__root__=[make_book()]),
+        {"nested": Category(id=1, title="novel", books=[]), "raw": b"\x02"},
+    ],
+)
+@pytest.mark.parametrize("recursion", [2, 4, 6, 8, 10])
+def test_encoder_matches_jsonable_encoder(value, recursion):
+    expected = jsonable_encoder(
+        value, custom_encoder=CUSTOM_ENCODER, recursion=recursion
+    )
+
+    assert JSONableEncoder(CUSTOM_ENCODER)(value, recursion) == expected
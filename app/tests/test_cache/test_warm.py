@@ -0,0 +1,106 @@
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi import Depends, FastAPI
+
+from app.core.cache import warm_up_by_role
+from app.models.user import User
+from cache import warm
+from cache.cache import cache
+from cache.client import Cache
+from tests.test_cache.test_decorator import serve
+
+
+class Session:
+    """Resource an endpoint needs, created by a warm-up provider."""
+
+    def __init__(self):
+        self.closed = False
+
+
+def test_warm_up_by_role_returns_the_arguments_once_per_role():
+    regular, superuser = warm_up_by_role(skip=0, limit=10)
+
+    for params in (regular, superuser):
+        assert (params["skip"], params["limit"]) == (0, 10)
+    assert not regular["current_user"].is_superuser
+    assert superuser["current_user"].is_superuser
+
+
+def test_arguments_the_endpoint_does_not_take_are_rejected(monkeypatch):
+    monkeypatch.setattr(warm, "WARM_UPS", [])
+
+    with pytest.raises(ValueError):
+
+        @cache(namespace="warm-item", expire=60, warm=[{"id": 1, "page": 2}])
+        async def read_item(id: int) -> dict:
+            return {"id": id}
+
+    assert warm.WARM_UPS == []
+
+
+def test_warmed_entries_are_served_as_hits(redis_cache, monkeypatch):
+    monkeypatch.setattr(warm, "WARM_UPS", [])
+    app = FastAPI()
+    sessions = []
+    calls = []
+
+    @asynccontextmanager
+    async def open_session():
+        session = Session()
+        sessions.append(session)
+        yield session
+        session.closed = True
+
+    def get_session() -> Session:
+        return Session()
+
+    def get_current_user() -> User:
+        return User(id=1, is_superuser=True)
+
+    @app.get("/items/")
+    @cache(
+        namespace="warm-item",
+        expire=60,
+        vary_by=["current_user.is_superuser"],
+        warm=warm_up_by_role(limit=10),
+    )
+    async def read_items(
+        limit: int = 100,
+        db: Session = Depends(get_session),
+        current_user: User = Depends(get_current_user),
+    ) -> dict:
+        calls.append((limit, current_user.is_superuser, isinstance(db, Session)))
+        return {"limit": limit, "superuser": current_user.is_superuser}
+
+    with serve(app, ignore_arg_types=[Session, User]) as client:
+        result = client.portal.call(warm.warm_up, {Session: open_session})
+        response = client.get("/items/", params={"limit": 10})
+
+    assert result == {"warmed": 2, "failed": 0}
+    assert sorted(calls) == [(10, False, True), (10, True, True)]
+    assert [session.closed for session in sessions] == [True, True]
+    assert response.headers["X-FastAPI-Cache"] == "Hit"
+    assert response.json() == {"limit": 10, "superuser": True}
+
+
+def test_failed_warm_ups_are_counted(redis_cache, monkeypatch):
+    monkeypatch.setattr(warm, "WARM_UPS", [])
+    app = FastAPI()
+
+    @asynccontextmanager
+    async def fail():
+        raise ConnectionError("database is down")
+        yield
+
+    @app.get("/items/{id}")
+    @cache(namespace="warm-item", expire=60, warm=[{"id": 1}])
+    async def read_item(id: int, db: Session = Depends(Session)) -> dict:
+        return {"id": id}
+
+    with serve(app, ignore_arg_types=[Session]) as client:
+        result = client.portal.call(warm.warm_up, {Session: fail})
+        keys = client.portal.call(Cache().redis.keys, "test|warm-item:*")
+
+    assert result == {"warmed": 0, "failed": 1}
+    assert keys == []